@@ -1,250 +1,351 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from collections.abc import Callable
 import logging
 from typing import Any
 
-import async_timeout
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.const import Platform
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.update_coordinator import (
-    DataUpdateCoordinator,
-    UpdateFailed,
+from homeassistant.helpers.event import async_call_later
+
+from .aggregate import AGGREGATE_DATA, StashAggregateHub
+from .api import StashClient
+from .breaker import STATE_OPEN
+from .capabilities import StashCapabilityCache
+from .const import (
+    DOMAIN,
+    CONF_AGGREGATE,
+    CONF_PATH_MAP,
+    CONF_TRACK_PLAYS,
+    CONF_URL,
+    CONF_WATCH_FOLDERS,
+    CONF_WATCH_GENERATE,
+    TIER_INTERVALS,
+    TIER_KEYS,
+    TIER_MEDIA,
+    TIER_TAXONOMY,
 )
-
-from .const import DOMAIN, CONF_URL, DEFAULT_SCAN_INTERVAL
+from .coordinator import StashDataUpdateCoordinator, counter_unique_id, state_store
+from .feed import StashFeedCoordinator, feed_store
+from .health import StashHealthAnalyzer, health_store
+from .identify import StashIdentifier, identify_store
+from .image_proxy import StashImageView
+from .jobs import StashJobCoordinator
+from .pipeline import StashPipeline
+from .plays import StashPlayTracker, plays_store
+from .trends import StashTrendTracker, trends_store
+from .services import async_setup_services
+from .subscription import (
+    EVENT_JOB,
+    EVENT_SCAN_COMPLETE,
+    StashSubscriptionClient,
+)
+from .watcher import StashFolderWatcher, parse_path_map
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BUTTON, Platform.BINARY_SENSOR]
 
+# Уровни, которые меняются после сканирования / завершения задач
+CONTENT_TIERS = (TIER_MEDIA, TIER_TAXONOMY)
+
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up Stash integration (YAML not supported)."""
+    # Один прокси картинок на все записи
+    hass.http.register_view(StashImageView(hass))
+    async_setup_services(hass)
     return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Stash from a config entry."""
+    if entry.data.get(CONF_AGGREGATE):
+        return await _async_setup_aggregate(hass, entry)
+
     session = async_get_clientsession(hass)
     graphql_url: str = entry.data[CONF_URL].rstrip("/")
 
     client = StashClient(graphql_url, session)
-    coordinator = StashDataUpdateCoordinator(hass, client)
-
-    # Первое обновление — чтобы сразу были данные в сенсорах
-    await coordinator.async_config_entry_first_refresh()
+    capability_cache = StashCapabilityCache(hass, entry.entry_id, client)
+    # Схему определяем один раз; повторно — только если сменилась версия
+    await capability_cache.async_load()
+
+    enabled_keys = _async_enabled_keys(hass, entry)
+    coordinators: dict[str, StashDataUpdateCoordinator] = {}
+    for tier, (option, default) in TIER_INTERVALS.items():
+        coordinator = StashDataUpdateCoordinator(
+            hass,
+            client,
+            tier,
+            entry.options.get(option, default),
+            capability_cache,
+            entry.entry_id,
+        )
+        coordinator.async_select_keys(enabled_keys)
+        coordinators[tier] = coordinator
+
+    # Новое и изменённое после курсора — опрос по интервалу медиа
+    media_option, media_default = TIER_INTERVALS[TIER_MEDIA]
+    feed = StashFeedCoordinator(
+        hass, client, entry.entry_id, entry.options.get(media_option, media_default)
+    )
+    await feed.async_restore()
+
+    @callback
+    def _async_refresh_content() -> None:
+        # Библиотека изменилась — кэш поиска устарел
+        client.search_cache.clear()
+        client.name_cache.clear()
+        for tier in CONTENT_TIERS:
+            hass.async_create_task(coordinators[tier].async_request_refresh())
+        hass.async_create_task(feed.async_request_refresh())
+
+    @callback
+    def _on_job_finished(job: dict[str, Any]) -> None:
+        # Задача завершилась — счётчики, скорее всего, изменились
+        _async_refresh_content()
+
+    jobs = StashJobCoordinator(hass, client, _on_job_finished)
+
+    for tier, coordinator in coordinators.items():
+        if await coordinator.async_restore():
+            # Сенсоры сразу получают последнее известное состояние,
+            # живое обновление идёт в фоне и не задерживает запуск HA
+            entry.async_create_background_task(
+                hass,
+                coordinator.async_refresh(),
+                f"{DOMAIN} {tier} refresh {graphql_url}",
+            )
+        else:
+            # Первое обновление — чтобы сразу были данные в сенсорах
+            await coordinator.async_config_entry_first_refresh()
+
+    identifier = StashIdentifier(hass, entry, client, jobs)
+    await identifier.async_load()
+    # Тяжёлые проверки библиотеки — по своему расписанию, не в опросе счётчиков
+    health = StashHealthAnalyzer(hass, entry, client, jobs)
+    await health.async_restore()
+    # Скорость роста — из буфера прошлых значений, без запросов к recorder
+    trends = StashTrendTracker(hass, entry, coordinators[TIER_MEDIA])
+    await trends.async_restore()
+    entry.async_on_unload(trends.async_start())
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
         "client": client,
-        "coordinator": coordinator,
+        # Основной координатор (медиа) — для Online и обратной совместимости
+        "coordinator": coordinators[TIER_MEDIA],
+        "coordinators": coordinators,
+        "feed": feed,
+        "jobs": jobs,
+        "capabilities": capability_cache,
+        "identifier": identifier,
+        "health": health,
+        "trends": trends,
+        "pipeline": StashPipeline(hass, entry, client, jobs, identifier),
     }
+    entry.async_create_background_task(
+        hass, jobs.async_refresh(), f"{DOMAIN} job queue {graphql_url}"
+    )
+    entry.async_create_background_task(
+        hass, feed.async_refresh(), f"{DOMAIN} feed {graphql_url}"
+    )
+    # События stash_item_added/updated нужны, даже если сенсоры ленты отключены
+    entry.async_on_unload(feed.async_add_listener(lambda: None))
+
+    if entry.options.get(CONF_WATCH_FOLDERS, False):
+        watcher = StashFolderWatcher(
+            hass,
+            client,
+            jobs,
+            parse_path_map(entry.options.get(CONF_PATH_MAP, "")),
+            entry.options.get(CONF_WATCH_GENERATE, False),
+        )
+        entry.async_on_unload(watcher.async_start())
+
+    if entry.options.get(CONF_TRACK_PLAYS, False):
+        plays = StashPlayTracker(hass, entry.entry_id, client)
+        await plays.async_load()
+        entry.async_on_unload(plays.async_start())
+        hass.data[DOMAIN][entry.entry_id]["plays"] = plays
+
+    capabilities = client.capabilities
+    if capabilities is not None and capabilities.supports_subscriptions:
+        subscription = _async_create_subscription(
+            session,
+            graphql_url,
+            [*coordinators.values(), feed],
+            jobs,
+            _async_refresh_content,
+        )
+        hass.data[DOMAIN][entry.entry_id]["subscription"] = subscription
+        entry.async_create_background_task(
+            hass, subscription.run(), f"{DOMAIN} subscription {graphql_url}"
+        )
+
+    entry.async_on_unload(
+        _async_schedule_probes(hass, client, coordinators[TIER_MEDIA])
+    )
 
+    if (hub := hass.data.get(AGGREGATE_DATA)) is not None:
+        # Сводка уже настроена — обновления этого сервера по её расписанию
+        hub.async_add_member(entry.entry_id, entry.title, coordinators)
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
-async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
-    if unload_ok:
-        domain_data = hass.data.get(DOMAIN, {})
-        domain_data.pop(entry.entry_id, None)
-        if not domain_data:
-            hass.data.pop(DOMAIN, None)
-    return unload_ok
+async def _async_setup_aggregate(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up the device with totals over all Stash servers."""
+    hub = StashAggregateHub(hass, entry)
+    hass.data[AGGREGATE_DATA] = hub
+    for entry_id, data in hass.data.get(DOMAIN, {}).items():
+        server = hass.config_entries.async_get_entry(entry_id)
+        hub.async_add_member(
+            entry_id, server.title if server else entry_id, data["coordinators"]
+        )
+    entry.async_create_background_task(hass, hub.async_run(), f"{DOMAIN} aggregate")
+    await hass.config_entries.async_forward_entry_setups(entry, [Platform.SENSOR])
+    return True
 
 
-class StashError(Exception):
-    """Base error for Stash API."""
-
-
-class StashClient:
-    """Simple async GraphQL client for Stash (no authentication)."""
-
-    def __init__(self, graphql_url: str, session) -> None:
-        # graphql_url should point directly to /graphql
-        self._url = graphql_url
-        self._session = session
-
-    async def _post(self, query: str) -> dict[str, Any]:
-        """Send GraphQL query and raise on error."""
-        payload = {"query": query}
-        async with async_timeout.timeout(10):
-            async with self._session.post(self._url, json=payload) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    raise StashError(f"HTTP {resp.status} from Stash: {text}")
-                data = await resp.json()
-
-        if "errors" in data:
-            raise StashError(f"GraphQL errors: {data['errors']}")
-        return data
-
-    async def _post_allow_errors(self, query: str) -> dict[str, Any]:
-        """Send GraphQL query and return JSON even if it contains errors."""
-        payload = {"query": query}
-        async with async_timeout.timeout(10):
-            async with self._session.post(self._url, json=payload) as resp:
-                if resp.status != 200:
-                    text = await resp.text()
-                    raise StashError(f"HTTP {resp.status} from Stash: {text}")
-                return await resp.json()
-
-    async def async_get_scenes_count(self) -> int:
-        data = await self._post("query { findScenes { count } }")
-        return int(data["data"]["findScenes"]["count"])
-
-    async def async_get_movies_count(self) -> int:
-        """Return number of movies/groups (supporting old/new schemas)."""
-        # Newer Stash versions: Groups
-        data = await self._post_allow_errors("query { findGroups { count } }")
-        if "data" in data and data["data"] and data["data"].get("findGroups"):
-            try:
-                return int(data["data"]["findGroups"]["count"])
-            except (KeyError, TypeError, ValueError):
-                pass
-
-        # Older versions: Movies
-        data = await self._post_allow_errors("query { findMovies { count } }")
-        if "errors" in data or "data" not in data:
-            raise StashError(
-                f"GraphQL error getting movies/groups: {data.get('errors')}"
+@callback
+def _async_enabled_keys(hass: HomeAssistant, entry: ConfigEntry) -> set[str]:
+    """Keys whose sensors are not disabled in the entity registry."""
+    registry = er.async_get(hass)
+    keys: set[str] = set()
+    for tier_keys in TIER_KEYS.values():
+        for key in tier_keys:
+            entity_id = registry.async_get_entity_id(
+                Platform.SENSOR, DOMAIN, counter_unique_id(entry.entry_id, key)
+            )
+            reg_entry = registry.async_get(entity_id) if entity_id else None
+            if reg_entry is None or not reg_entry.disabled:
+                keys.add(key)
+    return keys
+
+
+@callback
+def _async_create_subscription(
+    session,
+    graphql_url: str,
+    coordinators: list[StashDataUpdateCoordinator | StashFeedCoordinator],
+    jobs: StashJobCoordinator,
+    refresh_content: Callable[[], None],
+) -> StashSubscriptionClient:
+    """Refresh on finished jobs/scans; poll rarely while the socket is up."""
+
+    @callback
+    def _on_event(kind: str, payload: dict[str, Any]) -> None:
+        if kind == EVENT_JOB:
+            # Завершение задачи обновит счётчики через _on_job_finished
+            jobs.async_handle_job_event(payload)
+        elif kind == EVENT_SCAN_COMPLETE:
+            refresh_content()
+
+    @callback
+    def _on_connection_change(connected: bool) -> None:
+        for coordinator in coordinators:
+            coordinator.async_set_push_mode(connected)
+        if not connected:
+            # Пока подписки нет — возвращаемся к обычному опросу
+            refresh_content()
+
+    return StashSubscriptionClient(session, graphql_url, _on_event, _on_connection_change)
+
+
+@callback
+def _async_schedule_probes(
+    hass: HomeAssistant,
+    client: StashClient,
+    coordinator: StashDataUpdateCoordinator,
+) -> CALLBACK_TYPE:
+    """Refresh when the open breaker allows a probe; return the canceller.
+
+    Otherwise recovery would only be noticed at the next poll, which is
+    an hour away in push mode.
+    """
+    unsub_later: CALLBACK_TYPE | None = None
+
+    @callback
+    def _cancel() -> None:
+        nonlocal unsub_later
+        if unsub_later is not None:
+            unsub_later()
+            unsub_later = None
+
+    @callback
+    def _probe(_now: Any) -> None:
+        nonlocal unsub_later
+        unsub_later = None
+        hass.async_create_task(coordinator.async_request_refresh())
+
+    @callback
+    def _on_state(state: str) -> None:
+        nonlocal unsub_later
+        _cancel()
+        if state == STATE_OPEN:
+            # С запасом в секунду — к этому моменту проба уже разрешена
+            unsub_later = async_call_later(
+                hass, (client.breaker.retry_in or 0.0) + 1, _probe
             )
 
-        try:
-            return int(data["data"]["findMovies"]["count"])
-        except (KeyError, TypeError, ValueError) as exc:
-            raise StashError(
-                f"Unexpected response for movies/groups count: {data}"
-            ) from exc
-
-    async def async_get_performers_count(self) -> int:
-        data = await self._post("query { findPerformers { count } }")
-        return int(data["data"]["findPerformers"]["count"])
-
-    async def async_get_studios_count(self) -> int:
-        data = await self._post("query { findStudios { count } }")
-        return int(data["data"]["findStudios"]["count"])
-
-    async def async_get_tags_count(self) -> int:
-        data = await self._post("query { findTags { count } }")
-        return int(data["data"]["findTags"]["count"])
-
-    async def async_get_images_count(self) -> int:
-        data = await self._post("query { findImages { count } }")
-        return int(data["data"]["findImages"]["count"])
-
-    async def async_get_galleries_count(self) -> int:
-        data = await self._post("query { findGalleries { count } }")
-        return int(data["data"]["findGalleries"]["count"])
-
-    async def async_get_markers_count(self) -> int:
-        data = await self._post("query { findSceneMarkers { count } }")
-        return int(data["data"]["findSceneMarkers"]["count"])
-
-    async def async_get_version(self) -> str | None:
-        """Return Stash version string (e.g. 'v0.28.1')."""
-        data = await self._post("query { version { version } }")
-        try:
-            return str(data["data"]["version"]["version"])
-        except (KeyError, TypeError, ValueError):
-            return None
-
-    async def async_metadata_scan(self) -> None:
-        """Trigger library scan."""
-        await self._post("mutation { metadataScan(input:{}) }")
-
-    async def async_metadata_clean(self) -> None:
-        """Run metadataClean (Tools -> Clean)."""
-        query = 'mutation { metadataClean(input: {dryRun: false, paths: ""}) }'
-        await self._post(query)
-
-    async def async_metadata_generate(self) -> None:
-        """Run metadataGenerate using default task settings."""
-        # Используются настройки задачи Generate из UI Stash
-        await self._post("mutation { metadataGenerate(input: {}) }")
-
-    async def async_metadata_auto_tag(self) -> None:
-        """Run metadataAutoTag using default task settings."""
-        # Используются настройки задачи Auto Tag из UI Stash
-        await self._post("mutation { metadataAutoTag(input: {}) }")
-        
-    async def async_metadata_identify(self) -> None:
-        """Запустить Identify с использованием указанных stash-box endpoints.
-
-        Сейчас по умолчанию используем только StashDB.
-        При желании можно дописать сюда и другие публичные/частные endpoints.
-        """
-        endpoints: list[str] = [
-            "https://stashdb.org/graphql",
-            # сюда можно добавить другие, если нужно:
-            # "https://fansdb.cc/graphql",
-            # "https://theporndb.net/graphql",
-            # "https://pmvstash.org/graphql",
-        ]
-
-        sources_str = ",\n                ".join(
-            f'{{ source: {{ stash_box_endpoint: "{ep}" }} }}'
-            for ep in endpoints
-        )
+    remove = client.breaker.add_listener(_on_state)
+
+    @callback
+    def _stop() -> None:
+        remove()
+        _cancel()
 
-        query = f"""
-        mutation {{
-          metadataIdentify(
-            input: {{
-              sources: [
-                {sources_str}
-              ]
-            }}
-          )
-        }}
-        """
-        await self._post(query)
+    return _stop
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply new options (intervals) by reloading the entry."""
+    await hass.config_entries.async_reload(entry.entry_id)
 
 
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+    if entry.data.get(CONF_AGGREGATE):
+        unload_ok = await hass.config_entries.async_unload_platforms(
+            entry, [Platform.SENSOR]
+        )
+        if unload_ok and (hub := hass.data.pop(AGGREGATE_DATA, None)) is not None:
+            hub.async_stop()
+        return unload_ok
 
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        if (hub := hass.data.get(AGGREGATE_DATA)) is not None:
+            hub.async_remove_member(entry.entry_id)
+        domain_data = hass.data.get(DOMAIN, {})
+        if (data := domain_data.get(entry.entry_id)) is not None:
+            # Не теряем правки и просмотры, которые ещё ждут отправки
+            await data["client"].writes.async_flush()
+            if (plays := data.get("plays")) is not None:
+                await plays.async_stop()
+        domain_data.pop(entry.entry_id, None)
+        if not domain_data:
+            hass.data.pop(DOMAIN, None)
+    return unload_ok
 
-class StashDataUpdateCoordinator(DataUpdateCoordinator):
-    """Coordinator that periodically fetches data from Stash."""
 
-    def __init__(self, hass: HomeAssistant, client: StashClient) -> None:
-        super().__init__(
-            hass,
-            _LOGGER,
-            name="Stash",
-            update_interval=timedelta(seconds=DEFAULT_SCAN_INTERVAL),
-        )
-        self.client = client
-
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Fetch data from Stash."""
-        try:
-            scenes = await self.client.async_get_scenes_count()
-            movies = await self.client.async_get_movies_count()
-            performers = await self.client.async_get_performers_count()
-            studios = await self.client.async_get_studios_count()
-            tags = await self.client.async_get_tags_count()
-            images = await self.client.async_get_images_count()
-            galleries = await self.client.async_get_galleries_count()
-            markers = await self.client.async_get_markers_count()
-            version = await self.client.async_get_version()
-
-            return {
-                "scenes": scenes,
-                "movies": movies,
-                "performers": performers,
-                "studios": studios,
-                "tags": tags,
-                "images": images,
-                "galleries": galleries,
-                "markers": markers,
-                "version": version,
-            }
-        except Exception as err:  # noqa: BLE001
-            raise UpdateFailed(f"Error communicating with Stash: {err}") from err
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Drop persisted data of a removed entry."""
+    if entry.data.get(CONF_AGGREGATE):
+        return
+    client = StashClient(entry.data[CONF_URL].rstrip("/"), None)
+    await StashCapabilityCache(hass, entry.entry_id, client).async_remove()
+    for tier in TIER_KEYS:
+        await state_store(hass, entry.entry_id, tier).async_remove()
+    await plays_store(hass, entry.entry_id).async_remove()
+    await identify_store(hass, entry.entry_id).async_remove()
+    await health_store(hass, entry.entry_id).async_remove()
+    await feed_store(hass, entry.entry_id).async_remove()
+    await trends_store(hass, entry.entry_id).async_remove()
@@ -0,0 +1,186 @@
+"""Totals over all Stash servers, with staggered refreshes."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+import logging
+import time
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+import homeassistant.util.dt as dt_util
+
+from .const import AGGREGATE_CONCURRENCY, DOMAIN, TIER_KEYS, TIER_MEDIA, TIER_VERSION
+from .coordinator import StashDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Ключ hass.data: в hass.data[DOMAIN] только записи серверов
+AGGREGATE_DATA = f"{DOMAIN}_aggregate"
+
+AGGREGATE_KEYS: tuple[str, ...] = tuple(
+    key for tier, keys in TIER_KEYS.items() if tier != TIER_VERSION for key in keys
+)
+
+# Пока нет ни одного сервера — просыпаться изредка
+_IDLE_WAKEUP = 60
+
+
+@dataclass
+class _Member:
+    """One Stash server under the hub's schedule."""
+
+    title: str
+    coordinators: dict[str, StashDataUpdateCoordinator]
+    unsubs: list[Callable[[], None]] = field(default_factory=list)
+    # tier -> время следующего обновления (monotonic)
+    due: dict[str, float] = field(default_factory=dict)
+    running: set[str] = field(default_factory=set)
+    # tier -> момент последнего успешного обновления (ISO, UTC)
+    updated_at: dict[str, str] = field(default_factory=dict)
+
+
+class StashAggregateHub(DataUpdateCoordinator):
+    """Sum counters over all servers and schedule their refreshes.
+
+    The tier coordinators of each server stop using their own timers,
+    which all start at setup and so fire together. Instead the hub
+    spreads the servers evenly over each interval and runs at most
+    ``AGGREGATE_CONCURRENCY`` refreshes at a time. Totals are rebuilt
+    whenever any server updates, from the last data of every server, so
+    a slow one never holds the others back; its ``updated`` timestamp
+    shows how old its part is.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+        super().__init__(
+            hass, _LOGGER, config_entry=entry, name="Stash aggregate"
+        )
+        self._entry = entry
+        self._members: dict[str, _Member] = {}
+        self._semaphore = asyncio.Semaphore(AGGREGATE_CONCURRENCY)
+        self._wake = asyncio.Event()
+        self.data = self._build()
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        return self._build()
+
+    @callback
+    def async_add_member(
+        self,
+        entry_id: str,
+        title: str,
+        coordinators: dict[str, StashDataUpdateCoordinator],
+    ) -> None:
+        """Take over the schedule of one server's tier coordinators."""
+        if entry_id in self._members:
+            return
+        member = self._members[entry_id] = _Member(title, coordinators)
+        for tier, coordinator in coordinators.items():
+            coordinator.async_set_managed(True)
+            member.unsubs.append(
+                coordinator.async_add_listener(
+                    partial(self._async_member_updated, entry_id, tier)
+                )
+            )
+        self._async_stagger()
+
+    @callback
+    def async_remove_member(self, entry_id: str, restore_timers: bool = False) -> None:
+        """Stop scheduling a server (unload); optionally give it its own timers back."""
+        if (member := self._members.pop(entry_id, None)) is None:
+            return
+        for unsub in member.unsubs:
+            unsub()
+        if restore_timers:
+            for coordinator in member.coordinators.values():
+                coordinator.async_set_managed(False)
+        self._async_stagger()
+        self.async_set_updated_data(self._build())
+
+    @callback
+    def async_stop(self) -> None:
+        """Release all servers (the hub entry is unloaded)."""
+        for entry_id in list(self._members):
+            self.async_remove_member(entry_id, restore_timers=True)
+
+    @callback
+    def _async_stagger(self) -> None:
+        """Spread servers evenly: server ``i`` of ``n`` at ``(i + 1) / n`` interval."""
+        now = time.monotonic()
+        count = len(self._members)
+        for index, entry_id in enumerate(sorted(self._members)):
+            member = self._members[entry_id]
+            for tier, coordinator in member.coordinators.items():
+                interval = coordinator.poll_interval.total_seconds()
+                member.due[tier] = now + interval * (index + 1) / count
+        self._wake.set()
+
+    @callback
+    def _async_member_updated(self, entry_id: str, tier: str) -> None:
+        member = self._members.get(entry_id)
+        if member is None:
+            return
+        if member.coordinators[tier].last_update_success:
+            member.updated_at[tier] = dt_util.utcnow().isoformat()
+        self.async_set_updated_data(self._build())
+
+    async def async_run(self) -> None:
+        """Start due refreshes; runs until the hub entry is unloaded."""
+        while True:
+            now = time.monotonic()
+            next_due = now + _IDLE_WAKEUP
+            for entry_id, member in self._members.items():
+                for tier, due in member.due.items():
+                    if tier in member.running:
+                        continue
+                    if due <= now:
+                        member.running.add(tier)
+                        self._entry.async_create_background_task(
+                            self.hass,
+                            self._async_refresh(entry_id, member, tier),
+                            f"{DOMAIN} aggregate refresh {entry_id} {tier}",
+                        )
+                    else:
+                        next_due = min(next_due, due)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), next_due - now)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _async_refresh(self, entry_id: str, member: _Member, tier: str) -> None:
+        coordinator = member.coordinators[tier]
+        try:
+            async with self._semaphore:
+                if self._members.get(entry_id) is member:
+                    await coordinator.async_refresh()
+        finally:
+            member.running.discard(tier)
+            interval = coordinator.poll_interval.total_seconds()
+            # Шаг фиксированный — сдвиг между серверами сохраняется
+            due = member.due.get(tier, 0.0) + interval
+            now = time.monotonic()
+            member.due[tier] = due if due > now else now + interval
+            self._wake.set()
+
+    def _build(self) -> dict[str, Any]:
+        totals: dict[str, float | None] = dict.fromkeys(AGGREGATE_KEYS)
+        # entry_id -> состояние сервера; названия записей могут совпадать
+        instances: dict[str, dict[str, Any]] = {}
+        for entry_id, member in self._members.items():
+            for coordinator in member.coordinators.values():
+                for key, value in (coordinator.data or {}).items():
+                    if key in totals and isinstance(value, (int, float)):
+                        totals[key] = (totals[key] or 0) + value
+            media = member.coordinators.get(TIER_MEDIA)
+            instances[entry_id] = {
+                "title": member.title,
+                "available": media.last_update_success if media else None,
+                "updated": member.updated_at.get(TIER_MEDIA),
+            }
+        return {"totals": totals, "instances": instances}
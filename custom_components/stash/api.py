@@ -0,0 +1,1116 @@
+"""Async GraphQL client for Stash."""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import json
+import logging
+import re
+import time
+from typing import Any, Iterable, NamedTuple
+
+import aiohttp
+import async_timeout
+
+from .breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker
+from .cache import TTLCache
+from .const import (
+    IDENTIFY_DEFAULT_ENDPOINT,
+    NAME_CACHE_SIZE,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+)
+from .metrics import StashMetrics, operation_name
+from .writes import StashWriteQueue
+
+_LOGGER = logging.getLogger(__name__)
+
+# Root fields behind every counter, in order of preference.
+# Первый вариант — актуальная схема, следующие — для старых версий Stash.
+COUNT_FIELDS: dict[str, tuple[str, ...]] = {
+    "scenes": ("findScenes",),
+    "movies": ("findGroups", "findMovies"),
+    "performers": ("findPerformers",),
+    "studios": ("findStudios",),
+    "tags": ("findTags",),
+    "images": ("findImages",),
+    "galleries": ("findGalleries",),
+    "markers": ("findSceneMarkers",),
+}
+
+# Fields of the library-wide ``stats`` aggregate, in order of preference.
+# Если поле есть в stats, отдельный find*-запрос не нужен.
+STATS_FIELDS: dict[str, tuple[str, ...]] = {
+    "scenes": ("scene_count",),
+    "movies": ("group_count", "movie_count"),
+    "performers": ("performer_count",),
+    "studios": ("studio_count",),
+    "tags": ("tag_count",),
+    "images": ("image_count",),
+    "galleries": ("gallery_count",),
+    "scenes_size": ("scenes_size",),
+    "images_size": ("images_size",),
+    "scenes_duration": ("scenes_duration",),
+    "scenes_played": ("scenes_played",),
+    "total_play_count": ("total_play_count",),
+    "total_play_duration": ("total_play_duration",),
+    "total_o_count": ("total_o_count",),
+}
+
+# Bytes and seconds come back as floats, everything else is a count.
+STATS_FLOAT_KEYS = frozenset(
+    {"scenes_size", "images_size", "scenes_duration", "total_play_duration"}
+)
+
+_UNKNOWN_FIELD_RE = re.compile(r'Cannot query field "(\w+)" on type "Query"')
+
+VERSION_QUERY = "query { version { version } }"
+
+JOB_FIELDS = "id status description progress subTasks addTime startTime endTime"
+
+# Heavy task mutations and the description Stash gives their jobs.
+# Пока такая задача в очереди, повторный запуск не отправляется.
+HEAVY_TASKS: dict[str, str] = {
+    "metadataScan": "Scanning",
+    "metadataGenerate": "Generating",
+    "metadataIdentify": "Identifying",
+    "metadataClean": "Cleaning",
+    "metadataAutoTag": "Auto-tagging",
+}
+
+class BrowseKind(NamedTuple):
+    """How to list one kind of object and find its scenes and image."""
+
+    root: str
+    list_key: str
+    fields: str
+    # критерий SceneFilterType для сцен этого объекта
+    criterion: str
+    # путь картинки на сервере Stash
+    image: str
+
+
+# Browsable object lists, in order of preference.
+BROWSE_KINDS: dict[str, tuple[BrowseKind, ...]] = {
+    "movies": (
+        BrowseKind(
+            "findGroups",
+            "groups",
+            "id name front_image_path scene_count updated_at",
+            "groups",
+            "group/{id}/frontimage",
+        ),
+        BrowseKind(
+            "findMovies",
+            "movies",
+            "id name front_image_path scene_count updated_at",
+            "movies",
+            "movie/{id}/frontimage",
+        ),
+    ),
+    "performers": (
+        BrowseKind(
+            "findPerformers",
+            "performers",
+            "id name image_path scene_count updated_at",
+            "performers",
+            "performer/{id}/image",
+        ),
+    ),
+    "studios": (
+        BrowseKind(
+            "findStudios",
+            "studios",
+            "id name image_path scene_count updated_at",
+            "studios",
+            "studio/{id}/image",
+        ),
+    ),
+    "tags": (
+        BrowseKind(
+            "findTags",
+            "tags",
+            "id name image_path scene_count updated_at",
+            "tags",
+            "tag/{id}/image",
+        ),
+    ),
+}
+
+SCENE_FIELDS = "id title date updated_at paths { screenshot stream }"
+# Playing a scene also needs the container of its file for the MIME type.
+SCENE_PLAY_FIELDS = f"{SCENE_FIELDS} files {{ format video_codec }}"
+SCENE_IMAGE = "scene/{id}/screenshot"
+IMAGE_THUMBNAIL = "image/{id}/thumbnail"
+
+# Scenes and images of the "recently added" feed: root, list key, filter argument.
+FEED_ROOTS: dict[str, tuple[str, str, str, str]] = {
+    "scenes": ("findScenes", "scenes", "scene_filter", "SceneFilterType"),
+    "images": ("findImages", "images", "image_filter", "ImageFilterType"),
+}
+FEED_FIELDS = "id title created_at updated_at"
+
+# Fields of each scene returned by ``stash.search``.
+SEARCH_SCENE_FIELDS = (
+    "id title date rating100 organized play_count updated_at "
+    "files { duration } paths { screenshot stream } "
+    "studio { id name } tags { id name } performers { id name }"
+)
+
+# Filter argument used to look objects up by exact name.
+NAME_FILTERS: dict[str, str] = {
+    "performers": "performer_filter",
+    "studios": "studio_filter",
+    "tags": "tag_filter",
+}
+
+# Input types whose fields decide which mutation arguments we may send.
+PROBED_INPUT_TYPES: tuple[str, ...] = (
+    "ScanMetadataInput",
+    "GenerateMetadataInput",
+    "AutoTagMetadataInput",
+    "CleanMetadataInput",
+    "IdentifyMetadataInput",
+)
+
+
+class StashError(Exception):
+    """Base error for Stash API."""
+
+
+class StashConnectionError(StashError):
+    """Stash could not be reached (timeout, connection error, HTTP 5xx)."""
+
+
+class StashUnavailableError(StashConnectionError):
+    """Request refused locally because the circuit breaker is open."""
+
+
+@dataclass
+class StashCapabilities:
+    """Schema features of one Stash server, learned by introspection."""
+
+    version: str | None = None
+    query_fields: frozenset[str] = frozenset()
+    mutation_fields: frozenset[str] = frozenset()
+    subscription_fields: frozenset[str] = frozenset()
+    stats_fields: frozenset[str] = frozenset()
+    input_fields: dict[str, frozenset[str]] = field(default_factory=dict)
+
+    @property
+    def supports_groups(self) -> bool:
+        return "findGroups" in self.query_fields
+
+    @property
+    def supports_subscriptions(self) -> bool:
+        return bool(self.subscription_fields)
+
+    def resolve(self, candidates: Iterable[str]) -> str | None:
+        """Return the first root query field the server actually has."""
+        for name in candidates:
+            if name in self.query_fields:
+                return name
+        return None
+
+    def resolve_stats(self, candidates: Iterable[str]) -> str | None:
+        """Return the first ``stats`` field the server has, if ``stats`` exists."""
+        if "stats" not in self.query_fields:
+            return None
+        for name in candidates:
+            if name in self.stats_fields:
+                return name
+        return None
+
+    def has_input(self, type_name: str, field_name: str) -> bool:
+        return field_name in self.input_fields.get(type_name, frozenset())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "query_fields": sorted(self.query_fields),
+            "mutation_fields": sorted(self.mutation_fields),
+            "subscription_fields": sorted(self.subscription_fields),
+            "stats_fields": sorted(self.stats_fields),
+            "input_fields": {
+                name: sorted(fields) for name, fields in self.input_fields.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> StashCapabilities:
+        return cls(
+            version=data.get("version"),
+            query_fields=frozenset(data.get("query_fields", ())),
+            mutation_fields=frozenset(data.get("mutation_fields", ())),
+            subscription_fields=frozenset(data.get("subscription_fields", ())),
+            stats_fields=frozenset(data.get("stats_fields", ())),
+            input_fields={
+                name: frozenset(fields)
+                for name, fields in data.get("input_fields", {}).items()
+            },
+        )
+
+
+@dataclass
+class StashBatchResult:
+    """Values and per-alias errors of one aliased GraphQL request."""
+
+    data: dict[str, Any] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+def build_batch_query(selections: dict[str, str]) -> str:
+    """Build a single aliased query document, e.g. ``query { a: findScenes { count } }``."""
+    body = " ".join(f"{alias}: {selection}" for alias, selection in selections.items())
+    return f"query {{ {body} }}"
+
+
+class StashClient:
+    """Simple async GraphQL client for Stash (no authentication)."""
+
+    def __init__(self, graphql_url: str, session) -> None:
+        # graphql_url should point directly to /graphql
+        self._url = graphql_url
+        self._session = session
+        # Заполняется один раз при setup (см. capabilities.py)
+        self.capabilities: StashCapabilities | None = None
+        self.breaker = CircuitBreaker()
+        self.metrics = StashMetrics()
+        # single-flight: одинаковые запросы в полёте делят один ответ
+        self._inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+        self._task_locks: dict[str, asyncio.Lock] = {}
+        # документ мутации -> ID последней запущенной нами задачи, пока она
+        # в очереди
+        self._task_jobs: dict[str, str] = {}
+        # нормализованный фильтр -> результат поиска (stash.search)
+        self.search_cache: TTLCache[str, tuple[int, list[dict[str, Any]]]] = TTLCache(
+            SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+        )
+        # (вид, имя) -> ID: повторный поиск по имени не ходит в Stash
+        self.name_cache: TTLCache[tuple[str, str], str] = TTLCache(
+            NAME_CACHE_SIZE, SEARCH_CACHE_TTL
+        )
+        # Правки метаданных уходят пакетами bulk*Update
+        self.writes = StashWriteQueue(self._post, self.search_cache.clear)
+
+    async def _send(
+        self, query: str, variables: dict[str, Any] | None = None
+    ) -> tuple[dict[str, Any], int]:
+        """POST a GraphQL document; return the decoded body and its size in bytes."""
+        payload: dict[str, Any] = {"query": query}
+        if variables:
+            payload["variables"] = variables
+        async with async_timeout.timeout(10):
+            async with self._session.post(self._url, json=payload) as resp:
+                if resp.status >= 500:
+                    text = await resp.text()
+                    raise StashConnectionError(f"HTTP {resp.status} from Stash: {text}")
+                if resp.status != 200:
+                    text = await resp.text()
+                    raise StashError(f"HTTP {resp.status} from Stash: {text}")
+                body = await resp.read()
+        return json.loads(body), len(body)
+
+    async def _request(
+        self, query: str, variables: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        """Send a document, sharing the response of an identical query in flight.
+
+        Only queries are coalesced; mutations always go out (heavy ones are
+        guarded by ``_async_run_task``). Callers must treat the returned
+        dict as read-only, since it may be shared.
+        """
+        if not query.lstrip().startswith("query"):
+            return await self._guarded_request(query, variables)
+
+        key = query
+        if variables:
+            key += "\n" + json.dumps(variables, sort_keys=True)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._guarded_request(query, variables))
+            self._inflight[key] = future
+
+            def _done(fut: asyncio.Future[dict[str, Any]]) -> None:
+                self._inflight.pop(key, None)
+                if not fut.cancelled():
+                    # Исключение забирает каждый ожидающий; здесь — чтобы не было
+                    # "exception was never retrieved", если ждать уже некому
+                    fut.exception()
+
+            future.add_done_callback(_done)
+        # shield: отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(future)
+
+    async def _guarded_request(
+        self, query: str, variables: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        """Send through the circuit breaker; fail fast while it is open."""
+        breaker = self.breaker
+        operation = operation_name(query)
+        if breaker.state == STATE_HALF_OPEN or (
+            breaker.state == STATE_OPEN and not breaker.probe_due()
+        ):
+            self.metrics.record_rejected(operation)
+            raise StashUnavailableError(
+                f"Stash unavailable (circuit {breaker.state}, "
+                f"retry in {breaker.retry_in or 0:.0f}s)"
+            )
+        if breaker.state == STATE_OPEN:
+            # Одна дешёвая проба вместо настоящего запроса
+            breaker.start_probe()
+            await self._timed_send(VERSION_QUERY, "probe")
+
+        return await self._timed_send(query, operation, variables)
+
+    async def _timed_send(
+        self, query: str, operation: str, variables: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        start = time.monotonic()
+        try:
+            data, size = await self._send(query, variables)
+        except (StashConnectionError, asyncio.TimeoutError, aiohttp.ClientError) as err:
+            if isinstance(err, asyncio.TimeoutError):
+                self.metrics.record_timeout(operation)
+            else:
+                self.metrics.record_error(operation)
+            self.breaker.record_failure()
+            if isinstance(err, StashError):
+                raise
+            raise StashConnectionError(f"Cannot reach Stash: {err!r}") from err
+        except BaseException as err:
+            if not isinstance(err, asyncio.CancelledError):
+                self.metrics.record_error(operation)
+            # Отменённая или неудачная проба не должна оставить half-open навсегда
+            if self.breaker.state == STATE_HALF_OPEN:
+                self.breaker.record_failure()
+            raise
+        latency = time.monotonic() - start
+        self.breaker.record_success(latency)
+        self.metrics.record_success(operation, latency, size, "errors" in data)
+        return data
+
+    async def _post(
+        self, query: str, variables: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        """Send GraphQL query and raise on error."""
+        data = await self._request(query, variables)
+        if "errors" in data:
+            raise StashError(f"GraphQL errors: {data['errors']}")
+        return data
+
+    async def _post_allow_errors(
+        self, query: str, variables: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        """Send GraphQL query and return JSON even if it contains errors."""
+        return await self._request(query, variables)
+
+    async def async_get_library_counts(
+        self, keys: Iterable[str] | None = None, with_version: bool = True
+    ) -> StashBatchResult:
+        """Fetch counters, stats and version in one aliased round trip.
+
+        With ``capabilities`` known, every key the server's ``stats``
+        aggregate covers is read from it; the rest (e.g. markers, or
+        everything on servers without ``stats``) uses its ``find*`` count,
+        picking the field the server has. Without them, fields the server does not know (e.g.
+        ``findGroups`` before v0.27) are replaced by their fallback from
+        ``COUNT_FIELDS`` and the query is re-sent without them. Fields that
+        fail at resolve time are reported in ``StashBatchResult.errors``
+        without failing the others.
+        """
+        wanted = list(COUNT_FIELDS if keys is None else keys)
+        result = StashBatchResult()
+        capabilities = self.capabilities
+        stats: dict[str, str] = {}
+        candidates: dict[str, list[str]] = {}
+        for key in wanted:
+            if capabilities is not None and (
+                name := capabilities.resolve_stats(STATS_FIELDS.get(key, ()))
+            ):
+                stats[key] = name
+            elif key not in COUNT_FIELDS:
+                result.errors[key] = "not provided by this Stash server's stats"
+            elif capabilities is None:
+                candidates[key] = list(COUNT_FIELDS[key])
+            elif (name := capabilities.resolve(COUNT_FIELDS[key])) is not None:
+                candidates[key] = [name]
+            else:
+                result.errors[key] = f"not supported by Stash {capabilities.version}"
+
+        while True:
+            selections = {
+                key: f"{names[0]} {{ count }}"
+                for key, names in candidates.items()
+                if names
+            }
+            if stats:
+                stats_body = " ".join(sorted(set(stats.values())))
+                selections["stats"] = f"stats {{ {stats_body} }}"
+            if with_version:
+                selections["version"] = "version { version }"
+            if not selections:
+                return result
+
+            data = await self._post_allow_errors(build_batch_query(selections))
+            payload = data.get("data")
+            errors = data.get("errors") or []
+
+            if payload is None:
+                # Ошибка валидации документа: сервер не вернул ни одного поля.
+                unknown = {
+                    match.group(1)
+                    for err in errors
+                    if (match := _UNKNOWN_FIELD_RE.search(str(err.get("message", ""))))
+                }
+                retried = False
+                for key, names in candidates.items():
+                    if names and names[0] in unknown:
+                        names.pop(0)
+                        retried = True
+                        if not names:
+                            result.errors[key] = f"no supported field for {key}"
+                if not retried:
+                    raise StashError(f"GraphQL errors: {errors}")
+                continue
+
+            self._parse_batch(payload, errors, selections, stats, result)
+            return result
+
+    @staticmethod
+    def _parse_batch(
+        payload: dict[str, Any],
+        errors: list[dict[str, Any]],
+        selections: dict[str, str],
+        stats: dict[str, str],
+        result: StashBatchResult,
+    ) -> None:
+        """Split a (possibly partial) aliased response into values and errors."""
+        for err in errors:
+            path = err.get("path") or []
+            if path and path[0] in selections:
+                result.errors[str(path[0])] = str(err.get("message", err))
+
+        if "stats" in selections:
+            values = payload.get("stats") or {}
+            for key, name in stats.items():
+                if "stats" in result.errors:
+                    result.errors[key] = result.errors["stats"]
+                    continue
+                try:
+                    number = float(values[name])
+                    result.data[key] = number if key in STATS_FLOAT_KEYS else int(number)
+                except (KeyError, TypeError, ValueError):
+                    result.errors[key] = f"unexpected stats value: {values.get(name)!r}"
+
+        for alias in selections:
+            if alias in result.errors or alias == "stats":
+                continue
+            value = payload.get(alias)
+            try:
+                if alias == "version":
+                    result.data[alias] = str(value["version"])
+                else:
+                    result.data[alias] = int(value["count"])
+            except (KeyError, TypeError, ValueError):
+                result.errors[alias] = f"unexpected response: {value!r}"
+
+    async def async_probe_capabilities(self) -> StashCapabilities:
+        """Introspect root fields and task inputs in one request."""
+        inputs = " ".join(
+            f'{name}: __type(name: "{name}") {{ inputFields {{ name }} }}'
+            for name in PROBED_INPUT_TYPES
+        )
+        query = (
+            "query { version { version } __schema {"
+            " queryType { fields { name } }"
+            " mutationType { fields { name } }"
+            " subscriptionType { fields { name } } } "
+            'StatsResultType: __type(name: "StatsResultType") { fields { name } } '
+            f"{inputs} }}"
+        )
+        data = await self._post(query)
+
+        def _names(node: dict[str, Any] | None, key: str) -> frozenset[str]:
+            return frozenset(item["name"] for item in (node or {}).get(key) or ())
+
+        try:
+            payload = data["data"]
+            schema = payload["__schema"]
+            return StashCapabilities(
+                version=str(payload["version"]["version"]),
+                query_fields=_names(schema.get("queryType"), "fields"),
+                mutation_fields=_names(schema.get("mutationType"), "fields"),
+                subscription_fields=_names(schema.get("subscriptionType"), "fields"),
+                stats_fields=_names(payload.get("StatsResultType"), "fields"),
+                input_fields={
+                    name: _names(payload.get(name), "inputFields")
+                    for name in PROBED_INPUT_TYPES
+                },
+            )
+        except (KeyError, TypeError) as exc:
+            raise StashError(f"Unexpected introspection response: {data}") from exc
+
+    async def async_get_scenes_count(self) -> int:
+        data = await self._post("query { findScenes { count } }")
+        return int(data["data"]["findScenes"]["count"])
+
+    async def async_get_movies_count(self) -> int:
+        """Return number of movies/groups (supporting old/new schemas)."""
+        if self.capabilities is not None:
+            name = self.capabilities.resolve(COUNT_FIELDS["movies"])
+            if name is None:
+                raise StashError("Stash has neither findGroups nor findMovies")
+            data = await self._post(f"query {{ {name} {{ count }} }}")
+            return int(data["data"][name]["count"])
+
+        # Newer Stash versions: Groups
+        data = await self._post_allow_errors("query { findGroups { count } }")
+        if "data" in data and data["data"] and data["data"].get("findGroups"):
+            try:
+                return int(data["data"]["findGroups"]["count"])
+            except (KeyError, TypeError, ValueError):
+                pass
+
+        # Older versions: Movies
+        data = await self._post_allow_errors("query { findMovies { count } }")
+        if "errors" in data or "data" not in data:
+            raise StashError(
+                f"GraphQL error getting movies/groups: {data.get('errors')}"
+            )
+
+        try:
+            return int(data["data"]["findMovies"]["count"])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise StashError(
+                f"Unexpected response for movies/groups count: {data}"
+            ) from exc
+
+    async def async_get_performers_count(self) -> int:
+        data = await self._post("query { findPerformers { count } }")
+        return int(data["data"]["findPerformers"]["count"])
+
+    async def async_get_studios_count(self) -> int:
+        data = await self._post("query { findStudios { count } }")
+        return int(data["data"]["findStudios"]["count"])
+
+    async def async_get_tags_count(self) -> int:
+        data = await self._post("query { findTags { count } }")
+        return int(data["data"]["findTags"]["count"])
+
+    async def async_get_images_count(self) -> int:
+        data = await self._post("query { findImages { count } }")
+        return int(data["data"]["findImages"]["count"])
+
+    async def async_get_galleries_count(self) -> int:
+        data = await self._post("query { findGalleries { count } }")
+        return int(data["data"]["findGalleries"]["count"])
+
+    async def async_get_markers_count(self) -> int:
+        data = await self._post("query { findSceneMarkers { count } }")
+        return int(data["data"]["findSceneMarkers"]["count"])
+
+    async def async_get_version(self) -> str | None:
+        """Return Stash version string (e.g. 'v0.28.1')."""
+        data = await self._post(VERSION_QUERY)
+        try:
+            return str(data["data"]["version"]["version"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _browse_kind(self, kind: str) -> BrowseKind:
+        candidates = BROWSE_KINDS[kind]
+        if self.capabilities is None:
+            return candidates[0]
+        for candidate in candidates:
+            if candidate.root in self.capabilities.query_fields:
+                return candidate
+        raise StashError(f"Stash cannot list {kind}")
+
+    async def async_find_page(
+        self,
+        kind: str,
+        page: int,
+        per_page: int,
+        parent: tuple[str, str] | None = None,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Return the total and one page of scenes or of a browsable object list.
+
+        ``parent`` is a ``(kind, id)`` pair limiting scenes to one
+        performer, studio, tag or group. Only the requested page is
+        fetched, however big the library is.
+        """
+        find_filter: dict[str, Any] = {"page": page, "per_page": per_page}
+        variables: dict[str, Any] = {"filter": find_filter}
+        if kind == "scenes":
+            find_filter.update(sort="created_at", direction="DESC")
+            root, list_key, fields = "findScenes", "scenes", SCENE_FIELDS
+            if parent is not None:
+                parent_kind, parent_id = parent
+                criterion = self._browse_kind(parent_kind).criterion
+                variables["scene_filter"] = {
+                    criterion: {"value": [parent_id], "modifier": "INCLUDES"}
+                }
+            query = (
+                "query FindPage($filter: FindFilterType, $scene_filter: SceneFilterType) "
+                f"{{ {root}(filter: $filter, scene_filter: $scene_filter) "
+                f"{{ count {list_key} {{ {fields} }} }} }}"
+            )
+        else:
+            find_filter.update(sort="name", direction="ASC")
+            root, list_key, fields = self._browse_kind(kind)[:3]
+            query = (
+                "query FindPage($filter: FindFilterType) "
+                f"{{ {root}(filter: $filter) {{ count {list_key} {{ {fields} }} }} }}"
+            )
+
+        data = await self._post(query, variables)
+        try:
+            result = data["data"][root]
+            return int(result["count"]), list(result[list_key] or [])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise StashError(f"Unexpected response for {root}: {data}") from exc
+
+    async def async_find_scene(self, scene_id: str) -> dict[str, Any] | None:
+        """Return one scene with its stream URLs and file format."""
+        data = await self._post(
+            "query FindScene($id: ID!) "
+            f"{{ findScene(id: $id) {{ {SCENE_PLAY_FIELDS} }} }}",
+            {"id": scene_id},
+        )
+        return (data.get("data") or {}).get("findScene")
+
+    async def async_search_scenes(
+        self, find_filter: dict[str, Any], scene_filter: dict[str, Any]
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Return the total and the matching scenes, from the cache if fresh.
+
+        Filters go out as GraphQL variables; identical searches running at
+        the same time share one request (see ``_request``). A ``random``
+        sort is never cached: each call must draw a new set.
+        """
+        key = json.dumps([find_filter, scene_filter], sort_keys=True)
+        cacheable = find_filter.get("sort") != "random"
+        cached = self.search_cache.get(key) if cacheable else None
+        if cached is not None:
+            return cached
+        data = await self._post(
+            "query SearchScenes($filter: FindFilterType, $scene_filter: SceneFilterType) "
+            "{ findScenes(filter: $filter, scene_filter: $scene_filter) "
+            f"{{ count scenes {{ {SEARCH_SCENE_FIELDS} }} }} }}",
+            {"filter": find_filter, "scene_filter": scene_filter},
+        )
+        try:
+            result = data["data"]["findScenes"]
+            found = int(result["count"]), list(result["scenes"] or [])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise StashError(f"Unexpected response for findScenes: {data}") from exc
+        if cacheable:
+            self.search_cache.set(key, found)
+        return found
+
+    async def async_find_recent(
+        self,
+        kind: str,
+        sort: str,
+        direction: str,
+        page: int,
+        per_page: int,
+        since: str | None = None,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Return the total and one page of scenes or images, sorted by a timestamp.
+
+        With ``since`` only objects whose ``sort`` field is after it are
+        counted and listed.
+        """
+        root, list_key, filter_arg, filter_type = FEED_ROOTS[kind]
+        variables: dict[str, Any] = {
+            "filter": {
+                "page": page,
+                "per_page": per_page,
+                "sort": sort,
+                "direction": direction,
+            },
+            "object_filter": (
+                {sort: {"value": since, "modifier": "GREATER_THAN"}} if since else {}
+            ),
+        }
+        data = await self._post(
+            f"query FindRecent($filter: FindFilterType, $object_filter: {filter_type}) "
+            f"{{ {root}(filter: $filter, {filter_arg}: $object_filter) "
+            f"{{ count {list_key} {{ {FEED_FIELDS} }} }} }}",
+            variables,
+        )
+        try:
+            result = data["data"][root]
+            return int(result["count"]), list(result[list_key] or [])
+        except (KeyError, TypeError, ValueError) as exc:
+            raise StashError(f"Unexpected response for {root}: {data}") from exc
+
+    async def async_resolve_names(self, kind: str, names: Iterable[str]) -> dict[str, str]:
+        """Map exact performer/studio/tag names to IDs in one batched query.
+
+        Resolved names are cached; unknown ones are asked again next time.
+        """
+        resolved: dict[str, str] = {}
+        for name in set(names):
+            if (object_id := self.name_cache.get((kind, name))) is not None:
+                resolved[name] = object_id
+        names = sorted(set(names) - resolved.keys())
+        if not names:
+            return resolved
+        root, list_key = self._browse_kind(kind)[:2]
+        name_filter = NAME_FILTERS[kind]
+        params = ", ".join(f"$n{index}: String!" for index in range(len(names)))
+        body = " ".join(
+            f"n{index}: {root}({name_filter}: "
+            f"{{ name: {{ value: $n{index}, modifier: EQUALS }} }}) {{ {list_key} {{ id }} }}"
+            for index in range(len(names))
+        )
+        data = await self._post(
+            f"query ResolveNames({params}) {{ {body} }}",
+            {f"n{index}": name for index, name in enumerate(names)},
+        )
+        result = (data or {}).get("data") or {}
+        for index, name in enumerate(names):
+            found = ((result.get(f"n{index}") or {}).get(list_key)) or []
+            if found:
+                resolved[name] = str(found[0]["id"])
+                self.name_cache.set((kind, name), resolved[name])
+        return resolved
+
+    async def async_save_activity(
+        self, activity: dict[str, dict[str, Any]]
+    ) -> set[str]:
+        """Record plays and resume points of several scenes in one request.
+
+        ``activity`` maps scene IDs to ``plays`` (ISO timestamps),
+        ``duration`` (seconds watched) and ``resume`` (position or None).
+        Returns the scene IDs whose writes failed and should be retried.
+        """
+        mutations = self.capabilities.mutation_fields if self.capabilities else frozenset()
+        add_play = "sceneAddPlay" if not mutations or "sceneAddPlay" in mutations else None
+        params: list[str] = []
+        body: list[str] = []
+        variables: dict[str, Any] = {}
+        aliases: dict[str, str] = {}
+        for index, (scene_id, item) in enumerate(activity.items()):
+            plays = item.get("plays") or []
+            if not (plays or item.get("duration") or item.get("resume") is not None):
+                # Неиспользованная переменная — ошибка валидации всего документа
+                continue
+            params.append(f"$id{index}: ID!")
+            variables[f"id{index}"] = scene_id
+            if item.get("duration") or item.get("resume") is not None:
+                params += [f"$r{index}: Float", f"$d{index}: Float"]
+                variables[f"r{index}"] = item.get("resume")
+                variables[f"d{index}"] = item.get("duration") or None
+                body.append(
+                    f"a{index}: sceneSaveActivity(id: $id{index}, "
+                    f"resume_time: $r{index}, playDuration: $d{index})"
+                )
+                aliases[f"a{index}"] = scene_id
+            if plays and add_play:
+                params.append(f"$t{index}: [Timestamp!]")
+                variables[f"t{index}"] = plays
+                body.append(f"p{index}: sceneAddPlay(id: $id{index}, times: $t{index}) {{ count }}")
+                aliases[f"p{index}"] = scene_id
+            else:
+                # Старые версии Stash: только счётчик, по одному вызову на просмотр
+                for play in range(len(plays)):
+                    body.append(f"p{index}_{play}: sceneIncrementPlayCount(id: $id{index})")
+                    aliases[f"p{index}_{play}"] = scene_id
+        if not body:
+            return set()
+
+        data = await self._post_allow_errors(
+            f"mutation SaveActivity({', '.join(params)}) {{ {' '.join(body)} }}", variables
+        )
+        errors = data.get("errors") or []
+        if data.get("data") is None or any(not error.get("path") for error in errors):
+            _LOGGER.warning("Stash rejected play activity: %s", errors)
+            return set(activity)
+        return {
+            aliases[error["path"][0]] for error in errors if error["path"][0] in aliases
+        }
+
+    @property
+    def base_url(self) -> str:
+        """Stash server URL without the ``/graphql`` endpoint."""
+        return self._url.removesuffix("/graphql")
+
+    def image_path(self, kind: str, object_id: str) -> str | None:
+        """Server path of the screenshot or image of one scene or object."""
+        if not object_id.isdigit():
+            return None
+        if kind == "scenes":
+            return SCENE_IMAGE.format(id=object_id)
+        if kind == "images":
+            return IMAGE_THUMBNAIL.format(id=object_id)
+        if kind not in BROWSE_KINDS:
+            return None
+        try:
+            return self._browse_kind(kind).image.format(id=object_id)
+        except StashError:
+            return None
+
+    async def async_open_image(
+        self, path: str, headers: dict[str, str]
+    ) -> aiohttp.ClientResponse:
+        """Start a GET of an image on the Stash server.
+
+        The body is not read here, so it can be streamed; the caller must
+        release the response.
+        """
+        if self.breaker.state != STATE_CLOSED:
+            raise StashUnavailableError(f"Stash unavailable (circuit {self.breaker.state})")
+        try:
+            async with async_timeout.timeout(10):
+                resp = await self._session.get(f"{self.base_url}/{path}", headers=headers)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            raise StashConnectionError(f"Cannot reach Stash: {err!r}") from err
+        if resp.status >= 500:
+            resp.release()
+            raise StashConnectionError(f"HTTP {resp.status} from Stash")
+        return resp
+
+    async def async_get_job_queue(self) -> list[dict[str, Any]]:
+        """Return jobs that are queued or running on the server."""
+        data = await self._post(f"query {{ jobQueue {{ {JOB_FIELDS} }} }}")
+        return list(data["data"].get("jobQueue") or [])
+
+    async def async_find_job(self, job_id: str) -> dict[str, Any] | None:
+        """Return a single job, including finished ones (``findJob``)."""
+        if self.capabilities is not None and "findJob" not in self.capabilities.query_fields:
+            return None
+        data = await self._post(
+            # error есть в схеме вместе с findJob
+            f'query {{ findJob(input: {{ id: "{job_id}" }}) {{ {JOB_FIELDS} error }} }}'
+        )
+        return data["data"].get("findJob")
+
+    async def async_stop_job(self, job_id: str) -> None:
+        """Ask Stash to stop a queued or running job."""
+        await self._post(
+            "mutation StopJob($id: ID!) { stopJob(job_id: $id) }", {"id": job_id}
+        )
+
+    @staticmethod
+    def _job_id(data: dict[str, Any], mutation: str) -> str | None:
+        """Extract the job ID a task mutation returns."""
+        job_id = (data.get("data") or {}).get(mutation)
+        return str(job_id) if job_id is not None else None
+
+    async def _async_run_task(
+        self,
+        mutation: str,
+        document: str,
+        variables: dict[str, Any] | None = None,
+        exclusive: bool = True,
+    ) -> str | None:
+        """Start a heavy task unless an equivalent job is already queued.
+
+        Returns the ID of the new job, or of the queued/running one the
+        request was merged into. Presses of the same task are serialized,
+        so a double click cannot slip two mutations past the check.
+        Non-exclusive tasks (scoped scans) only merge into a queued job
+        with exactly the same input.
+        """
+        key = document
+        if variables:
+            key += "\n" + json.dumps(variables, sort_keys=True)
+        lock = self._task_locks.setdefault(mutation, asyncio.Lock())
+        async with lock:
+            queue = await self.async_get_job_queue()
+            queued = {str(job["id"]): job for job in queue}
+            # Завершённые задачи больше не с чем объединять
+            self._task_jobs = {
+                task: job_id
+                for task, job_id in self._task_jobs.items()
+                if job_id in queued
+            }
+            own = self._task_jobs.get(key)
+            if own in queued:
+                _LOGGER.info("Stash %s already queued as job %s", mutation, own)
+                return own
+            prefix = HEAVY_TASKS[mutation]
+            for job_id, job in queued.items() if exclusive else ():
+                if str(job.get("description") or "").startswith(prefix):
+                    _LOGGER.info(
+                        "Stash %s skipped: job %s (%s) is already queued",
+                        mutation,
+                        job_id,
+                        job.get("description"),
+                    )
+                    return job_id
+
+            data = await self._post(document, variables)
+            job_id = self._job_id(data, mutation)
+            if job_id is not None:
+                self._task_jobs[key] = job_id
+            return job_id
+
+    def _task_input(self, type_name: str, values: dict[str, Any]) -> dict[str, Any]:
+        """Drop input fields this server's schema does not have."""
+        if self.capabilities is None or not self.capabilities.input_fields.get(type_name):
+            return values
+        return {
+            name: value
+            for name, value in values.items()
+            if self.capabilities.has_input(type_name, name)
+        }
+
+    async def async_metadata_scan(
+        self, paths: list[str] | None = None, options: dict[str, Any] | None = None
+    ) -> str | None:
+        """Trigger library scan and return its job ID.
+
+        Without ``paths`` the whole library is scanned; ``options`` are
+        ScanMetadataInput flags (e.g. ``scanGeneratePhashes``).
+        """
+        if not paths and not options:
+            return await self._async_run_task(
+                "metadataScan", "mutation { metadataScan(input:{}) }"
+            )
+        scan_input = self._task_input("ScanMetadataInput", dict(options or {}))
+        if paths:
+            scan_input["paths"] = sorted(paths)
+        return await self._async_run_task(
+            "metadataScan",
+            "mutation Scan($input: ScanMetadataInput!) { metadataScan(input: $input) }",
+            {"input": scan_input},
+            exclusive=not paths,
+        )
+
+    async def async_metadata_clean(self) -> str | None:
+        """Run metadataClean (Tools -> Clean)."""
+        query = 'mutation { metadataClean(input: {dryRun: false, paths: ""}) }'
+        return await self._async_run_task("metadataClean", query)
+
+    async def async_metadata_generate(
+        self, options: dict[str, Any] | None = None
+    ) -> str | None:
+        """Run metadataGenerate and return its job ID.
+
+        Without ``options`` the task settings from the Stash UI are used;
+        otherwise they are GenerateMetadataInput fields (``sceneIDs`` and
+        ``paths`` scope the run).
+        """
+        if not options:
+            # Используются настройки задачи Generate из UI Stash
+            return await self._async_run_task(
+                "metadataGenerate", "mutation { metadataGenerate(input: {}) }"
+            )
+        if options.get("paths") and not self._task_input(
+            "GenerateMetadataInput", {"paths": True}
+        ):
+            raise StashError("This Stash version cannot generate by path")
+        generate_input = self._task_input("GenerateMetadataInput", dict(options))
+        return await self._async_run_task(
+            "metadataGenerate",
+            "mutation Generate($input: GenerateMetadataInput!) "
+            "{ metadataGenerate(input: $input) }",
+            {"input": generate_input},
+            exclusive=not (options.get("sceneIDs") or options.get("paths")),
+        )
+
+    async def async_metadata_auto_tag(self) -> str | None:
+        """Run metadataAutoTag using default task settings."""
+        # Используются настройки задачи Auto Tag из UI Stash
+        return await self._async_run_task(
+            "metadataAutoTag", "mutation { metadataAutoTag(input: {}) }"
+        )
+
+    async def async_get_stash_boxes(self) -> list[dict[str, Any]]:
+        """Return the stash-boxes configured on the server (endpoint, name)."""
+        data = await self._post(
+            "query { configuration { general { stashBoxes { endpoint name } } } }"
+        )
+        try:
+            boxes = data["data"]["configuration"]["general"]["stashBoxes"]
+        except (KeyError, TypeError) as exc:
+            raise StashError(f"Unexpected response for configuration: {data}") from exc
+        return [box for box in boxes or [] if box.get("endpoint")]
+
+    async def async_list_scenes(
+        self,
+        scene_filter: dict[str, Any],
+        per_page: int,
+        fields: str = "id created_at",
+        limit: int | None = None,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Page through matching scenes, oldest first.
+
+        Returns the total and the scenes with ``fields``; paging stops
+        after ``limit`` scenes, so the list may be shorter than the total.
+        """
+        scenes: list[dict[str, Any]] = []
+        page = 1
+        while True:
+            data = await self._post(
+                "query ListScenes($filter: FindFilterType, $scene_filter: SceneFilterType) "
+                "{ findScenes(filter: $filter, scene_filter: $scene_filter) "
+                f"{{ count scenes {{ {fields} }} }} }}",
+                {
+                    "filter": {
+                        "page": page,
+                        "per_page": per_page,
+                        "sort": "created_at",
+                        "direction": "ASC",
+                    },
+                    "scene_filter": scene_filter,
+                },
+            )
+            try:
+                result = data["data"]["findScenes"]
+                count, found = int(result["count"]), list(result["scenes"] or [])
+            except (KeyError, TypeError, ValueError) as exc:
+                raise StashError(f"Unexpected response for findScenes: {data}") from exc
+            scenes.extend(found)
+            if not found or len(scenes) >= count:
+                return count, scenes
+            if limit is not None and len(scenes) >= limit:
+                return count, scenes[:limit]
+            page += 1
+
+    async def async_find_duplicate_scenes(
+        self, distance: int, fields: str = "id title"
+    ) -> list[list[dict[str, Any]]]:
+        """Groups of scenes whose phashes differ by at most ``distance``.
+
+        ``findDuplicateScenes`` has no paging; only ``fields`` are asked
+        for to keep the response small.
+        """
+        data = await self._post(
+            "query FindDuplicates($distance: Int) "
+            f"{{ findDuplicateScenes(distance: $distance) {{ {fields} }} }}",
+            {"distance": distance},
+        )
+        try:
+            return [list(group) for group in data["data"]["findDuplicateScenes"] or []]
+        except (KeyError, TypeError) as exc:
+            raise StashError(f"Unexpected response for findDuplicateScenes: {data}") from exc
+
+    async def async_metadata_identify(
+        self, endpoints: list[str] | None = None, scene_ids: list[str] | None = None
+    ) -> str | None:
+        """Запустить Identify по указанным stash-box endpoints.
+
+        Без ``endpoints`` используется StashDB; без ``scene_ids``
+        идентифицируется вся библиотека.
+        """
+        identify_input: dict[str, Any] = {
+            "sources": [
+                {"source": {"stash_box_endpoint": endpoint}}
+                for endpoint in endpoints or [IDENTIFY_DEFAULT_ENDPOINT]
+            ]
+        }
+        if scene_ids:
+            identify_input["sceneIDs"] = list(scene_ids)
+        return await self._async_run_task(
+            "metadataIdentify",
+            "mutation Identify($input: IdentifyMetadataInput!) "
+            "{ metadataIdentify(input: $input) }",
+            {"input": identify_input},
+            exclusive=not scene_ids,
+        )
@@ -4,12 +4,13 @@ from typing import Any
 
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN
 from . import StashDataUpdateCoordinator
+from .breaker import STATE_CLOSED
 
 
 async def async_setup_entry(
@@ -43,8 +44,36 @@ class StashOnlineBinarySensor(CoordinatorEntity, BinarySensorEntity):
             manufacturer="Stash",
         )
 
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # Обрыв и восстановление видны сразу, а не при следующем опросе
+        self.async_on_remove(
+            self.coordinator.client.breaker.add_listener(self._async_breaker_changed)
+        )
+
+    @callback
+    def _async_breaker_changed(self, _state: str) -> None:
+        self.async_write_ha_state()
+
     @property
     def is_on(self) -> bool:
-        """Return True if last coordinator update succeeded."""
+        """Return True if last update succeeded and the breaker is closed."""
         # Если последнее обновление провалилось — HA поставит last_update_success = False
-        return bool(self.coordinator.last_update_success)
+        breaker = self.coordinator.client.breaker
+        return bool(self.coordinator.last_update_success) and breaker.state == STATE_CLOSED
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        breaker = self.coordinator.client.breaker
+        retry_in = breaker.retry_in
+        return {
+            "circuit_state": breaker.state,
+            "consecutive_failures": breaker.failures,
+            "retry_in_s": round(retry_in, 1) if retry_in is not None else None,
+            "latency_ms": _ms(breaker.last_latency),
+            "last_probe_latency_ms": _ms(breaker.last_probe_latency),
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
@@ -0,0 +1,100 @@
+"""Circuit breaker that keeps an offline Stash from stalling every refresh."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import random
+import time
+
+from .const import (
+    BREAKER_BACKOFF_MAX,
+    BREAKER_BACKOFF_MIN,
+    BREAKER_FAILURE_THRESHOLD,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker with jittered exponential backoff.
+
+    ``closed``: requests go through, transport failures are counted.
+    ``open``: requests fail fast until ``retry_at``.
+    ``half_open``: a single recovery probe is in flight; everything else
+    still fails fast.
+
+    Listeners are called with the new state on every transition, so the
+    state can be shown (and a probe scheduled) without waiting for the
+    next request.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        backoff_min: float = BREAKER_BACKOFF_MIN,
+        backoff_max: float = BREAKER_BACKOFF_MAX,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._backoff_min = backoff_min
+        self._backoff_max = backoff_max
+        self._backoff = backoff_min
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.retry_at: float | None = None
+        self.last_probe_latency: float | None = None
+        self.last_latency: float | None = None
+        self._listeners: list[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``listener(state)`` on state changes; return the remover."""
+        self._listeners.append(listener)
+
+        def _remove() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return _remove
+
+    def _set_state(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        for listener in list(self._listeners):
+            listener(state)
+
+    @property
+    def retry_in(self) -> float | None:
+        """Seconds until the next recovery probe, if open."""
+        if self.state != STATE_OPEN or self.retry_at is None:
+            return None
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def probe_due(self) -> bool:
+        return self.state == STATE_OPEN and (self.retry_in or 0.0) <= 0.0
+
+    def start_probe(self) -> None:
+        self._set_state(STATE_HALF_OPEN)
+
+    def record_success(self, latency: float | None = None) -> None:
+        if latency is not None:
+            self.last_latency = latency
+            if self.state == STATE_HALF_OPEN:
+                self.last_probe_latency = latency
+        self.failures = 0
+        self.retry_at = None
+        self._backoff = self._backoff_min
+        self._set_state(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN:
+            # Проба не прошла — ждём дольше
+            self._backoff = min(self._backoff * 2, self._backoff_max)
+            self._open()
+        elif self.state == STATE_CLOSED and self.failures >= self._failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.retry_at = time.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+        self._set_state(STATE_OPEN)
@@ -9,6 +9,8 @@ from homeassistant.helpers.entity import DeviceInfo
 
 from .const import DOMAIN
 from . import StashClient
+from .identify import StashIdentifier
+from .jobs import StashJobCoordinator
 
 
 async def async_setup_entry(
@@ -19,13 +21,14 @@ async def async_setup_entry(
     """Set up Stash buttons."""
     data: dict[str, Any] = hass.data[DOMAIN][entry.entry_id]
     client: StashClient = data["client"]
+    jobs: StashJobCoordinator = data["jobs"]
 
     entities: list[ButtonEntity] = [
-        StashScanLibraryButton(client, entry),
-        StashCleanLibraryButton(client, entry),
-        StashGenerateMetadataButton(client, entry),
-        StashAutoTagButton(client, entry),
-        StashIdentifyScenesButton(client, entry),
+        StashScanLibraryButton(client, jobs, entry),
+        StashCleanLibraryButton(client, jobs, entry),
+        StashGenerateMetadataButton(client, jobs, entry),
+        StashAutoTagButton(client, jobs, entry),
+        StashIdentifyScenesButton(client, jobs, entry, data["identifier"]),
     ]
 
     async_add_entities(entities)
@@ -36,8 +39,11 @@ class _BaseStashButton(ButtonEntity):
 
     _attr_has_entity_name = True
 
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
+    def __init__(
+        self, client: StashClient, jobs: StashJobCoordinator, entry: ConfigEntry
+    ) -> None:
         self._client = client
+        self._jobs = jobs
         self._entry = entry
         self._attr_device_info = DeviceInfo(
             identifiers={(DOMAIN, entry.entry_id)},
@@ -49,64 +55,84 @@ class _BaseStashButton(ButtonEntity):
 class StashScanLibraryButton(_BaseStashButton):
     """Button to trigger library scan in Stash."""
 
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
-        super().__init__(client, entry)
+    def __init__(
+        self, client: StashClient, jobs: StashJobCoordinator, entry: ConfigEntry
+    ) -> None:
+        super().__init__(client, jobs, entry)
         self._attr_unique_id = f"{entry.entry_id}_scan_library"
         self._attr_name = "Scan Library"
         self._attr_icon = "mdi:database-search"
 
     async def async_press(self) -> None:
-        await self._client.async_metadata_scan()
+        job_id = await self._client.async_metadata_scan()
+        await self._jobs.async_track(job_id)
 
 
 class StashCleanLibraryButton(_BaseStashButton):
     """Button to trigger metadataClean in Stash (Tools -> Clean)."""
 
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
-        super().__init__(client, entry)
+    def __init__(
+        self, client: StashClient, jobs: StashJobCoordinator, entry: ConfigEntry
+    ) -> None:
+        super().__init__(client, jobs, entry)
         self._attr_unique_id = f"{entry.entry_id}_clean_library"
         self._attr_name = "Clean Library"
         self._attr_icon = "mdi:broom"
 
     async def async_press(self) -> None:
-        await self._client.async_metadata_clean()
+        job_id = await self._client.async_metadata_clean()
+        await self._jobs.async_track(job_id)
 
 
 class StashGenerateMetadataButton(_BaseStashButton):
     """Button to trigger metadataGenerate in Stash."""
 
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
-        super().__init__(client, entry)
+    def __init__(
+        self, client: StashClient, jobs: StashJobCoordinator, entry: ConfigEntry
+    ) -> None:
+        super().__init__(client, jobs, entry)
         self._attr_unique_id = f"{entry.entry_id}_generate_metadata"
         self._attr_name = "Generate Metadata"
         self._attr_icon = "mdi:auto-fix"
 
     async def async_press(self) -> None:
-        await self._client.async_metadata_generate()
+        job_id = await self._client.async_metadata_generate()
+        await self._jobs.async_track(job_id)
 
 
 class StashAutoTagButton(_BaseStashButton):
     """Button to trigger metadataAutoTag in Stash."""
 
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
-        super().__init__(client, entry)
+    def __init__(
+        self, client: StashClient, jobs: StashJobCoordinator, entry: ConfigEntry
+    ) -> None:
+        super().__init__(client, jobs, entry)
         self._attr_unique_id = f"{entry.entry_id}_auto_tag"
         self._attr_name = "Auto Tag"
         # такая же иконка, как у Tags Count
         self._attr_icon = "mdi:tag-multiple"
 
     async def async_press(self) -> None:
-        await self._client.async_metadata_auto_tag()
+        job_id = await self._client.async_metadata_auto_tag()
+        await self._jobs.async_track(job_id)
 
 
 class StashIdentifyScenesButton(_BaseStashButton):
-    """Button to trigger metadataIdentify in Stash."""
-
-    def __init__(self, client: StashClient, entry: ConfigEntry) -> None:
-        super().__init__(client, entry)
+    """Button to trigger metadataIdentify in Stash (new or unmatched scenes)."""
+
+    def __init__(
+        self,
+        client: StashClient,
+        jobs: StashJobCoordinator,
+        entry: ConfigEntry,
+        identifier: StashIdentifier,
+    ) -> None:
+        super().__init__(client, jobs, entry)
+        self._identifier = identifier
         self._attr_unique_id = f"{entry.entry_id}_identify_scenes"
         self._attr_name = "Identify Scenes"
         self._attr_icon = "mdi:magnify-scan"
 
     async def async_press(self) -> None:
-        await self._client.async_metadata_identify()
+        # Пачки сцен идут одна за другой — это может занять часы
+        self._identifier.async_start()
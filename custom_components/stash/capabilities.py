@@ -0,0 +1,63 @@
+"""Per-entry cache of Stash schema capabilities."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .api import StashCapabilities, StashClient
+from .const import DOMAIN, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+# Увеличивать, когда async_probe_capabilities начинает собирать новые данные:
+# старый кеш тогда будет перезапрошен, даже если версия Stash не менялась.
+CAPABILITIES_REVISION = 2
+
+
+class StashCapabilityCache:
+    """Load capabilities from ``Store`` and re-probe only on a new version."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, client: StashClient) -> None:
+        self._client = client
+        self._store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.capabilities"
+        )
+
+    async def async_load(self) -> StashCapabilities | None:
+        """Set ``client.capabilities`` at setup, probing if nothing is stored.
+
+        A stored result is used without touching the network; the version
+        reported by the next refresh decides whether it is still valid
+        (see ``async_ensure``).
+        """
+        stored = await self._store.async_load()
+        if stored and stored.get("revision") == CAPABILITIES_REVISION:
+            self._client.capabilities = StashCapabilities.from_dict(stored)
+            return self._client.capabilities
+        return await self.async_probe()
+
+    async def async_ensure(self, version: str | None) -> None:
+        """Re-probe when the server reports a version we have not seen."""
+        current = self._client.capabilities
+        if version is None or (current is not None and current.version == version):
+            return
+        _LOGGER.info("Stash version changed to %s, re-probing schema", version)
+        await self.async_probe()
+
+    async def async_probe(self) -> StashCapabilities | None:
+        try:
+            capabilities = await self._client.async_probe_capabilities()
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Stash schema introspection failed: %s", err)
+            return self._client.capabilities
+
+        self._client.capabilities = capabilities
+        await self._store.async_save(
+            {**capabilities.as_dict(), "revision": CAPABILITIES_REVISION}
+        )
+        return capabilities
+
+    async def async_remove(self) -> None:
+        await self._store.async_remove()
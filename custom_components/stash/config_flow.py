@@ -3,17 +3,42 @@ from __future__ import annotations
 import logging
 from typing import Any
 
+import async_timeout
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
-from .const import DOMAIN, CONF_URL
+from .api import StashError
+from .const import (
+    DOMAIN,
+    CONF_AGGREGATE,
+    CONF_HEALTH_INTERVAL,
+    CONF_IDENTIFY_ENDPOINTS,
+    CONF_IDENTIFY_INCREMENTAL,
+    CONF_LIBRARY_CAPACITY,
+    CONF_PATH_MAP,
+    CONF_TRACK_PLAYS,
+    CONF_URL,
+    CONF_WATCH_FOLDERS,
+    CONF_WATCH_GENERATE,
+    HEALTH_DEFAULT_INTERVAL,
+    HEALTH_MIN_INTERVAL,
+    MIN_SCAN_INTERVAL,
+    TIER_INTERVALS,
+)
+from .discovery import async_discover_stash
 
 _LOGGER = logging.getLogger(__name__)
 
+# Выбор "ввести адрес вручную" в списке найденных серверов
+MANUAL = "manual"
+# Выбор "сводка по всем серверам"; он же unique_id такой записи
+AGGREGATE = "aggregate"
+
 
 async def _normalize_and_test_url(hass: HomeAssistant, url: str) -> str:
     """Нормализовать введённый адрес и проверить, что это Stash GraphQL.
@@ -39,11 +64,12 @@ async def _normalize_and_test_url(hass: HomeAssistant, url: str) -> str:
     session = async_get_clientsession(hass)
     payload = {"query": "query { version { version } }"}
 
-    async with session.post(graphql_url, json=payload) as resp:
-        if resp.status != 200:
-            text = await resp.text()
-            raise RuntimeError(f"HTTP {resp.status}: {text}")
-        data = await resp.json()
+    async with async_timeout.timeout(10):
+        async with session.post(graphql_url, json=payload) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise RuntimeError(f"HTTP {resp.status}: {text}")
+            data = await resp.json()
 
     if "errors" in data or "data" not in data:
         raise RuntimeError(f"GraphQL error: {data.get('errors')}")
@@ -56,6 +82,26 @@ class StashConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> StashOptionsFlow:
+        return StashOptionsFlow()
+
+    @classmethod
+    @callback
+    def async_supports_options_flow(
+        cls, config_entry: config_entries.ConfigEntry
+    ) -> bool:
+        # У сводки своих настроек нет
+        return not config_entry.data.get(CONF_AGGREGATE)
+
+    def __init__(self) -> None:
+        # Результат поиска в сети — один раз за сеанс мастера
+        self._discovered: dict[str, str] | None = None
+        self._manual = False
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -70,25 +116,13 @@ class StashConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 _LOGGER.warning("Cannot connect to Stash at %s: %s", raw_url, err)
                 errors["base"] = "cannot_connect"
             else:
-                # ДЕЛАЕМ интеграцию МНОГОЭКЗЕМПЛЯРНОЙ:
-                # unique_id = сам URL /graphql.
-                # Это позволяет добавлять несколько разных Stash (разные URL),
-                # но не даёт создать дубль на один и тот же экземпляр.
-                await self.async_set_unique_id(graphql_url)
-                self._abort_if_unique_id_configured()
+                return await self._async_create_entry(graphql_url)
 
-                # Красивый заголовок по host:port
-                from urllib.parse import urlparse
-
-                parsed = urlparse(graphql_url)
-                host = parsed.hostname or graphql_url
-                port = parsed.port
-                pretty = f"{host}:{port}" if port else host
-
-                return self.async_create_entry(
-                    title=f"Stash {pretty}",
-                    data={CONF_URL: graphql_url},
-                )
+        elif not self._manual:
+            if self._discovered is None:
+                self._discovered = await async_discover_stash(self.hass)
+            if self._unconfigured() or self._aggregate_available():
+                return await self.async_step_pick()
 
         data_schema = vol.Schema(
             {
@@ -104,3 +138,140 @@ class StashConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 "example": "192.168.1.50:9999 или http://192.168.1.50:9999",
             },
         )
+
+    def _unconfigured(self) -> dict[str, str]:
+        """Discovered servers that are not set up yet, as form choices."""
+        configured = self._async_current_ids()
+        return {
+            url: f"Stash {version} ({url.removesuffix('/graphql')})"
+            for url, version in (self._discovered or {}).items()
+            if url not in configured
+        }
+
+    def _aggregate_available(self) -> bool:
+        """At least one server is set up and the totals device is not."""
+        configured = self._async_current_ids()
+        return AGGREGATE not in configured and bool(configured)
+
+    async def async_step_pick(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose one of the servers found on the local network."""
+        if user_input is not None:
+            if user_input[CONF_URL] == MANUAL:
+                self._manual = True
+                return await self.async_step_user()
+            if user_input[CONF_URL] == AGGREGATE:
+                await self.async_set_unique_id(AGGREGATE)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title="Stash (all servers)", data={CONF_AGGREGATE: True}
+                )
+            return await self._async_create_entry(user_input[CONF_URL])
+
+        choices = self._unconfigured()
+        if self._aggregate_available():
+            choices[AGGREGATE] = "Totals of all configured Stash servers"
+        choices[MANUAL] = "Enter address manually"
+        return self.async_show_form(
+            step_id="pick",
+            data_schema=vol.Schema({vol.Required(CONF_URL): vol.In(choices)}),
+        )
+
+    async def _async_create_entry(self, graphql_url: str) -> FlowResult:
+        # ДЕЛАЕМ интеграцию МНОГОЭКЗЕМПЛЯРНОЙ:
+        # unique_id = сам URL /graphql.
+        # Это позволяет добавлять несколько разных Stash (разные URL),
+        # но не даёт создать дубль на один и тот же экземпляр.
+        await self.async_set_unique_id(graphql_url)
+        self._abort_if_unique_id_configured()
+
+        # Красивый заголовок по host:port
+        from urllib.parse import urlparse
+
+        parsed = urlparse(graphql_url)
+        host = parsed.hostname or graphql_url
+        port = parsed.port
+        pretty = f"{host}:{port}" if port else host
+
+        return self.async_create_entry(
+            title=f"Stash {pretty}",
+            data={CONF_URL: graphql_url},
+        )
+
+
+class StashOptionsFlow(config_entries.OptionsFlow):
+    """Интервалы (в секундах), учёт просмотров, скан папок и Identify."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        fields: dict[Any, Any] = {
+            vol.Required(option, default=options.get(option, default)): vol.All(
+                vol.Coerce(int), vol.Range(min=MIN_SCAN_INTERVAL)
+            )
+            for option, default in TIER_INTERVALS.values()
+        }
+        # Анализ дубликатов и проблемных сцен — дорогой, поэтому редко
+        fields[
+            vol.Required(
+                CONF_HEALTH_INTERVAL,
+                default=options.get(CONF_HEALTH_INTERVAL, HEALTH_DEFAULT_INTERVAL),
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=HEALTH_MIN_INTERVAL))
+        # Объём диска под библиотеку, ГБ — для прогноза заполнения (0 — нет)
+        fields[
+            vol.Optional(
+                CONF_LIBRARY_CAPACITY, default=options.get(CONF_LIBRARY_CAPACITY, 0)
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=0))
+        # Учёт просмотров с медиаплееров HA — только по желанию
+        fields[
+            vol.Required(CONF_TRACK_PLAYS, default=options.get(CONF_TRACK_PLAYS, False))
+        ] = bool
+        # Скан только изменившихся папок по событиям folder_watcher
+        fields[
+            vol.Required(CONF_WATCH_FOLDERS, default=options.get(CONF_WATCH_FOLDERS, False))
+        ] = bool
+        fields[
+            vol.Required(
+                CONF_WATCH_GENERATE, default=options.get(CONF_WATCH_GENERATE, False)
+            )
+        ] = bool
+        fields[
+            vol.Optional(CONF_PATH_MAP, default=options.get(CONF_PATH_MAP, ""))
+        ] = str
+        # Identify: только новые и ненайденные сцены, по выбранным stash-box
+        fields[
+            vol.Required(
+                CONF_IDENTIFY_INCREMENTAL,
+                default=options.get(CONF_IDENTIFY_INCREMENTAL, True),
+            )
+        ] = bool
+        if boxes := await self._async_stash_boxes():
+            selected = [
+                endpoint
+                for endpoint in options.get(CONF_IDENTIFY_ENDPOINTS, list(boxes))
+                if endpoint in boxes
+            ]
+            fields[
+                vol.Optional(CONF_IDENTIFY_ENDPOINTS, default=selected)
+            ] = cv.multi_select(boxes)
+        data_schema = vol.Schema(fields)
+        return self.async_show_form(step_id="init", data_schema=data_schema)
+
+    async def _async_stash_boxes(self) -> dict[str, str]:
+        """Stash-boxes configured on the server, ``{endpoint: name}``."""
+        data = self.hass.data.get(DOMAIN, {}).get(self.config_entry.entry_id)
+        if data is None:
+            return {}
+        try:
+            boxes = await data["client"].async_get_stash_boxes()
+        except StashError as err:
+            _LOGGER.debug("Cannot read stash-boxes of the server: %s", err)
+            return {}
+        return {box["endpoint"]: box.get("name") or box["endpoint"] for box in boxes}
@@ -7,3 +7,171 @@ CONF_URL = HA_CONF_URL
 
 # Интервал опроса Stash (в секундах)
 DEFAULT_SCAN_INTERVAL = 300
+
+# Уровни обновления: у каждого свой координатор и свой интервал
+TIER_MEDIA = "media"
+TIER_TAXONOMY = "taxonomy"
+TIER_VERSION = "version"
+
+TIER_KEYS: dict[str, tuple[str, ...]] = {
+    TIER_MEDIA: (
+        "scenes",
+        "images",
+        "galleries",
+        "markers",
+        "scenes_size",
+        "images_size",
+        "scenes_duration",
+        "scenes_played",
+        "total_play_count",
+        "total_play_duration",
+        "total_o_count",
+    ),
+    TIER_TAXONOMY: ("movies", "performers", "studios", "tags"),
+    TIER_VERSION: ("version",),
+}
+
+# Опции: интервал каждого уровня, в секундах
+CONF_MEDIA_INTERVAL = "media_interval"
+CONF_TAXONOMY_INTERVAL = "taxonomy_interval"
+CONF_VERSION_INTERVAL = "version_interval"
+
+TIER_INTERVALS: dict[str, tuple[str, int]] = {
+    TIER_MEDIA: (CONF_MEDIA_INTERVAL, DEFAULT_SCAN_INTERVAL),
+    TIER_TAXONOMY: (CONF_TAXONOMY_INTERVAL, 3600),
+    TIER_VERSION: (CONF_VERSION_INTERVAL, 86400),
+}
+MIN_SCAN_INTERVAL = 30
+
+# Версия формата данных в homeassistant.helpers.storage.Store
+STORAGE_VERSION = 1
+
+# Опрос-подстраховка, пока открыта подписка (websocket), в секундах
+SUBSCRIBED_SCAN_INTERVAL = 3600
+
+# Переподключение подписки: экспоненциальный backoff, в секундах
+SUBSCRIPTION_BACKOFF_MIN = 2
+SUBSCRIPTION_BACKOFF_MAX = 300
+
+# Опрос очереди задач: пока задачи идут / в простое, в секундах
+JOB_ACTIVE_SCAN_INTERVAL = 3
+JOB_IDLE_SCAN_INTERVAL = 600
+
+# Задержка записи последнего состояния на диск, в секундах
+STATE_SAVE_DELAY = 30
+
+# Circuit breaker: сколько сбоев подряд открывают цепь и backoff пробы, в секундах
+BREAKER_FAILURE_THRESHOLD = 2
+BREAKER_BACKOFF_MIN = 15
+BREAKER_BACKOFF_MAX = 600
+
+# Сколько последних запросов каждой операции хранится для p50/p95
+METRICS_WINDOW = 200
+
+# Медиа-браузер: размер страницы и LRU-кэш просмотренных страниц
+BROWSE_PAGE_SIZE = 50
+BROWSE_CACHE_SIZE = 64
+BROWSE_CACHE_TTL = 300
+
+# Прокси картинок: кэш в памяти (мелкие картинки) и на диске, в байтах
+IMAGE_CACHE_DIR = ".stash_images"
+IMAGE_MEMORY_ITEMS = 256
+IMAGE_MEMORY_MAX_ITEM = 256 * 1024
+IMAGE_DISK_MAX_BYTES = 256 * 1024 * 1024
+# Через сколько секунд кэшированную картинку перепроверять у Stash (ETag)
+IMAGE_REVALIDATE_AFTER = 3600
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Срок подписи URL картинок (секунд): <img> не шлёт заголовок авторизации
+IMAGE_URL_EXPIRY = 24 * 3600
+IMAGE_SIGNED_URLS = 1024
+
+# Сервис stash.search: кэш результатов (записей, секунд) и предел выдачи
+SEARCH_CACHE_SIZE = 128
+SEARCH_CACHE_TTL = 60
+# Имена тегов/исполнителей/студий -> ID (записей; TTL как у поиска)
+NAME_CACHE_SIZE = 512
+SEARCH_MAX_RESULTS = 100
+
+# Очередь правок: сколько секунд копить правки и сколько ID в одном bulk-запросе
+WRITE_FLUSH_DELAY = 0.5
+WRITE_BATCH_SIZE = 100
+
+# Учёт просмотров с медиаплееров HA (опция), в секундах
+CONF_TRACK_PLAYS = "track_plays"
+PLAY_FLUSH_DELAY = 60
+PLAY_SAVE_DELAY = 10
+# Сколько нужно посмотреть, чтобы засчитать просмотр
+PLAY_MIN_DURATION = 30
+
+# Поиск Stash в локальной сети (мастер настройки)
+STASH_DEFAULT_PORT = 9999
+DISCOVERY_CONCURRENCY = 64
+DISCOVERY_HOST_TIMEOUT = 1.5
+DISCOVERY_TIMEOUT = 15
+DISCOVERY_MAX_HOSTS = 1024
+
+# Сервис stash.run_pipeline: предел ожидания одного шага по умолчанию, в секундах
+PIPELINE_STEP_TIMEOUT = 4 * 3600
+
+# Скан изменившихся папок по событиям folder_watcher (опция)
+CONF_WATCH_FOLDERS = "watch_folders"
+CONF_WATCH_GENERATE = "watch_generate"
+# Соответствие путей HA и Stash: "/media/video=/data/video", через запятую
+CONF_PATH_MAP = "path_map"
+# Тишина после последнего события и предел ожидания, в секундах
+WATCH_DEBOUNCE = 30
+WATCH_MAX_DELAY = 300
+WATCH_MAX_PATHS = 10
+# Повтор скана, который не удалось запустить: от WATCH_DEBOUNCE с удвоением
+WATCH_RETRY_MAX = 1800
+# Недокачанные и временные файлы не повод для скана
+WATCH_IGNORED_SUFFIXES = (".part", ".tmp", ".crdownload", ".!qb", ".aria2")
+# Что генерировать для новых файлов во время такого скана
+WATCH_SCAN_GENERATE = (
+    "scanGenerateCovers",
+    "scanGeneratePreviews",
+    "scanGenerateSprites",
+    "scanGeneratePhashes",
+    "scanGenerateThumbnails",
+)
+
+# Identify: stash-box endpoints (опция) и инкрементальный режим
+CONF_IDENTIFY_ENDPOINTS = "identify_endpoints"
+CONF_IDENTIFY_INCREMENTAL = "identify_incremental"
+# Если на сервере не настроено ни одного stash-box
+IDENTIFY_DEFAULT_ENDPOINT = "https://stashdb.org/graphql"
+# Сколько сцен читать за страницу и отдавать в одну задачу metadataIdentify
+IDENTIFY_PAGE_SIZE = 500
+IDENTIFY_BATCH_SIZE = 200
+
+# Анализ здоровья библиотеки (дубликаты, без файлов и т.п.): редко и в фоне
+CONF_HEALTH_INTERVAL = "health_interval"
+HEALTH_DEFAULT_INTERVAL = 86400
+HEALTH_MIN_INTERVAL = 3600
+# Первый анализ — не сразу после старта HA; занятый сервер — позже, в секундах
+HEALTH_START_DELAY = 600
+HEALTH_BUSY_RETRY = 900
+HEALTH_PAGE_SIZE = 250
+# Сколько сцен (групп дубликатов) каждой проверки хранить для сервиса
+HEALTH_MAX_ITEMS = 5000
+# Расстояние phash для дубликатов: 0 — "точное" совпадение, как в UI Stash
+HEALTH_PHASH_DISTANCE = 0
+
+# Лента "недавно добавленного": сколько объектов помнить для сенсора,
+# размер страницы и предел объектов (событий) за одно обновление
+FEED_BUFFER_SIZE = 20
+FEED_PAGE_SIZE = 100
+FEED_MAX_ITEMS = 1000
+
+# Тренды роста библиотеки: точка не чаще раза в час, буфер на 8 суток
+TREND_SAMPLE_INTERVAL = 3600
+TREND_BUFFER_SIZE = 24 * 8
+# Объём диска под библиотеку (ГБ) для прогноза заполнения; 0 — не задан
+CONF_LIBRARY_CAPACITY = "library_capacity"
+
+# Сводка по всем серверам Stash (отдельная запись): ключ в entry.data
+CONF_AGGREGATE = "aggregate"
+# Сколько обновлений разных серверов идёт одновременно
+AGGREGATE_CONCURRENCY = 2
+# Как часто пересчитывать возраст данных между обновлениями серверов, секунд
+AGGREGATE_AGE_INTERVAL = 60
@@ -0,0 +1,152 @@
+"""Data update coordinators for Stash counters."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import timedelta
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .api import COUNT_FIELDS, StashClient
+from .capabilities import StashCapabilityCache
+from .const import (
+    DOMAIN,
+    STATE_SAVE_DELAY,
+    STORAGE_VERSION,
+    SUBSCRIBED_SCAN_INTERVAL,
+    TIER_KEYS,
+    TIER_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def counter_unique_id(entry_id: str, key: str) -> str:
+    """Unique ID of the sensor that shows ``key``."""
+    if key in COUNT_FIELDS:
+        return f"{entry_id}_{key}_count"
+    return f"{entry_id}_{key}"
+
+
+def state_store(hass: HomeAssistant, entry_id: str, tier: str) -> Store:
+    """Store with the last successful payload of one tier."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.state.{tier}")
+
+
+class StashDataUpdateCoordinator(DataUpdateCoordinator):
+    """Coordinator that periodically fetches one tier of Stash counters.
+
+    Each tier (media, taxonomy, version) has its own interval. Only the
+    keys selected by ``async_select_keys`` are put into the query, so
+    disabled sensors cost nothing. The version tier always asks for
+    ``version``: it is how schema changes are detected. ``changed_keys``
+    lists what the last refresh actually changed, so entities can skip
+    writing identical state.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: StashClient,
+        tier: str,
+        interval: int,
+        capability_cache: StashCapabilityCache | None = None,
+        entry_id: str | None = None,
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"Stash {tier}",
+            update_interval=timedelta(seconds=interval),
+        )
+        self.client = client
+        self.tier = tier
+        self.keys: tuple[str, ...] = TIER_KEYS[tier]
+        self._interval = interval
+        # Свой интервал опроса; при расписании сводки свой таймер выключен
+        self.poll_interval = timedelta(seconds=interval)
+        self._managed = False
+        self._capability_cache = capability_cache
+        self._store = state_store(hass, entry_id, tier) if entry_id else None
+        # Ключи, значения которых изменились при последнем обновлении
+        self.changed_keys: set[str] = set()
+        self.suppressed_writes = 0
+
+    @callback
+    def async_select_keys(self, keys: Iterable[str]) -> None:
+        """Limit the query to ``keys`` (e.g. the enabled sensors)."""
+        self.keys = tuple(key for key in TIER_KEYS[self.tier] if key in set(keys))
+
+    @callback
+    def async_set_push_mode(self, connected: bool) -> None:
+        """Poll only as a safety net while subscription events drive refreshes."""
+        seconds = self._interval
+        if connected:
+            seconds = max(seconds, SUBSCRIBED_SCAN_INTERVAL)
+        self.poll_interval = timedelta(seconds=seconds)
+        self._apply_interval()
+
+    @callback
+    def async_set_managed(self, managed: bool) -> None:
+        """Let the aggregate hub schedule refreshes instead of the own timer."""
+        self._managed = managed
+        self._apply_interval()
+        if not managed:
+            # Свой таймер заводится заново только после обновления
+            self.hass.async_create_task(self.async_request_refresh())
+
+    def _apply_interval(self) -> None:
+        self.update_interval = None if self._managed else self.poll_interval
+
+    async def async_restore(self) -> bool:
+        """Load the last persisted payload into ``data``; True if there was one."""
+        if self._store is None:
+            return False
+        stored = await self._store.async_load()
+        if not stored:
+            return False
+        self.data = stored
+        return True
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        """Fetch data from Stash."""
+        with_version = self.tier == TIER_VERSION
+        counters = [key for key in self.keys if key != "version"]
+        if not counters and not with_version:
+            # Все сенсоры этого уровня отключены — запрос не нужен
+            return {}
+
+        start = time.monotonic()
+        try:
+            result = await self.client.async_get_library_counts(counters, with_version)
+        except Exception as err:  # noqa: BLE001
+            raise UpdateFailed(f"Error communicating with Stash: {err}") from err
+        finally:
+            self.client.metrics.record_refresh(self.tier, time.monotonic() - start)
+
+        if not result.data:
+            raise UpdateFailed(f"Error communicating with Stash: {result.errors}")
+        for key, error in result.errors.items():
+            # Одно упавшее поле не должно ронять всё обновление
+            _LOGGER.debug("Stash field %s unavailable: %s", key, error)
+
+        if with_version and self._capability_cache is not None:
+            await self._capability_cache.async_ensure(result.data.get("version"))
+
+        keys = [*counters, "version"] if with_version else counters
+        data = {key: result.data.get(key) for key in keys}
+        previous = self.data or {}
+        self.changed_keys = {
+            key for key in data if key not in previous or previous[key] != data[key]
+        }
+        if self._store is not None:
+            # Отложенная запись: частые обновления не дёргают диск
+            self._store.async_delay_save(lambda: data, STATE_SAVE_DELAY)
+        return data
@@ -0,0 +1,53 @@
+"""Diagnostics support for Stash."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .aggregate import AGGREGATE_DATA
+from .const import CONF_AGGREGATE, CONF_URL, DOMAIN
+
+TO_REDACT = {CONF_URL}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return request metrics, breaker state and coordinator status."""
+    if entry.data.get(CONF_AGGREGATE):
+        hub = hass.data.get(AGGREGATE_DATA)
+        return {"aggregate": hub.data if hub is not None else None}
+    data: dict[str, Any] = hass.data[DOMAIN][entry.entry_id]
+    client = data["client"]
+    breaker = client.breaker
+    capabilities = client.capabilities
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "capabilities": capabilities.as_dict() if capabilities else None,
+        "breaker": {
+            "state": breaker.state,
+            "failures": breaker.failures,
+            "retry_in": breaker.retry_in,
+            "last_latency": breaker.last_latency,
+            "last_probe_latency": breaker.last_probe_latency,
+        },
+        "metrics": client.metrics.as_dict(),
+        "coordinators": {
+            tier: {
+                "last_update_success": coordinator.last_update_success,
+                "update_interval": str(coordinator.update_interval),
+                "keys": list(coordinator.keys),
+                "suppressed_writes": coordinator.suppressed_writes,
+                "data": coordinator.data,
+            }
+            for tier, coordinator in data["coordinators"].items()
+        },
+        "jobs": data["jobs"].data,
+    }
@@ -0,0 +1,85 @@
+"""Find Stash servers on the local network."""
+from __future__ import annotations
+
+import asyncio
+from ipaddress import IPv4Address, ip_network
+import logging
+
+import aiohttp
+
+from homeassistant.components import network
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .api import VERSION_QUERY
+from .const import (
+    DISCOVERY_CONCURRENCY,
+    DISCOVERY_HOST_TIMEOUT,
+    DISCOVERY_MAX_HOSTS,
+    DISCOVERY_TIMEOUT,
+    STASH_DEFAULT_PORT,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def _async_candidate_hosts(hass: HomeAssistant) -> list[str]:
+    """Addresses of the local IPv4 subnets, at most a /24 around each adapter."""
+    hosts: dict[str, None] = {"127.0.0.1": None}
+    for adapter in await network.async_get_adapters(hass):
+        if not adapter["enabled"]:
+            continue
+        for ipv4 in adapter["ipv4"]:
+            address = IPv4Address(ipv4["address"])
+            if address.is_loopback or address.is_link_local:
+                continue
+            # Большие сети не сканируем целиком — только /24 вокруг адреса
+            prefix = max(int(ipv4["network_prefix"]), 24)
+            subnet = ip_network(f"{address}/{prefix}", strict=False)
+            hosts.update(dict.fromkeys(str(host) for host in subnet.hosts()))
+    return list(hosts)[:DISCOVERY_MAX_HOSTS]
+
+
+async def async_probe_stash(
+    session: aiohttp.ClientSession, graphql_url: str, timeout: float
+) -> str | None:
+    """Return the Stash version behind ``graphql_url``, or None."""
+    try:
+        async with session.post(
+            graphql_url,
+            json={"query": VERSION_QUERY},
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as resp:
+            if resp.status != 200:
+                return None
+            data = await resp.json(content_type=None)
+        return str(data["data"]["version"]["version"])
+    except (asyncio.TimeoutError, aiohttp.ClientError, ValueError, KeyError, TypeError):
+        return None
+
+
+async def async_discover_stash(hass: HomeAssistant) -> dict[str, str]:
+    """Probe the local subnets for Stash; return ``{graphql_url: version}``.
+
+    Hosts are probed on the default port with bounded concurrency and a
+    short per-host timeout, and the whole scan is capped, so unreachable
+    (blackholed) addresses cannot stall the config flow.
+    """
+    hosts = await _async_candidate_hosts(hass)
+    session = async_get_clientsession(hass)
+    semaphore = asyncio.Semaphore(DISCOVERY_CONCURRENCY)
+    found: dict[str, str] = {}
+
+    async def _probe(host: str) -> None:
+        url = f"http://{host}:{STASH_DEFAULT_PORT}/graphql"
+        async with semaphore:
+            version = await async_probe_stash(session, url, DISCOVERY_HOST_TIMEOUT)
+        if version is not None:
+            found[url] = version
+
+    tasks = [asyncio.create_task(_probe(host)) for host in hosts]
+    _, pending = await asyncio.wait(tasks, timeout=DISCOVERY_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    _LOGGER.debug("Probed %d hosts for Stash, found %s", len(hosts), found)
+    return found
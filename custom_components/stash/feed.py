@@ -0,0 +1,218 @@
+"""Feed of scenes and images added or updated since the last refresh."""
+from __future__ import annotations
+
+from collections import deque
+from copy import deepcopy
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt_util
+
+from .api import StashClient, StashError
+from .const import (
+    DOMAIN,
+    FEED_BUFFER_SIZE,
+    FEED_MAX_ITEMS,
+    FEED_PAGE_SIZE,
+    STATE_SAVE_DELAY,
+    STORAGE_VERSION,
+    SUBSCRIBED_SCAN_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_ITEM_ADDED = f"{DOMAIN}_item_added"
+EVENT_ITEM_UPDATED = f"{DOMAIN}_item_updated"
+
+# Вид объекта в запросах -> "type" в данных событий
+FEED_KINDS: dict[str, str] = {"scenes": "scene", "images": "image"}
+
+
+def feed_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with the feed cursors and the recently added objects."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.feed")
+
+
+def _parse(stamp: str | None) -> datetime | None:
+    return dt_util.parse_datetime(stamp) if stamp else None
+
+
+def _is_after(cursor: dict[str, Any], field: str, item: dict[str, Any]) -> bool:
+    """Whether the item's timestamp is past ``cursor[field]``.
+
+    Stash timestamps have one-second resolution, so IDs seen within the
+    cursor's second are kept to tell them from new ones.
+    """
+    stamp = _parse(item.get(field))
+    current = _parse(cursor.get(field))
+    if stamp is None:
+        return False
+    if current is None or stamp > current:
+        return True
+    return stamp == current and str(item["id"]) not in cursor.get(f"{field}_ids", [])
+
+
+def _advance(cursor: dict[str, Any], field: str, item: dict[str, Any]) -> bool:
+    """Move ``cursor[field]`` to the item's timestamp; False if already seen."""
+    if not _is_after(cursor, field, item):
+        return False
+    stamp = _parse(item.get(field))
+    current = _parse(cursor.get(field))
+    if current is None or stamp > current:
+        cursor[field] = item[field]
+        cursor[f"{field}_ids"] = [str(item["id"])]
+    else:
+        cursor.setdefault(f"{field}_ids", []).append(str(item["id"]))
+    return True
+
+
+class StashFeedCoordinator(DataUpdateCoordinator):
+    """Fetch only what changed since a persisted cursor, fire events for it.
+
+    Per kind, the cursor is the newest ``updated_at`` (and ``created_at``)
+    seen. A refresh pages ``findScenes`` / ``findImages`` filtered to
+    objects updated after the cursor, oldest first, so its cost follows
+    the number of changes rather than the library size. Each object fires
+    ``stash_item_added`` (created after the cursor) or
+    ``stash_item_updated``; added ones also go into a bounded buffer.
+    The first refresh only sets the cursors, without events.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, client: StashClient, entry_id: str, interval: int
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="Stash feed",
+            update_interval=timedelta(seconds=interval),
+        )
+        self.client = client
+        self._entry_id = entry_id
+        self._interval = interval
+        self._store = feed_store(hass, entry_id)
+        self._cursors: dict[str, dict[str, Any]] = {}
+        # Новые — слева
+        self._recent: dict[str, deque[dict[str, Any]]] = {
+            kind: deque(maxlen=FEED_BUFFER_SIZE) for kind in FEED_KINDS
+        }
+
+    @callback
+    def async_set_push_mode(self, connected: bool) -> None:
+        """Poll only as a safety net while subscription events drive refreshes."""
+        seconds = self._interval
+        if connected:
+            seconds = max(seconds, SUBSCRIBED_SCAN_INTERVAL)
+        self.update_interval = timedelta(seconds=seconds)
+
+    async def async_restore(self) -> None:
+        """Load cursors and recently added objects."""
+        stored = await self._store.async_load() or {}
+        self._cursors = stored.get("cursors") or {}
+        for kind, items in (stored.get("recent") or {}).items():
+            if kind in self._recent:
+                self._recent[kind].extend(items)
+        self.data = self._build_data()
+
+    def _build_data(self) -> dict[str, list[dict[str, Any]]]:
+        return {kind: list(items) for kind, items in self._recent.items()}
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"cursors": self._cursors, "recent": self._build_data()}
+
+    async def _async_update_data(self) -> dict[str, list[dict[str, Any]]]:
+        capped = False
+        try:
+            for kind in FEED_KINDS:
+                if kind in self._cursors:
+                    capped |= await self._async_poll(kind)
+                else:
+                    await self._async_seed(kind)
+        except StashError as err:
+            raise UpdateFailed(f"Error communicating with Stash: {err}") from err
+        finally:
+            # Курсор сохраняем и после частичного обновления — события не повторятся
+            self._store.async_delay_save(self._data_to_save, STATE_SAVE_DELAY)
+        if capped:
+            # Остальное — следующим обновлением, без ожидания интервала
+            self.hass.async_create_task(self.async_request_refresh())
+        return self._build_data()
+
+    async def _async_seed(self, kind: str) -> None:
+        """Start from the current state: newest objects, no events."""
+        cursor: dict[str, Any] = {}
+        _, latest = await self.client.async_find_recent(
+            kind, "created_at", "DESC", 1, FEED_BUFFER_SIZE
+        )
+        _, changed = await self.client.async_find_recent(
+            kind, "updated_at", "DESC", 1, FEED_BUFFER_SIZE
+        )
+        for item in latest:
+            _advance(cursor, "created_at", item)
+        for item in changed:
+            _advance(cursor, "updated_at", item)
+        self._recent[kind].clear()
+        self._recent[kind].extend(latest)
+        self._cursors[kind] = cursor
+
+    async def _async_poll(self, kind: str) -> bool:
+        """Handle objects updated after the cursor; True if the cap was hit.
+
+        Objects come in ``updated_at`` order, not ``created_at`` order, so
+        "added" is decided against the cursors as they were when the poll
+        started; the stored cursors move only after a whole page.
+        """
+        start = deepcopy(self._cursors[kind])
+        cursor = deepcopy(start)
+        handled = 0
+        page = 1
+        while handled < FEED_MAX_ITEMS:
+            since = _parse(cursor.get("updated_at"))
+            # Та же секунда, что у курсора, тоже нужна — отсекаем по IDs
+            count, items = await self.client.async_find_recent(
+                kind,
+                "updated_at",
+                "ASC",
+                page,
+                FEED_PAGE_SIZE,
+                (since - timedelta(seconds=1)).isoformat() if since else None,
+            )
+            for item in items:
+                if self._handle(kind, start, cursor, item):
+                    handled += 1
+            self._cursors[kind] = deepcopy(cursor)
+            if not items or page * FEED_PAGE_SIZE >= count:
+                return False
+            # Курсор сдвинулся — запрос с новым началом; нет — следующая страница
+            page = page + 1 if _parse(cursor.get("updated_at")) == since else 1
+        return True
+
+    def _handle(
+        self,
+        kind: str,
+        start: dict[str, Any],
+        cursor: dict[str, Any],
+        item: dict[str, Any],
+    ) -> bool:
+        if not _advance(cursor, "updated_at", item):
+            return False
+        added = _is_after(start, "created_at", item)
+        _advance(cursor, "created_at", item)
+        if added:
+            self._recent[kind].appendleft(item)
+        self.hass.bus.async_fire(
+            EVENT_ITEM_ADDED if added else EVENT_ITEM_UPDATED,
+            {
+                "config_entry_id": self._entry_id,
+                "type": FEED_KINDS[kind],
+                "id": str(item["id"]),
+                "title": item.get("title"),
+                "created_at": item.get("created_at"),
+                "updated_at": item.get("updated_at"),
+            },
+        )
+        return True
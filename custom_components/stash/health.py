@@ -0,0 +1,169 @@
+"""Library health analysis: duplicates and scenes that need attention."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt_util
+
+from .api import StashClient, StashError
+from .const import (
+    CONF_HEALTH_INTERVAL,
+    DOMAIN,
+    HEALTH_BUSY_RETRY,
+    HEALTH_DEFAULT_INTERVAL,
+    HEALTH_MAX_ITEMS,
+    HEALTH_PAGE_SIZE,
+    HEALTH_PHASH_DISTANCE,
+    HEALTH_START_DELAY,
+    STORAGE_VERSION,
+)
+from .jobs import StashJobCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+HEALTH_DUPLICATES = "duplicates"
+
+# Проверка -> SceneFilterType
+HEALTH_FILTERS: dict[str, dict[str, Any]] = {
+    "missing_files": {"file_count": {"value": 0, "modifier": "EQUALS"}},
+    "unorganized": {"organized": False},
+    "no_performers": {"is_missing": "performers"},
+    "no_tags": {"is_missing": "tags"},
+}
+
+HEALTH_CHECKS: tuple[str, ...] = (HEALTH_DUPLICATES, *HEALTH_FILTERS)
+
+HEALTH_SCENE_FIELDS = "id title"
+
+
+def health_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with the result of the last library analysis."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.health")
+
+
+class StashHealthAnalyzer(DataUpdateCoordinator):
+    """Run the expensive library checks rarely, one run at a time.
+
+    The checks do not belong in the counter tiers: ``findDuplicateScenes``
+    compares every phash on the server. They run on their own long
+    interval, are postponed while the server has jobs queued, and query
+    one check after another in pages. Results (counts and up to
+    ``HEALTH_MAX_ITEMS`` scenes per check) survive restarts in a Store.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        client: StashClient,
+        jobs: StashJobCoordinator,
+    ) -> None:
+        interval = entry.options.get(CONF_HEALTH_INTERVAL, HEALTH_DEFAULT_INTERVAL)
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=entry,
+            name="Stash library health",
+            update_interval=timedelta(seconds=interval),
+        )
+        self._client = client
+        self._jobs = jobs
+        self._store = health_store(hass, entry.entry_id)
+        self._lock = asyncio.Lock()
+        self._result: dict[str, Any] = {}
+        self._manual = False
+        self._unsub_later: CALLBACK_TYPE | None = None
+        entry.async_on_unload(self._async_cancel_later)
+
+    async def async_restore(self) -> None:
+        """Load the last result; schedule a run soon if it is outdated."""
+        stored = await self._store.async_load()
+        if stored:
+            self.data = self._result = stored
+        checked = dt_util.parse_datetime(stored["checked"]) if stored else None
+        if checked is None or dt_util.utcnow() - checked > self.update_interval:
+            self._async_schedule(HEALTH_START_DELAY)
+
+    async def async_analyze_now(self) -> None:
+        """Analyze right away, even if the server is busy (service call)."""
+        self._manual = True
+        try:
+            await self.async_refresh()
+        finally:
+            self._manual = False
+        if not self.last_update_success:
+            raise HomeAssistantError("Stash library analysis failed")
+
+    @callback
+    def _async_schedule(self, delay: float) -> None:
+        self._async_cancel_later()
+        self._unsub_later = async_call_later(self.hass, delay, self._async_run_later)
+
+    @callback
+    def _async_cancel_later(self) -> None:
+        if self._unsub_later is not None:
+            self._unsub_later()
+            self._unsub_later = None
+
+    @callback
+    def _async_run_later(self, _now: Any) -> None:
+        self._unsub_later = None
+        self.hass.async_create_task(self.async_refresh())
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        if self._lock.locked():
+            # Анализ уже идёт — второй не запускаем, ждём его результат
+            async with self._lock:
+                return self._result
+        async with self._lock:
+            if not self._manual and (self._jobs.data or {}).get("queue"):
+                _LOGGER.debug("Stash has jobs queued, library analysis postponed")
+                self._async_schedule(HEALTH_BUSY_RETRY)
+                return self._result
+            self._result = await self._async_analyze()
+            await self._store.async_save(self._result)
+            return self._result
+
+    async def _async_analyze(self) -> dict[str, Any]:
+        previous: dict[str, Any] = self._result.get("checks") or {}
+        checks: dict[str, Any] = {}
+        failed: list[str] = []
+        for check in HEALTH_CHECKS:
+            try:
+                if check == HEALTH_DUPLICATES:
+                    groups = await self._client.async_find_duplicate_scenes(
+                        HEALTH_PHASH_DISTANCE, HEALTH_SCENE_FIELDS
+                    )
+                    count, items = len(groups), groups[:HEALTH_MAX_ITEMS]
+                else:
+                    count, items = await self._client.async_list_scenes(
+                        HEALTH_FILTERS[check],
+                        HEALTH_PAGE_SIZE,
+                        HEALTH_SCENE_FIELDS,
+                        HEALTH_MAX_ITEMS,
+                    )
+            except StashError as err:
+                # Например, старый Stash без file_count — остальные проверки идут
+                _LOGGER.debug("Stash health check %s failed: %s", check, err)
+                failed.append(check)
+                if check in previous:
+                    checks[check] = previous[check]
+                continue
+            checks[check] = {"count": count, "items": items}
+
+        if len(failed) == len(HEALTH_CHECKS):
+            raise UpdateFailed("Error communicating with Stash: all health checks failed")
+        return {
+            "checked": dt_util.utcnow().isoformat(),
+            "failed": failed,
+            "checks": checks,
+        }
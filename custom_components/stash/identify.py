@@ -0,0 +1,157 @@
+"""Identify scenes against stash-boxes, only what is new or still unmatched."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+
+from .api import StashClient, StashError
+from .const import (
+    CONF_IDENTIFY_ENDPOINTS,
+    CONF_IDENTIFY_INCREMENTAL,
+    DOMAIN,
+    IDENTIFY_BATCH_SIZE,
+    IDENTIFY_DEFAULT_ENDPOINT,
+    IDENTIFY_PAGE_SIZE,
+    STORAGE_VERSION,
+)
+from .jobs import StashJobCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def identify_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with the high-water mark of the last successful identify run."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.identify")
+
+
+class StashIdentifier:
+    """Run ``metadataIdentify`` with the configured stash-box endpoints.
+
+    In incremental mode only scenes without a stash ID, or created after
+    the last successful run, are identified: their IDs are paged from
+    ``findScenes`` and sent as ``sceneIDs`` in bounded batches, one job
+    at a time. The newest ``created_at`` seen is persisted and only moved
+    forward when every batch finished.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        client: StashClient,
+        jobs: StashJobCoordinator,
+    ) -> None:
+        self.hass = hass
+        self._entry = entry
+        self._client = client
+        self._jobs = jobs
+        self._store = identify_store(hass, entry.entry_id)
+        self._lock = asyncio.Lock()
+        self.incremental: bool = entry.options.get(CONF_IDENTIFY_INCREMENTAL, True)
+        self.high_water: str | None = None
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load() or {}
+        self.high_water = data.get("high_water")
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def async_start(self) -> None:
+        """Start a run in the background (button press)."""
+        if self.running:
+            raise HomeAssistantError("Stash identify is already running")
+        self._entry.async_create_background_task(
+            self.hass,
+            self._async_run_logged(),
+            f"{DOMAIN} identify {self._entry.entry_id}",
+        )
+
+    async def _async_run_logged(self) -> None:
+        try:
+            await self.async_run()
+        except StashError as err:
+            _LOGGER.warning("Stash identify failed: %s", err)
+
+    async def async_endpoints(self) -> list[str]:
+        """Endpoints chosen in the options, else all stash-boxes of the server."""
+        if endpoints := self._entry.options.get(CONF_IDENTIFY_ENDPOINTS):
+            return list(endpoints)
+        try:
+            boxes = await self._client.async_get_stash_boxes()
+        except StashError as err:
+            _LOGGER.debug("Cannot read stash-boxes of the server: %s", err)
+            boxes = []
+        return [box["endpoint"] for box in boxes] or [IDENTIFY_DEFAULT_ENDPOINT]
+
+    def _scene_filter(self) -> dict[str, Any]:
+        scene_filter: dict[str, Any] = {"stash_id_endpoint": {"modifier": "IS_NULL"}}
+        if self.high_water:
+            scene_filter["OR"] = {
+                "created_at": {"value": self.high_water, "modifier": "GREATER_THAN"}
+            }
+        return scene_filter
+
+    async def async_run(
+        self, on_job: Callable[[str], None] | None = None
+    ) -> bool:
+        """Identify to the end; return whether every job finished.
+
+        ``on_job`` is called with the ID of each job as it is started.
+        """
+        async with self._lock:
+            endpoints = await self.async_endpoints()
+            if not self.incremental:
+                return await self._async_identify(endpoints, None, on_job)
+
+            _, scenes = await self._client.async_list_scenes(
+                self._scene_filter(), IDENTIFY_PAGE_SIZE
+            )
+            _LOGGER.debug(
+                "Stash identify: %d scenes since %s via %s",
+                len(scenes),
+                self.high_water,
+                endpoints,
+            )
+            scene_ids = [str(scene["id"]) for scene in scenes]
+            for start in range(0, len(scene_ids), IDENTIFY_BATCH_SIZE):
+                batch = scene_ids[start : start + IDENTIFY_BATCH_SIZE]
+                if not await self._async_identify(endpoints, batch, on_job):
+                    # Отметку не двигаем — в следующий раз повторим
+                    return False
+
+            stamps = [str(scene["created_at"]) for scene in scenes if scene.get("created_at")]
+            if stamps and (newest := max(stamps)) != self.high_water:
+                # Время сервера, а не HA — часы могут расходиться
+                self.high_water = newest
+                await self._store.async_save({"high_water": newest})
+            return True
+
+    async def _async_identify(
+        self,
+        endpoints: list[str],
+        scene_ids: list[str] | None,
+        on_job: Callable[[str], None] | None,
+    ) -> bool:
+        job_id = await self._client.async_metadata_identify(endpoints, scene_ids)
+        if job_id is None:
+            raise StashError("Stash did not return a job ID")
+        if on_job is not None:
+            on_job(job_id)
+        waiter = self._jobs.async_wait(job_id)
+        await self._jobs.async_track(job_id)
+        job = await waiter
+        status = str(job.get("status") or "FINISHED")
+        if status != "FINISHED":
+            _LOGGER.warning(
+                "Stash identify job %s ended as %s: %s", job_id, status, job.get("error")
+            )
+        return status == "FINISHED"
@@ -0,0 +1,312 @@
+"""Authenticated, cached proxy for Stash screenshots and images."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import time
+from typing import Any
+from urllib.parse import quote
+
+from aiohttp import hdrs, web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.http.auth import async_sign_path
+from homeassistant.core import HomeAssistant
+
+from .api import StashError
+from .cache import TTLCache
+from .const import (
+    DOMAIN,
+    IMAGE_CACHE_DIR,
+    IMAGE_CHUNK_SIZE,
+    IMAGE_DISK_MAX_BYTES,
+    IMAGE_MEMORY_ITEMS,
+    IMAGE_MEMORY_MAX_ITEM,
+    IMAGE_REVALIDATE_AFTER,
+    IMAGE_SIGNED_URLS,
+    IMAGE_URL_EXPIRY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+IMAGE_URL = "/api/stash/image/{entry_id}/{kind}/{object_id}"
+SIGNED_URLS = f"{DOMAIN}_signed_urls"
+
+
+def image_url(
+    hass: HomeAssistant,
+    entry_id: str,
+    kind: str,
+    object_id: str,
+    version: str | None,
+) -> str:
+    """Signed proxy URL of one image; ``version`` (updated_at) busts the cache.
+
+    The view requires auth and an ``<img>`` tag sends no Authorization
+    header, so the path carries an ``authSig`` valid for
+    ``IMAGE_URL_EXPIRY``.
+    """
+    url = IMAGE_URL.format(entry_id=entry_id, kind=kind, object_id=object_id)
+    if version:
+        url = f"{url}?v={quote(version)}"
+    # Одна подпись на полсрока: иначе URL меняется при каждой записи
+    # состояния и браузер не попадает в свой кэш
+    signed: TTLCache[str, str] = hass.data.setdefault(
+        SIGNED_URLS, TTLCache(IMAGE_SIGNED_URLS, IMAGE_URL_EXPIRY / 2)
+    )
+    if (cached := signed.get(url)) is not None:
+        return cached
+    result = async_sign_path(
+        hass, url, timedelta(seconds=IMAGE_URL_EXPIRY), use_content_user=True
+    )
+    signed.set(url, result)
+    return result
+
+
+@dataclass
+class CachedImage:
+    """Validators and metadata of one cached image; ``body`` only in memory."""
+
+    content_type: str
+    # ETag для клиентов HA: серверный, а если его нет — по ключу кэша
+    client_etag: str
+    etag: str | None
+    last_modified: str | None
+    checked: float
+    size: int
+    body: bytes | None = None
+
+    def meta(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("body")
+        return data
+
+
+class StashImageCache:
+    """Two-level LRU: small bodies in memory, everything on disk by total size."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.directory = Path(hass.config.path(IMAGE_CACHE_DIR))
+        self.memory: TTLCache[str, CachedImage] = TTLCache(IMAGE_MEMORY_ITEMS)
+        self._disk: OrderedDict[str, CachedImage] = OrderedDict()
+        self._disk_bytes = 0
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+
+    def body_path(self, digest: str) -> Path:
+        return self.directory / digest
+
+    async def async_load(self) -> None:
+        """Index the disk cache once, oldest first."""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            entries = await self.hass.async_add_executor_job(self._scan)
+            for digest, image in entries:
+                self._disk[digest] = image
+                self._disk_bytes += image.size
+            self._loaded = True
+            await self._async_evict()
+
+    def _scan(self) -> list[tuple[str, CachedImage]]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found: list[tuple[float, str, CachedImage]] = []
+        for meta_path in self.directory.glob("*.json"):
+            digest = meta_path.stem
+            body_path = self.body_path(digest)
+            try:
+                image = CachedImage(**json.loads(meta_path.read_text()))
+                found.append((body_path.stat().st_mtime, digest, image))
+            except (OSError, ValueError, TypeError):
+                # Битая или неполная запись — удаляем
+                meta_path.unlink(missing_ok=True)
+                body_path.unlink(missing_ok=True)
+        for tmp_path in self.directory.glob("*.tmp"):
+            tmp_path.unlink(missing_ok=True)
+        return [(digest, image) for _, digest, image in sorted(found)]
+
+    def get(self, digest: str) -> CachedImage | None:
+        if (image := self.memory.get(digest)) is not None:
+            return image
+        image = self._disk.get(digest)
+        if image is not None:
+            self._disk.move_to_end(digest)
+        return image
+
+    async def async_revalidated(self, digest: str, image: CachedImage) -> None:
+        """Record a 304 from Stash."""
+        image.checked = time.time()
+        if (on_disk := self._disk.get(digest)) is not None:
+            on_disk.checked = image.checked
+            await self.hass.async_add_executor_job(self._write_meta, digest, image)
+
+    def _write_meta(self, digest: str, image: CachedImage) -> None:
+        meta_path = self.directory / f"{digest}.json"
+        meta_path.write_text(json.dumps(image.meta()))
+        os.utime(self.body_path(digest))
+
+    async def async_store(self, digest: str, tmp_path: Path, image: CachedImage) -> None:
+        """Move a completely downloaded body into the cache."""
+        if image.body is not None:
+            self.memory.set(digest, image)
+        previous = self._disk.pop(digest, None)
+        if previous is not None:
+            self._disk_bytes -= previous.size
+        await self.hass.async_add_executor_job(self._commit, digest, tmp_path, image)
+        self._disk[digest] = CachedImage(**image.meta())
+        self._disk_bytes += image.size
+        await self._async_evict()
+
+    def _commit(self, digest: str, tmp_path: Path, image: CachedImage) -> None:
+        tmp_path.replace(self.body_path(digest))
+        self._write_meta(digest, image)
+
+    async def _async_evict(self) -> None:
+        victims: list[str] = []
+        while self._disk_bytes > IMAGE_DISK_MAX_BYTES and self._disk:
+            digest, image = self._disk.popitem(last=False)
+            self._disk_bytes -= image.size
+            self.memory.pop(digest)
+            victims.append(digest)
+        if victims:
+            await self.hass.async_add_executor_job(self._remove, victims)
+
+    def _remove(self, digests: list[str]) -> None:
+        for digest in digests:
+            self.body_path(digest).unlink(missing_ok=True)
+            (self.directory / f"{digest}.json").unlink(missing_ok=True)
+
+
+class StashImageView(HomeAssistantView):
+    """Serve Stash images to HA clients from the cache.
+
+    Only fixed image paths of configured servers are reachable. Cached
+    images are revalidated against Stash with If-None-Match /
+    If-Modified-Since, new ones are streamed to the client while they
+    are written to disk.
+    """
+
+    url = IMAGE_URL
+    name = "api:stash:image"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.cache = StashImageCache(hass)
+
+    async def get(
+        self, request: web.Request, entry_id: str, kind: str, object_id: str
+    ) -> web.StreamResponse:
+        data = self.hass.data.get(DOMAIN, {}).get(entry_id)
+        if data is None:
+            raise web.HTTPNotFound
+        client = data["client"]
+        path = client.image_path(kind, object_id)
+        if path is None:
+            raise web.HTTPNotFound
+
+        await self.cache.async_load()
+        version = request.query.get("v", "")
+        digest = hashlib.sha1(
+            f"{entry_id}/{kind}/{object_id}/{version}".encode()
+        ).hexdigest()
+        cached = self.cache.get(digest)
+        if cached is not None and time.time() - cached.checked < IMAGE_REVALIDATE_AFTER:
+            return self._serve(request, digest, cached)
+
+        headers: dict[str, str] = {}
+        if cached is not None:
+            if cached.etag:
+                headers[hdrs.IF_NONE_MATCH] = cached.etag
+            if cached.last_modified:
+                headers[hdrs.IF_MODIFIED_SINCE] = cached.last_modified
+        try:
+            resp = await client.async_open_image(path, headers)
+        except StashError as err:
+            if cached is not None:
+                # Stash недоступен — отдаём то, что есть
+                return self._serve(request, digest, cached)
+            _LOGGER.debug("Cannot fetch Stash image %s: %s", path, err)
+            raise web.HTTPBadGateway from err
+
+        try:
+            if resp.status == 304 and cached is not None:
+                await self.cache.async_revalidated(digest, cached)
+                return self._serve(request, digest, cached)
+            if resp.status == 404:
+                raise web.HTTPNotFound
+            if resp.status != 200:
+                raise web.HTTPBadGateway
+            return await self._stream(request, digest, resp)
+        finally:
+            resp.release()
+
+    def _headers(self, image: CachedImage) -> dict[str, str]:
+        headers = {
+            hdrs.ETAG: image.client_etag,
+            hdrs.CACHE_CONTROL: f"private, max-age={IMAGE_REVALIDATE_AFTER}",
+        }
+        if image.last_modified:
+            headers[hdrs.LAST_MODIFIED] = image.last_modified
+        return headers
+
+    def _serve(
+        self, request: web.Request, digest: str, image: CachedImage
+    ) -> web.StreamResponse:
+        headers = self._headers(image)
+        if request.headers.get(hdrs.IF_NONE_MATCH) == image.client_etag:
+            return web.Response(status=304, headers=headers)
+        if image.body is not None:
+            return web.Response(
+                body=image.body, content_type=image.content_type, headers=headers
+            )
+        headers[hdrs.CONTENT_TYPE] = image.content_type
+        # FileResponse отдаёт файл с диска по частям (sendfile)
+        return web.FileResponse(self.cache.body_path(digest), headers=headers)
+
+    async def _stream(
+        self, request: web.Request, digest: str, resp
+    ) -> web.StreamResponse:
+        etag = resp.headers.get(hdrs.ETAG)
+        image = CachedImage(
+            content_type=resp.headers.get(hdrs.CONTENT_TYPE, "image/jpeg"),
+            client_etag=etag or f'"{digest[:20]}"',
+            etag=etag,
+            last_modified=resp.headers.get(hdrs.LAST_MODIFIED),
+            checked=time.time(),
+            size=0,
+        )
+        response = web.StreamResponse(headers=self._headers(image))
+        response.content_type = image.content_type.split(";")[0]
+        await response.prepare(request)
+
+        tmp_path = self.cache.directory / f"{digest}.{id(response)}.tmp"
+        handle = await self.hass.async_add_executor_job(tmp_path.open, "wb")
+        body: bytearray | None = bytearray()
+        try:
+            async for chunk in resp.content.iter_chunked(IMAGE_CHUNK_SIZE):
+                await response.write(chunk)
+                await self.hass.async_add_executor_job(handle.write, chunk)
+                image.size += len(chunk)
+                if body is not None:
+                    body.extend(chunk)
+                    if len(body) > IMAGE_MEMORY_MAX_ITEM:
+                        # Большие картинки держим только на диске
+                        body = None
+            await response.write_eof()
+        except BaseException:
+            await self.hass.async_add_executor_job(handle.close)
+            await self.hass.async_add_executor_job(tmp_path.unlink, True)
+            raise
+        await self.hass.async_add_executor_job(handle.close)
+        image.body = bytes(body) if body is not None else None
+        await self.cache.async_store(digest, tmp_path, image)
+        return response
@@ -0,0 +1,128 @@
+"""Job queue tracking for Stash tasks started from Home Assistant."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .api import StashClient
+from .const import JOB_ACTIVE_SCAN_INTERVAL, JOB_IDLE_SCAN_INTERVAL
+
+_LOGGER = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("FINISHED", "FAILED", "CANCELLED")
+
+
+class StashJobCoordinator(DataUpdateCoordinator):
+    """Poll ``jobQueue`` every few seconds while jobs run, rarely otherwise."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: StashClient,
+        on_job_finished: Callable[[dict[str, Any]], None] | None = None,
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="Stash jobs",
+            update_interval=timedelta(seconds=JOB_IDLE_SCAN_INTERVAL),
+        )
+        self.client = client
+        # ID задач, запущенных из HA и ещё не получивших итог
+        self._tracked: set[str] = set()
+        self._last_result: dict[str, Any] | None = None
+        self._on_job_finished = on_job_finished
+        # ID задачи -> ожидающие её завершения (см. pipeline.py)
+        self._waiters: dict[str, list[asyncio.Future[dict[str, Any]]]] = {}
+
+    async def async_track(self, job_id: str | None) -> None:
+        """Follow a job returned by a task mutation until it ends."""
+        if job_id is None:
+            return
+        self._tracked.add(job_id)
+        self._set_active(True)
+        await self.async_request_refresh()
+
+    @callback
+    def async_wait(self, job_id: str) -> asyncio.Future[dict[str, Any]]:
+        """Future that resolves with the final state of a tracked job."""
+        future: asyncio.Future[dict[str, Any]] = self.hass.loop.create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        return future
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        try:
+            queue = await self.client.async_get_job_queue()
+        except Exception as err:  # noqa: BLE001
+            raise UpdateFailed(f"Error reading Stash job queue: {err}") from err
+
+        queued_ids = {str(job["id"]) for job in queue}
+        for job_id in list(self._tracked - queued_ids):
+            # Задача ушла из очереди — узнаём, чем она закончилась
+            self._tracked.discard(job_id)
+            try:
+                job = await self.client.async_find_job(job_id)
+            except Exception as err:  # noqa: BLE001
+                _LOGGER.debug("Cannot read finished Stash job %s: %s", job_id, err)
+                job = None
+            self._set_last_result(job or {"id": job_id, "status": "FINISHED"})
+
+        return self._build_data(queue)
+
+    @callback
+    def async_handle_job_event(self, payload: dict[str, Any]) -> None:
+        """Apply a ``jobsSubscribe`` update without polling.
+
+        Like the polling path, only jobs started from HA produce a result.
+        """
+        update = payload.get("jobsSubscribe") or {}
+        job = update.get("job")
+        if not job:
+            return
+        queue = [
+            item
+            for item in (self.data or {}).get("queue", [])
+            if str(item["id"]) != str(job["id"])
+        ]
+        if update.get("type") == "REMOVE" or job.get("status") in FINISHED_STATUSES:
+            if str(job["id"]) in self._tracked:
+                self._tracked.discard(str(job["id"]))
+                self._set_last_result(job)
+        else:
+            queue.append(job)
+        self.async_set_updated_data(self._build_data(queue))
+
+    def _build_data(self, queue: list[dict[str, Any]]) -> dict[str, Any]:
+        running = next((job for job in queue if job.get("status") == "RUNNING"), None)
+        progress = None
+        if running is not None and running.get("progress") is not None:
+            progress = round(float(running["progress"]) * 100, 1)
+
+        self._set_active(bool(queue or self._tracked))
+        return {
+            "queue": queue,
+            "running": running,
+            "progress": progress,
+            "last_result": self._last_result,
+        }
+
+    def _set_last_result(self, job: dict[str, Any]) -> None:
+        self._last_result = job
+        for future in self._waiters.pop(str(job["id"]), []):
+            if not future.done():
+                future.set_result(job)
+        if self._on_job_finished is not None:
+            self._on_job_finished(job)
+
+    def _set_active(self, active: bool) -> None:
+        seconds = JOB_ACTIVE_SCAN_INTERVAL if active else JOB_IDLE_SCAN_INTERVAL
+        self.update_interval = timedelta(seconds=seconds)
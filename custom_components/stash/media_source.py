@@ -0,0 +1,335 @@
+"""Browse and play the Stash library through the HA media browser."""
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from homeassistant.components.media_player import BrowseError, MediaClass, MediaType
+from homeassistant.components.media_source.error import Unresolvable
+from homeassistant.components.media_source.models import (
+    BrowseMediaSource,
+    MediaSource,
+    MediaSourceItem,
+    PlayMedia,
+)
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+
+from .api import StashClient, StashError
+from .cache import TTLCache
+from .const import (
+    BROWSE_CACHE_SIZE,
+    BROWSE_CACHE_TTL,
+    BROWSE_PAGE_SIZE,
+    CONF_AGGREGATE,
+    DOMAIN,
+)
+from .image_proxy import image_url
+
+# Разделы корня и их заголовки; movies — это groups в новых версиях Stash
+CATEGORIES: dict[str, str] = {
+    "scenes": "Scenes",
+    "movies": "Movies",
+    "performers": "Performers",
+    "studios": "Studios",
+    "tags": "Tags",
+}
+
+SCENE = "scene"
+
+# Контейнер файла (files.format в Stash) -> MIME; /stream отдаёт файл как есть
+MIME_TYPES: dict[str, str] = {
+    "mp4": "video/mp4",
+    "m4v": "video/mp4",
+    "mov": "video/quicktime",
+    "webm": "video/webm",
+    "mkv": "video/x-matroska",
+    "avi": "video/x-msvideo",
+    "wmv": "video/x-ms-wmv",
+    "flv": "video/x-flv",
+    "mpegts": "video/mp2t",
+    "ogg": "video/ogg",
+}
+# Matroska с этими кодеками — по сути WebM, браузеры его играют
+WEBM_CODECS = ("vp8", "vp9", "av1")
+
+# Поле картинки у каждого типа объектов
+_IMAGE_FIELDS = ("image_path", "front_image_path")
+
+
+def _thumbnail(
+    hass: HomeAssistant,
+    entry_id: str,
+    kind: str,
+    obj: dict[str, Any],
+    path: str | None,
+) -> str | None:
+    """Cached proxy URL instead of the direct Stash one."""
+    if not path or "default=true" in path:
+        # У объекта нет своей картинки — Stash отдал заглушку
+        return None
+    return image_url(hass, entry_id, kind, str(obj["id"]), obj.get("updated_at"))
+
+
+def _mime_type(scene: dict[str, Any]) -> str:
+    """MIME type of the scene's primary file; MP4 when Stash does not say."""
+    files = scene.get("files") or [{}]
+    file_format = str(files[0].get("format") or "").lower()
+    codec = str(files[0].get("video_codec") or "").lower()
+    if file_format == "mkv" and codec in WEBM_CODECS:
+        return "video/webm"
+    return MIME_TYPES.get(file_format, "video/mp4")
+
+
+async def async_get_media_source(hass: HomeAssistant) -> MediaSource:
+    """Set up the Stash media source."""
+    return StashMediaSource(hass)
+
+
+def _page_part(page: int) -> list[str]:
+    return [f"p{page}"] if page > 1 else []
+
+
+class StashMediaSource(MediaSource):
+    """Lazily paged view of scenes, groups, performers, studios and tags.
+
+    Identifiers are ``entry/kind[/object_id][/pN]`` for folders and
+    ``entry/scene/scene_id`` for playable scenes. Each folder fetches one
+    page from Stash; recently browsed pages are served from an LRU cache.
+    """
+
+    name = "Stash"
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        super().__init__(DOMAIN)
+        self.hass = hass
+        self._pages: TTLCache[tuple[Any, ...], tuple[int, list[dict[str, Any]]]] = (
+            TTLCache(BROWSE_CACHE_SIZE, BROWSE_CACHE_TTL)
+        )
+
+    def _client(self, entry_id: str) -> StashClient:
+        data = self.hass.data.get(DOMAIN, {}).get(entry_id)
+        if data is None:
+            raise BrowseError(f"Stash entry {entry_id} is not loaded")
+        return data["client"]
+
+    def _loaded_entries(self) -> list:
+        return [
+            entry
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+            if entry.state is ConfigEntryState.LOADED
+            and not entry.data.get(CONF_AGGREGATE)
+        ]
+
+    async def async_resolve_media(self, item: MediaSourceItem) -> PlayMedia:
+        """Resolve a scene to its Stash stream URL."""
+        parts = (item.identifier or "").split("/")
+        if len(parts) != 3 or parts[1] != SCENE:
+            raise Unresolvable(f"Not a Stash scene: {item.identifier}")
+        entry_id, _, scene_id = parts
+        try:
+            scene = await self._client(entry_id).async_find_scene(scene_id)
+        except (BrowseError, StashError) as err:
+            raise Unresolvable(str(err)) from err
+        stream = ((scene or {}).get("paths") or {}).get("stream")
+        if not stream:
+            raise Unresolvable(f"Stash scene {scene_id} has no stream")
+        return PlayMedia(stream, _mime_type(scene))
+
+    async def async_browse_media(self, item: MediaSourceItem) -> BrowseMediaSource:
+        """Return one level of the library, one page at a time."""
+        if not item.identifier:
+            entries = self._loaded_entries()
+            if len(entries) == 1:
+                return self._browse_entry(entries[0].entry_id, entries[0].title)
+            return self._browse_root(entries)
+
+        parts = item.identifier.split("/")
+        page = 1
+        if len(parts) > 2 and parts[-1][:1] == "p" and parts[-1][1:].isdigit():
+            page = max(1, int(parts.pop()[1:]))
+
+        entry_id = parts[0]
+        if len(parts) == 1:
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            return self._browse_entry(entry_id, entry.title if entry else "Stash")
+        kind = parts[1]
+        if kind not in CATEGORIES or len(parts) > 3:
+            raise BrowseError(f"Unknown Stash media: {item.identifier}")
+        if len(parts) == 3:
+            if kind == "scenes":
+                raise BrowseError(f"Unknown Stash media: {item.identifier}")
+            return await self._browse_scenes(entry_id, page, (kind, parts[2]))
+        if kind == "scenes":
+            return await self._browse_scenes(entry_id, page)
+        return await self._browse_objects(entry_id, kind, page)
+
+    def _browse_root(self, entries: list) -> BrowseMediaSource:
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=None,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.VIDEO,
+            title=self.name,
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.DIRECTORY,
+            children=[
+                BrowseMediaSource(
+                    domain=DOMAIN,
+                    identifier=entry.entry_id,
+                    media_class=MediaClass.DIRECTORY,
+                    media_content_type=MediaType.VIDEO,
+                    title=entry.title,
+                    can_play=False,
+                    can_expand=True,
+                )
+                for entry in entries
+            ],
+        )
+
+    def _browse_entry(self, entry_id: str, title: str) -> BrowseMediaSource:
+        """Categories only; nothing is fetched until one is opened."""
+        client = self._client(entry_id)
+        groups = client.capabilities is not None and client.capabilities.supports_groups
+        children = []
+        for kind, name in CATEGORIES.items():
+            if kind == "movies" and groups:
+                name = "Groups"
+            children.append(
+                BrowseMediaSource(
+                    domain=DOMAIN,
+                    identifier=f"{entry_id}/{kind}",
+                    media_class=MediaClass.DIRECTORY,
+                    media_content_type=MediaType.VIDEO,
+                    title=name,
+                    can_play=False,
+                    can_expand=True,
+                )
+            )
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=entry_id,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.VIDEO,
+            title=title,
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.DIRECTORY,
+            children=children,
+        )
+
+    async def _fetch_page(
+        self,
+        entry_id: str,
+        kind: str,
+        page: int,
+        parent: tuple[str, str] | None = None,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        key = (entry_id, kind, parent, page)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        try:
+            result = await self._client(entry_id).async_find_page(
+                kind, page, BROWSE_PAGE_SIZE, parent
+            )
+        except StashError as err:
+            raise BrowseError(f"Cannot browse Stash: {err}") from err
+        self._pages.set(key, result)
+        return result
+
+    @staticmethod
+    def _next_page(
+        base: str, page: int, total: int, children: list[BrowseMediaSource]
+    ) -> None:
+        pages = max(1, math.ceil(total / BROWSE_PAGE_SIZE))
+        if page < pages:
+            children.append(
+                BrowseMediaSource(
+                    domain=DOMAIN,
+                    identifier="/".join([base, *_page_part(page + 1)]),
+                    media_class=MediaClass.DIRECTORY,
+                    media_content_type=MediaType.VIDEO,
+                    title=f"Next page ({page + 1}/{pages})",
+                    can_play=False,
+                    can_expand=True,
+                )
+            )
+
+    async def _browse_scenes(
+        self, entry_id: str, page: int, parent: tuple[str, str] | None = None
+    ) -> BrowseMediaSource:
+        total, scenes = await self._fetch_page(entry_id, "scenes", page, parent)
+        children = [
+            BrowseMediaSource(
+                domain=DOMAIN,
+                identifier=f"{entry_id}/{SCENE}/{scene['id']}",
+                media_class=MediaClass.VIDEO,
+                media_content_type=MediaType.VIDEO,
+                title=scene.get("title") or f"Scene {scene['id']}",
+                can_play=True,
+                can_expand=False,
+                thumbnail=_thumbnail(
+                    self.hass,
+                    entry_id,
+                    "scenes",
+                    scene,
+                    (scene.get("paths") or {}).get("screenshot"),
+                ),
+            )
+            for scene in scenes
+        ]
+        base = f"{entry_id}/scenes" if parent is None else f"{entry_id}/{parent[0]}/{parent[1]}"
+        self._next_page(base, page, total, children)
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier="/".join([base, *_page_part(page)]),
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.VIDEO,
+            title=f"Scenes ({total})" if page == 1 else f"Scenes, page {page}",
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.VIDEO,
+            children=children,
+        )
+
+    async def _browse_objects(
+        self, entry_id: str, kind: str, page: int
+    ) -> BrowseMediaSource:
+        total, objects = await self._fetch_page(entry_id, kind, page)
+        children = []
+        for obj in objects:
+            count = obj.get("scene_count")
+            title = obj.get("name") or obj["id"]
+            children.append(
+                BrowseMediaSource(
+                    domain=DOMAIN,
+                    identifier=f"{entry_id}/{kind}/{obj['id']}",
+                    media_class=MediaClass.DIRECTORY,
+                    media_content_type=MediaType.VIDEO,
+                    title=f"{title} ({count})" if count is not None else title,
+                    can_play=False,
+                    can_expand=True,
+                    thumbnail=_thumbnail(
+                        self.hass,
+                        entry_id,
+                        kind,
+                        obj,
+                        next((obj[field] for field in _IMAGE_FIELDS if obj.get(field)), None),
+                    ),
+                )
+            )
+        base = f"{entry_id}/{kind}"
+        self._next_page(base, page, total, children)
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier="/".join([base, *_page_part(page)]),
+            media_class=MediaClass.DIRECTORY,
+            media_content_type=MediaType.VIDEO,
+            title=CATEGORIES[kind] if page == 1 else f"{CATEGORIES[kind]}, page {page}",
+            can_play=False,
+            can_expand=True,
+            children_media_class=MediaClass.DIRECTORY,
+            children=children,
+        )
@@ -0,0 +1,126 @@
+"""Per-operation request instrumentation for the Stash client."""
+from __future__ import annotations
+
+from collections import deque
+import re
+from typing import Any
+
+from .const import METRICS_WINDOW
+
+_OPERATION_RE = re.compile(r"^\s*(query|mutation)\b[^{]*\{\s*(\w+)\s*(:)?")
+
+
+def operation_name(document: str) -> str:
+    """Name a GraphQL document by its first root field (``batch`` for aliased ones)."""
+    match = _OPERATION_RE.match(document)
+    if match is None:
+        return "unknown"
+    if match.group(3):
+        return "batch"
+    return match.group(2)
+
+
+def _percentile(values: list[float], percent: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class OperationStats:
+    """Rolling latency window and counters for one operation."""
+
+    def __init__(self) -> None:
+        self.latencies: deque[float] = deque(maxlen=METRICS_WINDOW)
+        self.requests = 0
+        # Успешные ответы: окно задержек ограничено, среднее считаем по ним
+        self.responses = 0
+        self.bytes_received = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.graphql_errors = 0
+        self.rejected = 0
+
+    @property
+    def failures(self) -> int:
+        return self.timeouts + self.errors + self.graphql_errors
+
+    def as_dict(self) -> dict[str, Any]:
+        values = list(self.latencies)
+        return {
+            "requests": self.requests,
+            "p50_ms": _ms(_percentile(values, 50)),
+            "p95_ms": _ms(_percentile(values, 95)),
+            "max_ms": _ms(max(values) if values else None),
+            "bytes_received": self.bytes_received,
+            "avg_bytes": (
+                round(self.bytes_received / self.responses) if self.responses else None
+            ),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "graphql_errors": self.graphql_errors,
+            "rejected": self.rejected,
+        }
+
+
+class StashMetrics:
+    """Request metrics by operation plus coordinator refresh wall time."""
+
+    def __init__(self) -> None:
+        self.operations: dict[str, OperationStats] = {}
+        # tier -> длительность последнего обновления (сек)
+        self.refresh_durations: dict[str, float] = {}
+
+    def _op(self, operation: str) -> OperationStats:
+        return self.operations.setdefault(operation, OperationStats())
+
+    def record_success(
+        self, operation: str, latency: float, size: int, graphql_errors: bool
+    ) -> None:
+        stats = self._op(operation)
+        stats.requests += 1
+        stats.responses += 1
+        stats.latencies.append(latency)
+        stats.bytes_received += size
+        if graphql_errors:
+            stats.graphql_errors += 1
+
+    def record_timeout(self, operation: str) -> None:
+        stats = self._op(operation)
+        stats.requests += 1
+        stats.timeouts += 1
+
+    def record_error(self, operation: str) -> None:
+        stats = self._op(operation)
+        stats.requests += 1
+        stats.errors += 1
+
+    def record_rejected(self, operation: str) -> None:
+        self._op(operation).rejected += 1
+
+    def record_refresh(self, tier: str, duration: float) -> None:
+        self.refresh_durations[tier] = duration
+
+    @property
+    def p95_latency(self) -> float | None:
+        values = [value for stats in self.operations.values() for value in stats.latencies]
+        return _percentile(values, 95)
+
+    @property
+    def failures(self) -> int:
+        return sum(stats.failures for stats in self.operations.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "operations": {
+                name: stats.as_dict() for name, stats in sorted(self.operations.items())
+            },
+            "refresh_ms": {
+                tier: _ms(duration) for tier, duration in self.refresh_durations.items()
+            },
+        }
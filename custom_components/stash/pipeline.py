@@ -0,0 +1,182 @@
+"""Run Stash maintenance tasks one after another."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+import async_timeout
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+import homeassistant.util.dt as dt_util
+
+from .api import HEAVY_TASKS, StashClient, StashError
+from .const import DOMAIN, JOB_ACTIVE_SCAN_INTERVAL
+from .identify import StashIdentifier
+from .jobs import StashJobCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Шаг конвейера -> метод клиента, запускающий задачу
+# (identify идёт через StashIdentifier — endpoints и инкрементальный режим)
+PIPELINE_TASKS: dict[str, str] = {
+    "scan": "async_metadata_scan",
+    "auto_tag": "async_metadata_auto_tag",
+    "generate": "async_metadata_generate",
+    "identify": "async_metadata_identify",
+    "clean": "async_metadata_clean",
+}
+
+_HEAVY_PREFIXES = tuple(HEAVY_TASKS.values())
+
+ON_FAILURE_CONTINUE = "continue"
+ON_FAILURE_STOP = "stop"
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_FINISHED = "finished"
+STATE_FAILED = "failed"
+
+
+def _idle_data() -> dict[str, Any]:
+    return {"state": STATE_IDLE, "step": None, "steps": [], "started": None, "ended": None}
+
+
+class StashPipeline(DataUpdateCoordinator):
+    """Sequence heavy tasks so the server never runs two of them at once.
+
+    A step starts only when no heavy job (scan, generate, identify, clean,
+    auto tag) is queued or running on the server, and the next one only
+    after the job of the previous step ended. Status is pushed to the
+    pipeline sensor; nothing is polled for it.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        client: StashClient,
+        jobs: StashJobCoordinator,
+        identifier: StashIdentifier,
+    ) -> None:
+        super().__init__(
+            hass, _LOGGER, config_entry=entry, name="Stash pipeline"
+        )
+        self._entry = entry
+        self._client = client
+        self._jobs = jobs
+        self._identifier = identifier
+        self._task: asyncio.Task[None] | None = None
+        self.data = _idle_data()
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        return self.data
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def async_start(self, tasks: list[str], step_timeout: float, on_failure: str) -> None:
+        """Start the pipeline in the background."""
+        if self.running:
+            raise HomeAssistantError("A Stash pipeline is already running")
+        steps = [{"task": task, "status": "pending"} for task in tasks]
+        self.async_set_updated_data(
+            {
+                "state": STATE_RUNNING,
+                "step": None,
+                "steps": steps,
+                "started": dt_util.utcnow().isoformat(),
+                "ended": None,
+            }
+        )
+        self._task = self._entry.async_create_background_task(
+            self.hass,
+            self._async_run(steps, step_timeout, on_failure),
+            f"{DOMAIN} pipeline {self._entry.entry_id}",
+        )
+
+    def _publish(self, **changes: Any) -> None:
+        self.async_set_updated_data({**self.data, **changes})
+
+    async def _async_run(
+        self, steps: list[dict[str, Any]], step_timeout: float, on_failure: str
+    ) -> None:
+        failed = False
+        for index, step in enumerate(steps):
+            if failed and on_failure == ON_FAILURE_STOP:
+                step["status"] = "skipped"
+                continue
+            self._publish(step=step["task"])
+            if not await self._async_run_step(step, step_timeout):
+                failed = True
+            self._publish()
+            _LOGGER.debug("Stash pipeline step %d (%s): %s", index, step["task"], step)
+        self._publish(
+            state=STATE_FAILED if failed else STATE_FINISHED,
+            step=None,
+            ended=dt_util.utcnow().isoformat(),
+        )
+
+    async def _async_run_step(self, step: dict[str, Any], step_timeout: float) -> bool:
+        """Run one task to its end; return whether it succeeded."""
+        job_id: str | None = None
+        try:
+            async with async_timeout.timeout(step_timeout):
+                step["status"] = "waiting"
+                self._publish()
+                await self._async_wait_idle()
+                if step["task"] == "identify":
+                    # Identify может идти несколькими задачами (по пачкам сцен)
+                    def _on_job(started: str) -> None:
+                        nonlocal job_id
+                        job_id = started
+                        step.update(status="running", job_id=started)
+                        self._publish()
+
+                    finished = await self._identifier.async_run(_on_job)
+                    job = {"status": "FINISHED" if finished else "FAILED"}
+                else:
+                    job_id = await getattr(self._client, PIPELINE_TASKS[step["task"]])()
+                    if job_id is None:
+                        raise StashError("Stash did not return a job ID")
+                    step.update(status="running", job_id=job_id)
+                    self._publish()
+                    waiter = self._jobs.async_wait(job_id)
+                    await self._jobs.async_track(job_id)
+                    job = await waiter
+        except asyncio.TimeoutError:
+            step.update(status="timeout", error=f"No result after {step_timeout:.0f}s")
+            if job_id is not None:
+                # Иначе следующая тяжёлая задача пойдёт параллельно этой
+                try:
+                    await self._client.async_stop_job(job_id)
+                except StashError as err:
+                    _LOGGER.warning("Cannot stop Stash job %s: %s", job_id, err)
+            return False
+        except StashError as err:
+            step.update(status="failed", error=str(err))
+            return False
+
+        status = str(job.get("status") or "FINISHED")
+        step["status"] = status.lower()
+        if job.get("error"):
+            step["error"] = job["error"]
+        return status == "FINISHED"
+
+    async def _async_wait_idle(self) -> None:
+        """Wait until no heavy job is queued or running on the server."""
+        while True:
+            queue = await self._client.async_get_job_queue()
+            busy = [
+                job
+                for job in queue
+                if str(job.get("description") or "").startswith(_HEAVY_PREFIXES)
+            ]
+            if not busy:
+                return
+            _LOGGER.debug("Stash pipeline waits for %s", busy[0].get("description"))
+            await asyncio.sleep(JOB_ACTIVE_SCAN_INTERVAL)
@@ -0,0 +1,215 @@
+"""Track playback of Stash scenes on HA media players."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import re
+import time
+from typing import Any
+
+from homeassistant.const import EVENT_STATE_CHANGED, STATE_PAUSED, STATE_PLAYING
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .api import StashClient, StashError
+from .const import (
+    DOMAIN,
+    PLAY_FLUSH_DELAY,
+    PLAY_MIN_DURATION,
+    PLAY_SAVE_DELAY,
+    STORAGE_VERSION,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Досмотрено до конца — точку возобновления сбрасываем
+_FINISHED_RATIO = 0.95
+
+
+def plays_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with play activity not yet written to Stash."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.plays")
+
+
+@dataclass
+class _Session:
+    """One scene on one media player."""
+
+    scene_id: str
+    watched: float = 0.0
+    playing_since: float | None = None
+    counted: bool = False
+
+
+def _position(state: State) -> float | None:
+    """Current media position, extrapolated while playing."""
+    position = state.attributes.get("media_position")
+    if position is None:
+        return None
+    updated_at = state.attributes.get("media_position_updated_at")
+    if state.state == STATE_PLAYING and isinstance(updated_at, datetime):
+        position += (dt_util.utcnow() - updated_at).total_seconds()
+    duration = state.attributes.get("media_duration")
+    if duration and position >= duration * _FINISHED_RATIO:
+        return 0.0
+    return max(0.0, float(position))
+
+
+class StashPlayTracker:
+    """Accumulate play time and resume points, write them in batches.
+
+    State changes of media players showing a scene of this Stash server
+    only update memory. Activity is written with ``sceneAddPlay`` and
+    ``sceneSaveActivity`` at most every ``PLAY_FLUSH_DELAY`` seconds, as
+    one aliased mutation; until then it is kept in a Store, so a restart
+    does not lose it.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, client: StashClient) -> None:
+        self.hass = hass
+        self._client = client
+        self._store = plays_store(hass, entry_id)
+        self._content_re = re.compile(
+            rf"^(?:media-source://{DOMAIN}/{re.escape(entry_id)}/scene/"
+            rf"|{re.escape(client.base_url)}/scene/)(\d+)"
+        )
+        # scene_id -> {"plays": [ISO], "duration": сек, "resume": сек | None}
+        self.pending: dict[str, dict[str, Any]] = {}
+        self._sessions: dict[str, _Session] = {}
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    async def async_load(self) -> None:
+        """Restore activity that was not written before the last shutdown."""
+        data = await self._store.async_load() or {}
+        for scene_id, item in (data.get("pending") or {}).items():
+            self._merge(scene_id, item)
+        if self.pending:
+            self._async_schedule_flush()
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Listen to media players; return the unsubscribe callback."""
+        return self.hass.bus.async_listen(
+            EVENT_STATE_CHANGED, self._async_state_changed, self._async_filter
+        )
+
+    async def async_stop(self) -> None:
+        """Close open sessions and write everything (entry unload)."""
+        now = time.monotonic()
+        for session in self._sessions.values():
+            self._checkpoint(session, now, playing=False)
+        self._sessions.clear()
+        await self.async_flush()
+        if self._unsub_flush is not None:
+            # Неудачное остаётся в Store до следующего запуска
+            self._unsub_flush()
+            self._unsub_flush = None
+
+    def _scene_id(self, state: State | None) -> str | None:
+        if state is None or state.state not in (STATE_PLAYING, STATE_PAUSED):
+            return None
+        match = self._content_re.match(str(state.attributes.get("media_content_id") or ""))
+        return match.group(1) if match else None
+
+    @callback
+    def _async_filter(self, event_data: dict[str, Any]) -> bool:
+        return event_data["entity_id"].startswith("media_player.")
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        entity_id: str = event.data["entity_id"]
+        old_state: State | None = event.data.get("old_state")
+        new_state: State | None = event.data.get("new_state")
+        scene_id = self._scene_id(new_state)
+        session = self._sessions.get(entity_id)
+        if session is None and scene_id is None:
+            return
+
+        now = time.monotonic()
+        if session is not None and session.scene_id != scene_id:
+            # Сцена сменилась или воспроизведение закончилось
+            self._checkpoint(session, now, playing=False)
+            if old_state is not None:
+                self._set_resume(session.scene_id, _position(old_state))
+            del self._sessions[entity_id]
+            session = None
+
+        if scene_id is not None and new_state is not None:
+            if session is None:
+                session = self._sessions[entity_id] = _Session(scene_id)
+            self._checkpoint(session, now, playing=new_state.state == STATE_PLAYING)
+            self._set_resume(scene_id, _position(new_state))
+
+    def _checkpoint(self, session: _Session, now: float, playing: bool) -> None:
+        """Move play time of a session into pending activity."""
+        if session.playing_since is not None:
+            elapsed = now - session.playing_since
+            session.watched += elapsed
+            self._merge(session.scene_id, {"duration": elapsed})
+        session.playing_since = now if playing else None
+        if not session.counted and session.watched >= PLAY_MIN_DURATION:
+            session.counted = True
+            self._merge(session.scene_id, {"plays": [dt_util.utcnow().isoformat()]})
+
+    def _set_resume(self, scene_id: str, position: float | None) -> None:
+        if position is not None:
+            self._merge(scene_id, {"resume": round(position, 1)})
+
+    def _merge(self, scene_id: str, item: dict[str, Any]) -> None:
+        current = self.pending.setdefault(
+            scene_id, {"plays": [], "duration": 0.0, "resume": None}
+        )
+        current["plays"] = [*current.get("plays", []), *item.get("plays", [])]
+        current["duration"] = round(
+            current.get("duration", 0.0) + (item.get("duration") or 0.0), 1
+        )
+        if item.get("resume") is not None:
+            current["resume"] = item["resume"]
+        self._async_schedule_flush()
+
+    @callback
+    def _async_schedule_flush(self) -> None:
+        """Persist soon and write to Stash once per window, not per tick."""
+        self._store.async_delay_save(self._data_to_save, PLAY_SAVE_DELAY)
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, PLAY_FLUSH_DELAY, self._async_flush_later
+            )
+
+    @callback
+    def _async_flush_later(self, _now: Any) -> None:
+        self._unsub_flush = None
+        self.hass.async_create_task(self.async_flush())
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"pending": self.pending}
+
+    async def async_flush(self) -> None:
+        """Write pending activity; keep what failed for the next window."""
+        now = time.monotonic()
+        for session in self._sessions.values():
+            self._checkpoint(session, now, playing=session.playing_since is not None)
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        activity, self.pending = self.pending, {}
+        if not activity:
+            return
+        try:
+            failed = await self._client.async_save_activity(activity)
+        except StashError as err:
+            _LOGGER.debug("Cannot write play activity to Stash: %s", err)
+            failed = set(activity)
+        for scene_id in failed:
+            # Новые данные за время запроса поверх старых
+            newer = self.pending.pop(scene_id, None)
+            self._merge(scene_id, activity[scene_id])
+            if newer is not None:
+                self._merge(scene_id, newer)
+        self._store.async_delay_save(self._data_to_save, PLAY_SAVE_DELAY)
+        if any(session.playing_since is not None for session in self._sessions.values()):
+            # Долгий просмотр без смены состояния — следующее окно всё равно нужно
+            self._async_schedule_flush()
@@ -1,15 +1,43 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from typing import Any
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfInformation,
+    UnitOfTime,
+)
 from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-
-from .const import DOMAIN
+import homeassistant.util.dt as dt_util
+
+from .aggregate import AGGREGATE_DATA, StashAggregateHub
+from .const import (
+    AGGREGATE_AGE_INTERVAL,
+    CONF_AGGREGATE,
+    DOMAIN,
+    TIER_MEDIA,
+    TIER_TAXONOMY,
+    TIER_VERSION,
+)
 from . import StashDataUpdateCoordinator
+from .coordinator import counter_unique_id
+from .feed import StashFeedCoordinator
+from .health import StashHealthAnalyzer
+from .image_proxy import image_url
+from .jobs import StashJobCoordinator
+from .pipeline import StashPipeline
+from .trends import StashTrendTracker
 
 
 async def async_setup_entry(
@@ -18,19 +46,65 @@ async def async_setup_entry(
     async_add_entities,
 ) -> None:
     """Set up Stash sensors."""
+    if entry.data.get(CONF_AGGREGATE):
+        hub: StashAggregateHub = hass.data[AGGREGATE_DATA]
+        async_add_entities(
+            [
+                *(
+                    StashAggregateSensor(hub, entry, key, *description)
+                    for key, description in AGGREGATE_SENSORS.items()
+                ),
+                StashAggregateAgeSensor(hub, entry),
+            ]
+        )
+        return
+
     data: dict[str, Any] = hass.data[DOMAIN][entry.entry_id]
-    coordinator: StashDataUpdateCoordinator = data["coordinator"]
+    coordinators: dict[str, StashDataUpdateCoordinator] = data["coordinators"]
+    media = coordinators[TIER_MEDIA]
+    taxonomy = coordinators[TIER_TAXONOMY]
+    tiers = list(coordinators.values())
+    jobs: StashJobCoordinator = data["jobs"]
+    health: StashHealthAnalyzer = data["health"]
+    feed: StashFeedCoordinator = data["feed"]
+    trends: StashTrendTracker = data["trends"]
 
     entities: list[BaseStashSensor] = [
-        StashScenesSensor(coordinator, entry),
-        StashMoviesSensor(coordinator, entry),
-        StashPerformersSensor(coordinator, entry),
-        StashStudiosSensor(coordinator, entry),
-        StashTagsSensor(coordinator, entry),
-        StashImagesSensor(coordinator, entry),
-        StashGalleriesSensor(coordinator, entry),
-        StashMarkersSensor(coordinator, entry),
-        StashVersionSensor(coordinator, entry),
+        StashScenesSensor(media, entry),
+        StashMoviesSensor(taxonomy, entry),
+        StashPerformersSensor(taxonomy, entry),
+        StashStudiosSensor(taxonomy, entry),
+        StashTagsSensor(taxonomy, entry),
+        StashImagesSensor(media, entry),
+        StashGalleriesSensor(media, entry),
+        StashMarkersSensor(media, entry),
+        StashVersionSensor(coordinators[TIER_VERSION], entry),
+        StashScenesSizeSensor(media, entry),
+        StashImagesSizeSensor(media, entry),
+        StashScenesDurationSensor(media, entry),
+        StashScenesPlayedSensor(media, entry),
+        StashPlayCountSensor(media, entry),
+        StashPlayDurationSensor(media, entry),
+        StashOCountSensor(media, entry),
+        StashRunningJobSensor(jobs, entry),
+        StashJobProgressSensor(jobs, entry),
+        StashLastJobResultSensor(jobs, entry),
+        StashPipelineSensor(data["pipeline"], entry),
+        StashDuplicateScenesSensor(health, entry),
+        StashMissingFilesSensor(health, entry),
+        StashUnorganizedScenesSensor(health, entry),
+        StashScenesWithoutPerformersSensor(health, entry),
+        StashScenesWithoutTagsSensor(health, entry),
+        StashLatestSceneSensor(feed, entry),
+        StashLatestImageSensor(feed, entry),
+        StashScenesGrowthSensor(trends, entry),
+        StashImagesGrowthSensor(trends, entry),
+        StashLibrarySizeGrowthSensor(trends, entry),
+        StashDiskFullSensor(trends, entry),
+        StashSuppressedWritesSensor(tiers, entry),
+        StashRequestLatencySensor(tiers, entry),
+        StashRequestFailuresSensor(tiers, entry),
+        StashRefreshDurationSensor(tiers, entry),
     ]
 
     async_add_entities(entities)
@@ -43,7 +117,14 @@ class BaseStashSensor(CoordinatorEntity, SensorEntity):
 
     def __init__(
         self,
-        coordinator: StashDataUpdateCoordinator,
+        coordinator: (
+            StashDataUpdateCoordinator
+            | StashJobCoordinator
+            | StashPipeline
+            | StashHealthAnalyzer
+            | StashFeedCoordinator
+            | StashTrendTracker
+        ),
         entry: ConfigEntry,
     ) -> None:
         super().__init__(coordinator)
@@ -54,9 +135,39 @@ class BaseStashSensor(CoordinatorEntity, SensorEntity):
         )
 
 
-class StashScenesSensor(BaseStashSensor):
+class StashCounterSensor(BaseStashSensor):
+    """Sensor for one value of a tier coordinator.
+
+    State is written only when its own key changed or availability
+    flipped; skipped writes are counted on the coordinator.
+    """
+
+    _key: str
+    _last_available: bool | None = None
+
+    @property
+    def native_value(self) -> int | str | None:
+        data = self.coordinator.data or {}
+        return data.get(self._key)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        available = self.available
+        if (
+            available == self._last_available
+            and self._key not in self.coordinator.changed_keys
+        ):
+            self.coordinator.suppressed_writes += 1
+            return
+        self._last_available = available
+        super()._handle_coordinator_update()
+
+
+class StashScenesSensor(StashCounterSensor):
     """Sensor for total scenes count."""
 
+    _key = "scenes"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_scenes_count"
@@ -64,15 +175,12 @@ class StashScenesSensor(BaseStashSensor):
         self._attr_icon = "mdi:filmstrip"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("scenes")
-
 
-class StashMoviesSensor(BaseStashSensor):
+class StashMoviesSensor(StashCounterSensor):
     """Sensor for total movies/groups count."""
 
+    _key = "movies"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_movies_count"
@@ -80,15 +188,12 @@ class StashMoviesSensor(BaseStashSensor):
         self._attr_icon = "mdi:movie-open-outline"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("movies")
-
 
-class StashPerformersSensor(BaseStashSensor):
+class StashPerformersSensor(StashCounterSensor):
     """Sensor for performers count."""
 
+    _key = "performers"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_performers_count"
@@ -96,15 +201,12 @@ class StashPerformersSensor(BaseStashSensor):
         self._attr_icon = "mdi:account-multiple"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("performers")
-
 
-class StashStudiosSensor(BaseStashSensor):
+class StashStudiosSensor(StashCounterSensor):
     """Sensor for studios count."""
 
+    _key = "studios"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_studios_count"
@@ -112,15 +214,12 @@ class StashStudiosSensor(BaseStashSensor):
         self._attr_icon = "mdi:office-building"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("studios")
-
 
-class StashTagsSensor(BaseStashSensor):
+class StashTagsSensor(StashCounterSensor):
     """Sensor for tags count."""
 
+    _key = "tags"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_tags_count"
@@ -128,15 +227,12 @@ class StashTagsSensor(BaseStashSensor):
         self._attr_icon = "mdi:tag-multiple"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("tags")
-
 
-class StashImagesSensor(BaseStashSensor):
+class StashImagesSensor(StashCounterSensor):
     """Sensor for single images count."""
 
+    _key = "images"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_images_count"
@@ -144,15 +240,12 @@ class StashImagesSensor(BaseStashSensor):
         self._attr_icon = "mdi:image-multiple-outline"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("images")
-
 
-class StashGalleriesSensor(BaseStashSensor):
+class StashGalleriesSensor(StashCounterSensor):
     """Sensor for galleries count."""
 
+    _key = "galleries"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_galleries_count"
@@ -160,15 +253,12 @@ class StashGalleriesSensor(BaseStashSensor):
         self._attr_icon = "mdi:image-album"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("galleries")
-
 
-class StashMarkersSensor(BaseStashSensor):
+class StashMarkersSensor(StashCounterSensor):
     """Sensor for scene markers count."""
 
+    _key = "markers"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_markers_count"
@@ -176,22 +266,681 @@ class StashMarkersSensor(BaseStashSensor):
         self._attr_icon = "mdi:bookmark-multiple-outline"
         self._attr_native_unit_of_measurement = "items"
 
-    @property
-    def native_value(self) -> int | None:
-        data = self.coordinator.data or {}
-        return data.get("markers")
-
 
-class StashVersionSensor(BaseStashSensor):
+class StashVersionSensor(StashCounterSensor):
     """Sensor for Stash version string."""
 
+    _key = "version"
+
     def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
         super().__init__(coordinator, entry)
         self._attr_unique_id = f"{entry.entry_id}_version"
         self._attr_name = "Version"
         self._attr_icon = "mdi:information-outline"
 
+
+class StashStatsSensor(StashCounterSensor):
+    """Sensor for one field of the library-wide ``stats`` aggregate."""
+
+    def __init__(self, coordinator: StashDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = counter_unique_id(entry.entry_id, self._key)
+
+
+class StashScenesSizeSensor(StashStatsSensor):
+    """Sensor for total size of all scene files."""
+
+    _key = "scenes_size"
+    _attr_name = "Scenes Size"
+    _attr_icon = "mdi:harddisk"
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_suggested_unit_of_measurement = UnitOfInformation.GIGABYTES
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+
+class StashImagesSizeSensor(StashStatsSensor):
+    """Sensor for total size of all image files."""
+
+    _key = "images_size"
+    _attr_name = "Images Size"
+    _attr_icon = "mdi:harddisk"
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_suggested_unit_of_measurement = UnitOfInformation.GIGABYTES
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+
+class StashScenesDurationSensor(StashStatsSensor):
+    """Sensor for total duration of all scenes."""
+
+    _key = "scenes_duration"
+    _attr_name = "Scenes Duration"
+    _attr_icon = "mdi:timer-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_suggested_unit_of_measurement = UnitOfTime.HOURS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+
+class StashScenesPlayedSensor(StashStatsSensor):
+    """Sensor for number of scenes played at least once."""
+
+    _key = "scenes_played"
+    _attr_name = "Scenes Played"
+    _attr_icon = "mdi:play-circle-outline"
+    _attr_native_unit_of_measurement = "items"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+
+class StashPlayCountSensor(StashStatsSensor):
+    """Sensor for total play count over all scenes."""
+
+    _key = "total_play_count"
+    _attr_name = "Play Count"
+    _attr_icon = "mdi:play-box-multiple-outline"
+    _attr_native_unit_of_measurement = "plays"
+    _attr_state_class = SensorStateClass.TOTAL
+
+
+class StashPlayDurationSensor(StashStatsSensor):
+    """Sensor for total time spent playing scenes."""
+
+    _key = "total_play_duration"
+    _attr_name = "Play Duration"
+    _attr_icon = "mdi:timer-play-outline"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_suggested_unit_of_measurement = UnitOfTime.HOURS
+    _attr_state_class = SensorStateClass.TOTAL
+
+
+class StashOCountSensor(StashStatsSensor):
+    """Sensor for total O-count over all scenes."""
+
+    _key = "total_o_count"
+    _attr_name = "O-Count"
+    _attr_icon = "mdi:counter"
+    _attr_state_class = SensorStateClass.TOTAL
+
+
+class StashRunningJobSensor(BaseStashSensor):
+    """Sensor for the description of the currently running job."""
+
+    def __init__(self, coordinator: StashJobCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_running_job"
+        self._attr_name = "Running Job"
+        self._attr_icon = "mdi:progress-wrench"
+
+    @property
+    def native_value(self) -> str | None:
+        data = self.coordinator.data or {}
+        running = data.get("running")
+        return running.get("description") if running else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        data = self.coordinator.data or {}
+        queue = data.get("queue") or []
+        return {
+            "queue_size": len(queue),
+            "queue": [job.get("description") for job in queue],
+        }
+
+
+class StashJobProgressSensor(BaseStashSensor):
+    """Sensor for progress of the running job in percent."""
+
+    def __init__(self, coordinator: StashJobCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_job_progress"
+        self._attr_name = "Job Progress"
+        self._attr_icon = "mdi:progress-clock"
+        self._attr_native_unit_of_measurement = PERCENTAGE
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def native_value(self) -> float | None:
+        data = self.coordinator.data or {}
+        return data.get("progress")
+
+
+class StashLastJobResultSensor(BaseStashSensor):
+    """Sensor for the final status of the last job started from HA."""
+
+    def __init__(self, coordinator: StashJobCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_last_job_result"
+        self._attr_name = "Last Job Result"
+        self._attr_icon = "mdi:clipboard-check-outline"
+
+    @property
+    def native_value(self) -> str | None:
+        data = self.coordinator.data or {}
+        result = data.get("last_result")
+        return result.get("status") if result else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        data = self.coordinator.data or {}
+        result = data.get("last_result") or {}
+        return {
+            "job_id": result.get("id"),
+            "description": result.get("description"),
+            "end_time": result.get("endTime"),
+            "error": result.get("error"),
+        }
+
+
+class StashPipelineSensor(BaseStashSensor):
+    """Sensor for the state of the stash.run_pipeline sequence."""
+
+    def __init__(self, coordinator: StashPipeline, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_pipeline"
+        self._attr_name = "Pipeline"
+        self._attr_icon = "mdi:playlist-play"
+
     @property
     def native_value(self) -> str | None:
+        return (self.coordinator.data or {}).get("state")
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        data = self.coordinator.data or {}
+        return {
+            "step": data.get("step"),
+            "steps": [dict(step) for step in data.get("steps") or []],
+            "started": data.get("started"),
+            "ended": data.get("ended"),
+        }
+
+
+class StashHealthSensor(BaseStashSensor):
+    """Sensor for the count of one library health check.
+
+    The scenes themselves are returned by the stash.library_health
+    service; attributes stay small.
+    """
+
+    _check: str
+    _attr_native_unit_of_measurement = "items"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: StashHealthAnalyzer, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_health_{self._check}"
+
+    def _result(self) -> dict[str, Any]:
+        checks = (self.coordinator.data or {}).get("checks") or {}
+        return checks.get(self._check) or {}
+
+    @property
+    def native_value(self) -> int | None:
+        return self._result().get("count")
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
         data = self.coordinator.data or {}
-        return data.get("version")
+        return {
+            "checked": data.get("checked"),
+            "failed": self._check in (data.get("failed") or []),
+        }
+
+
+class StashDuplicateScenesSensor(StashHealthSensor):
+    """Sensor for groups of scenes with matching phashes."""
+
+    _check = "duplicates"
+    _attr_name = "Duplicate Scene Groups"
+    _attr_icon = "mdi:content-duplicate"
+    _attr_native_unit_of_measurement = "groups"
+
+
+class StashMissingFilesSensor(StashHealthSensor):
+    """Sensor for scenes that have no file left."""
+
+    _check = "missing_files"
+    _attr_name = "Scenes Missing Files"
+    _attr_icon = "mdi:file-alert-outline"
+
+
+class StashUnorganizedScenesSensor(StashHealthSensor):
+    """Sensor for scenes not marked as organized."""
+
+    _check = "unorganized"
+    _attr_name = "Unorganized Scenes"
+    _attr_icon = "mdi:folder-alert-outline"
+
+
+class StashScenesWithoutPerformersSensor(StashHealthSensor):
+    """Sensor for scenes without performers."""
+
+    _check = "no_performers"
+    _attr_name = "Scenes Without Performers"
+    _attr_icon = "mdi:account-question-outline"
+
+
+class StashScenesWithoutTagsSensor(StashHealthSensor):
+    """Sensor for scenes without tags."""
+
+    _check = "no_tags"
+    _attr_name = "Scenes Without Tags"
+    _attr_icon = "mdi:tag-off-outline"
+
+
+class StashLatestSensor(BaseStashSensor):
+    """Sensor for the newest object of the "recently added" feed.
+
+    The state is its title; ``items`` lists the recently added objects,
+    newest first, and is not recorded.
+    """
+
+    _kind: str
+    _unrecorded_attributes = frozenset({"items"})
+
+    def __init__(self, coordinator: StashFeedCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._entry_id = entry.entry_id
+        self._attr_unique_id = f"{entry.entry_id}_latest_{self._kind}"
+
+    def _items(self) -> list[dict[str, Any]]:
+        return (self.coordinator.data or {}).get(self._kind) or []
+
+    @property
+    def native_value(self) -> str | None:
+        items = self._items()
+        if not items:
+            return None
+        # Состояние не длиннее 255 символов
+        return str(items[0].get("title") or items[0]["id"])[:255]
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {
+            "items": [
+                {
+                    "id": item["id"],
+                    "title": item.get("title"),
+                    "created_at": item.get("created_at"),
+                    "image": image_url(
+                        self.hass,
+                        self._entry_id,
+                        self._kind,
+                        str(item["id"]),
+                        item.get("updated_at"),
+                    ),
+                }
+                for item in self._items()
+            ]
+        }
+
+
+class StashLatestSceneSensor(StashLatestSensor):
+    """Sensor for the most recently added scene."""
+
+    _kind = "scenes"
+    _attr_name = "Latest Scene"
+    _attr_icon = "mdi:new-box"
+
+
+class StashLatestImageSensor(StashLatestSensor):
+    """Sensor for the most recently added image."""
+
+    _kind = "images"
+    _attr_name = "Latest Image"
+    _attr_icon = "mdi:image-plus"
+
+
+class StashGrowthSensor(BaseStashSensor):
+    """Sensor for the growth of one library value per day.
+
+    Rates per hour and per week are in attributes; all are unknown until
+    the trend buffer reaches back far enough.
+    """
+
+    _trend: str
+    _scale = 1.0
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: StashTrendTracker, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_{self._trend}_growth"
+
+    def _rate(self, window: str) -> float | None:
+        rates = (self.coordinator.data or {}).get(self._trend) or {}
+        rate = rates.get(window)
+        return round(rate / self._scale, 2) if rate is not None else None
+
+    @property
+    def native_value(self) -> float | None:
+        return self._rate("per_day")
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {
+            "per_hour": self._rate("per_hour"),
+            "per_week": self._rate("per_week"),
+            "since": (self.coordinator.data or {}).get("since"),
+        }
+
+
+class StashScenesGrowthSensor(StashGrowthSensor):
+    """Sensor for scenes added per day."""
+
+    _trend = "scenes"
+    _attr_name = "Scenes Growth"
+    _attr_icon = "mdi:trending-up"
+    _attr_native_unit_of_measurement = "items/d"
+
+
+class StashImagesGrowthSensor(StashGrowthSensor):
+    """Sensor for images added per day."""
+
+    _trend = "images"
+    _attr_name = "Images Growth"
+    _attr_icon = "mdi:trending-up"
+    _attr_native_unit_of_measurement = "items/d"
+
+
+class StashLibrarySizeGrowthSensor(StashGrowthSensor):
+    """Sensor for growth of scene and image files in GB per day."""
+
+    _trend = "size"
+    _scale = 1_000_000_000
+    _attr_name = "Library Size Growth"
+    _attr_icon = "mdi:harddisk-plus"
+    _attr_native_unit_of_measurement = "GB/d"
+
+
+class StashDiskFullSensor(BaseStashSensor):
+    """Sensor for when the library outgrows the capacity set in the options."""
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+
+    def __init__(self, coordinator: StashTrendTracker, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_disk_full"
+        self._attr_name = "Disk Full"
+        self._attr_icon = "mdi:harddisk-remove"
+
+    @property
+    def native_value(self) -> datetime | None:
+        return (self.coordinator.data or {}).get("disk_full")
+
+
+# Ключ -> (имя, иконка, единица, device_class) для сенсоров сводки
+AGGREGATE_SENSORS: dict[
+    str, tuple[str, str, str | None, SensorDeviceClass | None]
+] = {
+    "scenes": ("Scenes Count", "mdi:filmstrip", "items", None),
+    "images": ("Images Count", "mdi:image-multiple-outline", "items", None),
+    "galleries": ("Galleries Count", "mdi:image-album", "items", None),
+    "markers": ("Markers Count", "mdi:bookmark-multiple-outline", "items", None),
+    "movies": ("Movies/Groups Count", "mdi:movie-open-outline", "items", None),
+    "performers": ("Performers Count", "mdi:account-multiple", "items", None),
+    "studios": ("Studios Count", "mdi:office-building", "items", None),
+    "tags": ("Tags Count", "mdi:tag-multiple", "items", None),
+    "scenes_size": (
+        "Scenes Size",
+        "mdi:harddisk",
+        UnitOfInformation.BYTES,
+        SensorDeviceClass.DATA_SIZE,
+    ),
+    "images_size": (
+        "Images Size",
+        "mdi:harddisk",
+        UnitOfInformation.BYTES,
+        SensorDeviceClass.DATA_SIZE,
+    ),
+    "scenes_duration": (
+        "Scenes Duration",
+        "mdi:timer-outline",
+        UnitOfTime.SECONDS,
+        SensorDeviceClass.DURATION,
+    ),
+    "scenes_played": ("Scenes Played", "mdi:play-circle-outline", "items", None),
+    "total_play_count": ("Play Count", "mdi:play-box-multiple-outline", "plays", None),
+    "total_play_duration": (
+        "Play Duration",
+        "mdi:timer-play-outline",
+        UnitOfTime.SECONDS,
+        SensorDeviceClass.DURATION,
+    ),
+    "total_o_count": ("O-Count", "mdi:counter", None, None),
+}
+
+# Крупные единицы для показа, как у сенсоров отдельного сервера
+_SUGGESTED_UNITS = {
+    SensorDeviceClass.DATA_SIZE: UnitOfInformation.GIGABYTES,
+    SensorDeviceClass.DURATION: UnitOfTime.HOURS,
+}
+
+
+class _BaseAggregateSensor(CoordinatorEntity, SensorEntity):
+    """Sensor of the device with totals over all Stash servers."""
+
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator: StashAggregateHub, entry: ConfigEntry) -> None:
+        super().__init__(coordinator)
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name="Stash (all servers)",
+            manufacturer="Stash",
+        )
+
+
+class StashAggregateSensor(_BaseAggregateSensor):
+    """Sum of one counter over all Stash servers."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        coordinator: StashAggregateHub,
+        entry: ConfigEntry,
+        key: str,
+        name: str,
+        icon: str,
+        unit: str | None,
+        device_class: SensorDeviceClass | None,
+    ) -> None:
+        super().__init__(coordinator, entry)
+        self._key = key
+        self._attr_unique_id = f"{entry.entry_id}_total_{key}"
+        self._attr_name = name
+        self._attr_icon = icon
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_class = device_class
+        self._attr_suggested_unit_of_measurement = _SUGGESTED_UNITS.get(device_class)
+
+    @property
+    def native_value(self) -> float | None:
+        return ((self.coordinator.data or {}).get("totals") or {}).get(self._key)
+
+
+class StashAggregateAgeSensor(_BaseAggregateSensor):
+    """Age of the stalest server's counters; every server's age in attributes.
+
+    Ages are computed from the ``updated`` timestamps on every state write,
+    and the state is rewritten on a timer so it keeps growing while no
+    server updates.
+    """
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: StashAggregateHub, entry: ConfigEntry) -> None:
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{entry.entry_id}_data_age"
+        self._attr_name = "Data Age"
+        self._attr_icon = "mdi:clock-alert-outline"
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass,
+                self._async_tick,
+                timedelta(seconds=AGGREGATE_AGE_INTERVAL),
+            )
+        )
+
+    @callback
+    def _async_tick(self, _now: datetime) -> None:
+        self.async_write_ha_state()
+
+    def _instances(self) -> dict[str, dict[str, Any]]:
+        now = dt_util.utcnow()
+        instances: dict[str, dict[str, Any]] = {}
+        hub_instances = (self.coordinator.data or {}).get("instances") or {}
+        for entry_id, item in hub_instances.items():
+            updated = dt_util.parse_datetime(item["updated"]) if item["updated"] else None
+            instances[entry_id] = {
+                **item,
+                "age": round((now - updated).total_seconds()) if updated else None,
+            }
+        return instances
+
+    @property
+    def native_value(self) -> int | None:
+        instances = self._instances().values()
+        ages = [item["age"] for item in instances if item["age"] is not None]
+        return max(ages) if ages else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return self._instances()
+
+
+class _StashDiagnosticSensor(SensorEntity):
+    """Diagnostic sensor refreshed after every update of any tier coordinator."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self, coordinators: list[StashDataUpdateCoordinator], entry: ConfigEntry
+    ) -> None:
+        self._coordinators = coordinators
+        self._metrics = coordinators[0].client.metrics
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name="Stash",
+            manufacturer="Stash",
+        )
+
+    async def async_added_to_hass(self) -> None:
+        for coordinator in self._coordinators:
+            self.async_on_remove(
+                coordinator.async_add_listener(self.async_write_ha_state)
+            )
+
+
+class StashSuppressedWritesSensor(_StashDiagnosticSensor):
+    """Diagnostic sensor: state writes skipped because values were unchanged."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(
+        self, coordinators: list[StashDataUpdateCoordinator], entry: ConfigEntry
+    ) -> None:
+        super().__init__(coordinators, entry)
+        self._attr_unique_id = f"{entry.entry_id}_suppressed_writes"
+        self._attr_name = "Suppressed State Writes"
+        self._attr_icon = "mdi:content-save-off-outline"
+
+    @property
+    def native_value(self) -> int:
+        return sum(coordinator.suppressed_writes for coordinator in self._coordinators)
+
+
+class StashRequestLatencySensor(_StashDiagnosticSensor):
+    """Diagnostic sensor: p95 request latency, per-operation details in attributes."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self, coordinators: list[StashDataUpdateCoordinator], entry: ConfigEntry
+    ) -> None:
+        super().__init__(coordinators, entry)
+        self._attr_unique_id = f"{entry.entry_id}_request_latency_p95"
+        self._attr_name = "Request Latency p95"
+        self._attr_icon = "mdi:timer-sand"
+
+    @property
+    def native_value(self) -> float | None:
+        latency = self._metrics.p95_latency
+        return round(latency * 1000, 1) if latency is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {
+            name: {
+                key: value
+                for key, value in stats.items()
+                if key in ("requests", "p50_ms", "p95_ms", "max_ms", "avg_bytes")
+            }
+            for name, stats in self._metrics.as_dict()["operations"].items()
+        }
+
+
+class StashRequestFailuresSensor(_StashDiagnosticSensor):
+    """Diagnostic sensor: timeouts, transport and GraphQL errors since start."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(
+        self, coordinators: list[StashDataUpdateCoordinator], entry: ConfigEntry
+    ) -> None:
+        super().__init__(coordinators, entry)
+        self._attr_unique_id = f"{entry.entry_id}_request_failures"
+        self._attr_name = "Request Failures"
+        self._attr_icon = "mdi:alert-circle-outline"
+
+    @property
+    def native_value(self) -> int:
+        return self._metrics.failures
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return {
+            name: {
+                key: value
+                for key, value in stats.items()
+                if key in ("timeouts", "errors", "graphql_errors", "rejected")
+            }
+            for name, stats in self._metrics.as_dict()["operations"].items()
+        }
+
+
+class StashRefreshDurationSensor(_StashDiagnosticSensor):
+    """Diagnostic sensor: wall time of the last refresh, per tier in attributes."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self, coordinators: list[StashDataUpdateCoordinator], entry: ConfigEntry
+    ) -> None:
+        super().__init__(coordinators, entry)
+        self._attr_unique_id = f"{entry.entry_id}_refresh_duration"
+        self._attr_name = "Refresh Duration"
+        self._attr_icon = "mdi:timer-refresh-outline"
+
+    @property
+    def native_value(self) -> float | None:
+        durations = self._metrics.as_dict()["refresh_ms"]
+        return max(durations.values()) if durations else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        return self._metrics.as_dict()["refresh_ms"]
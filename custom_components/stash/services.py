@@ -0,0 +1,406 @@
+"""Services of the Stash integration."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .api import StashClient, StashError
+from .const import DOMAIN, PIPELINE_STEP_TIMEOUT, SEARCH_MAX_RESULTS
+from .health import HEALTH_CHECKS
+from .image_proxy import image_url
+from .pipeline import ON_FAILURE_CONTINUE, ON_FAILURE_STOP, PIPELINE_TASKS
+
+SERVICE_SEARCH = "search"
+SERVICE_SET_RATING = "set_rating"
+SERVICE_ADD_TAGS = "add_tags"
+SERVICE_REMOVE_TAGS = "remove_tags"
+SERVICE_SET_ORGANIZED = "set_organized"
+SERVICE_RUN_PIPELINE = "run_pipeline"
+SERVICE_SCAN = "scan"
+SERVICE_GENERATE = "generate"
+SERVICE_LIBRARY_HEALTH = "library_health"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_QUERY = "query"
+ATTR_TAGS = "tags"
+ATTR_PERFORMERS = "performers"
+ATTR_STUDIO = "studio"
+ATTR_PLAYED = "played"
+ATTR_ORGANIZED = "organized"
+ATTR_SORT = "sort"
+ATTR_DIRECTION = "direction"
+ATTR_LIMIT = "limit"
+ATTR_IDS = "ids"
+ATTR_TYPE = "type"
+ATTR_RATING = "rating"
+ATTR_TASKS = "tasks"
+ATTR_STEP_TIMEOUT = "step_timeout"
+ATTR_ON_FAILURE = "on_failure"
+ATTR_PATHS = "paths"
+ATTR_SCENE_IDS = "scene_ids"
+ATTR_CHECKS = "checks"
+ATTR_REFRESH = "refresh"
+
+# Поле сервиса -> поле ScanMetadataInput
+SCAN_OPTIONS: dict[str, str] = {
+    "covers": "scanGenerateCovers",
+    "previews": "scanGeneratePreviews",
+    "image_previews": "scanGenerateImagePreviews",
+    "sprites": "scanGenerateSprites",
+    "phashes": "scanGeneratePhashes",
+    "thumbnails": "scanGenerateThumbnails",
+    "clip_previews": "scanGenerateClipPreviews",
+    "rescan": "rescan",
+}
+
+# Поле сервиса -> поле GenerateMetadataInput
+GENERATE_OPTIONS: dict[str, str] = {
+    "covers": "covers",
+    "sprites": "sprites",
+    "previews": "previews",
+    "image_previews": "imagePreviews",
+    "markers": "markers",
+    "phashes": "phashes",
+    "thumbnails": "thumbnails",
+    "transcodes": "transcodes",
+    "clip_previews": "clipPreviews",
+    "overwrite": "overwrite",
+}
+
+SORT_OPTIONS = (
+    "created_at",
+    "updated_at",
+    "date",
+    "title",
+    "rating",
+    "play_count",
+    "last_played_at",
+    "duration",
+    "random",
+)
+
+SEARCH_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_QUERY): cv.string,
+        vol.Optional(ATTR_TAGS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_PERFORMERS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_STUDIO): cv.string,
+        vol.Optional(ATTR_PLAYED): cv.boolean,
+        vol.Optional(ATTR_ORGANIZED): cv.boolean,
+        vol.Optional(ATTR_SORT, default="created_at"): vol.In(SORT_OPTIONS),
+        vol.Optional(ATTR_DIRECTION, default="desc"): vol.In(("asc", "desc")),
+        vol.Optional(ATTR_LIMIT, default=10): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=SEARCH_MAX_RESULTS)
+        ),
+    }
+)
+
+UPDATE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_IDS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_TYPE, default="scene"): vol.In(("scene", "image")),
+    }
+)
+SET_RATING_SCHEMA = UPDATE_SCHEMA.extend(
+    {vol.Required(ATTR_RATING): vol.All(vol.Coerce(int), vol.Range(min=0, max=100))}
+)
+TAGS_SCHEMA = UPDATE_SCHEMA.extend(
+    {vol.Required(ATTR_TAGS): vol.All(cv.ensure_list, [cv.string])}
+)
+SET_ORGANIZED_SCHEMA = UPDATE_SCHEMA.extend(
+    {vol.Optional(ATTR_ORGANIZED, default=True): cv.boolean}
+)
+RUN_PIPELINE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_TASKS): vol.All(
+            cv.ensure_list, [vol.In(PIPELINE_TASKS)], vol.Length(min=1)
+        ),
+        vol.Optional(ATTR_STEP_TIMEOUT, default=PIPELINE_STEP_TIMEOUT): vol.All(
+            vol.Coerce(int), vol.Range(min=60)
+        ),
+        vol.Optional(ATTR_ON_FAILURE, default=ON_FAILURE_STOP): vol.In(
+            (ON_FAILURE_STOP, ON_FAILURE_CONTINUE)
+        ),
+    }
+)
+SCAN_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_PATHS): vol.All(cv.ensure_list, [cv.string]),
+        **{vol.Optional(option): cv.boolean for option in SCAN_OPTIONS},
+    }
+)
+GENERATE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_PATHS): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_SCENE_IDS): vol.All(cv.ensure_list, [cv.string]),
+        **{vol.Optional(option): cv.boolean for option in GENERATE_OPTIONS},
+    }
+)
+LIBRARY_HEALTH_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_CHECKS): vol.All(cv.ensure_list, [vol.In(HEALTH_CHECKS)]),
+        vol.Optional(ATTR_REFRESH, default=False): cv.boolean,
+    }
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the Stash services (once, for all entries)."""
+
+    async def _async_search(call: ServiceCall) -> ServiceResponse:
+        entry_id, client = _async_get_client(hass, call)
+        try:
+            find_filter, scene_filter = await _async_build_filters(client, call.data)
+            total, scenes = await client.async_search_scenes(find_filter, scene_filter)
+        except StashError as err:
+            raise HomeAssistantError(f"Stash search failed: {err}") from err
+        return {
+            "count": total,
+            "scenes": [_scene_response(hass, entry_id, scene) for scene in scenes],
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEARCH,
+        _async_search,
+        schema=SEARCH_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_update(call: ServiceCall) -> ServiceResponse:
+        _, client = _async_get_client(hass, call)
+        if call.service == SERVICE_SET_RATING:
+            # 0 снимает оценку
+            change: dict[str, Any] = {"rating100": call.data[ATTR_RATING] or None}
+        elif call.service == SERVICE_SET_ORGANIZED:
+            change = {"organized": call.data[ATTR_ORGANIZED]}
+        else:
+            mode = "ADD" if call.service == SERVICE_ADD_TAGS else "REMOVE"
+            tag_ids = await _async_ids(client, "tags", call.data[ATTR_TAGS])
+            change = {"tag_ids": {"ids": tag_ids, "mode": mode}}
+
+        ids = list(dict.fromkeys(call.data[ATTR_IDS]))
+        # Правки из разных вызовов за короткое окно уходят одним bulk-запросом
+        futures = client.writes.enqueue(call.data[ATTR_TYPE], ids, change)
+        outcomes = await asyncio.gather(*futures, return_exceptions=True)
+        failed = {
+            object_id: str(outcome)
+            for object_id, outcome in zip(ids, outcomes)
+            if isinstance(outcome, BaseException)
+        }
+        if failed and not call.return_response:
+            raise HomeAssistantError(
+                f"Stash update failed for {len(failed)} of {len(ids)}: "
+                + "; ".join(f"{object_id}: {error}" for object_id, error in failed.items())
+            )
+        return {
+            "updated": [object_id for object_id in ids if object_id not in failed],
+            "failed": failed,
+        }
+
+    async def _async_run_pipeline(call: ServiceCall) -> None:
+        _, data = _async_get_entry_data(hass, call)
+        data["pipeline"].async_start(
+            call.data[ATTR_TASKS], call.data[ATTR_STEP_TIMEOUT], call.data[ATTR_ON_FAILURE]
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_RUN_PIPELINE, _async_run_pipeline, schema=RUN_PIPELINE_SCHEMA
+    )
+
+    async def _async_run_task(call: ServiceCall) -> ServiceResponse:
+        _, data = _async_get_entry_data(hass, call)
+        client: StashClient = data["client"]
+        paths = call.data.get(ATTR_PATHS)
+        try:
+            if call.service == SERVICE_SCAN:
+                options = {
+                    field: call.data[option]
+                    for option, field in SCAN_OPTIONS.items()
+                    if option in call.data
+                }
+                job_id = await client.async_metadata_scan(paths, options)
+            else:
+                options = {
+                    field: call.data[option]
+                    for option, field in GENERATE_OPTIONS.items()
+                    if option in call.data
+                }
+                if paths:
+                    options["paths"] = paths
+                if scene_ids := call.data.get(ATTR_SCENE_IDS):
+                    options["sceneIDs"] = scene_ids
+                job_id = await client.async_metadata_generate(options)
+        except StashError as err:
+            raise HomeAssistantError(f"Cannot start Stash {call.service}: {err}") from err
+        await data["jobs"].async_track(job_id)
+        return {"job_id": job_id}
+
+    for service, schema in ((SERVICE_SCAN, SCAN_SCHEMA), (SERVICE_GENERATE, GENERATE_SCHEMA)):
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            _async_run_task,
+            schema=schema,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+    async def _async_library_health(call: ServiceCall) -> ServiceResponse:
+        _, data = _async_get_entry_data(hass, call)
+        health = data["health"]
+        if call.data[ATTR_REFRESH]:
+            await health.async_analyze_now()
+        result: dict[str, Any] = health.data or {}
+        checks: dict[str, Any] = result.get("checks") or {}
+        return {
+            "checked": result.get("checked"),
+            **{
+                check: checks.get(check)
+                for check in call.data.get(ATTR_CHECKS) or HEALTH_CHECKS
+            },
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_LIBRARY_HEALTH,
+        _async_library_health,
+        schema=LIBRARY_HEALTH_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    for service, schema in (
+        (SERVICE_SET_RATING, SET_RATING_SCHEMA),
+        (SERVICE_ADD_TAGS, TAGS_SCHEMA),
+        (SERVICE_REMOVE_TAGS, TAGS_SCHEMA),
+        (SERVICE_SET_ORGANIZED, SET_ORGANIZED_SCHEMA),
+    ):
+        hass.services.async_register(
+            DOMAIN,
+            service,
+            _async_update,
+            schema=schema,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+
+def _async_get_client(hass: HomeAssistant, call: ServiceCall) -> tuple[str, StashClient]:
+    """Client of the requested entry, or of the only one loaded."""
+    entry_id, data = _async_get_entry_data(hass, call)
+    return entry_id, data["client"]
+
+
+def _async_get_entry_data(
+    hass: HomeAssistant, call: ServiceCall
+) -> tuple[str, dict[str, Any]]:
+    """Runtime data of the requested entry, or of the only one loaded."""
+    entries: dict[str, dict[str, Any]] = hass.data.get(DOMAIN, {})
+    if (entry_id := call.data.get(ATTR_CONFIG_ENTRY_ID)) is None:
+        if len(entries) != 1:
+            raise ServiceValidationError(
+                f"Several Stash servers are configured; set {ATTR_CONFIG_ENTRY_ID}"
+                if entries
+                else "No Stash server is loaded"
+            )
+        entry_id = next(iter(entries))
+    if entry_id not in entries:
+        raise ServiceValidationError(f"Stash entry {entry_id} is not loaded")
+    return entry_id, entries[entry_id]
+
+
+async def _async_ids(client: StashClient, kind: str, values: list[str]) -> list[str]:
+    """IDs stay as they are, names are looked up (exact match)."""
+    ids = {value for value in values if value.isdigit()}
+    names = {value for value in values if not value.isdigit()}
+    try:
+        resolved = await client.async_resolve_names(kind, names)
+    except StashError as err:
+        raise HomeAssistantError(f"Cannot look up Stash {kind}: {err}") from err
+    if missing := names - resolved.keys():
+        raise ServiceValidationError(f"Unknown Stash {kind}: {', '.join(sorted(missing))}")
+    return sorted(ids | set(resolved.values()), key=int)
+
+
+async def _async_build_filters(
+    client: StashClient, data: dict[str, Any]
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Normalized FindFilterType / SceneFilterType variables for a search.
+
+    Equal searches give equal dicts (sorted IDs, trimmed text), so they
+    share one cache entry.
+    """
+    find_filter: dict[str, Any] = {
+        "per_page": data[ATTR_LIMIT],
+        "sort": data[ATTR_SORT],
+        "direction": data[ATTR_DIRECTION].upper(),
+    }
+    if query := (data.get(ATTR_QUERY) or "").strip():
+        find_filter["q"] = query
+
+    scene_filter: dict[str, Any] = {}
+    if tags := data.get(ATTR_TAGS):
+        scene_filter["tags"] = {
+            "value": await _async_ids(client, "tags", tags),
+            "modifier": "INCLUDES_ALL",
+            "depth": 0,
+        }
+    if performers := data.get(ATTR_PERFORMERS):
+        scene_filter["performers"] = {
+            "value": await _async_ids(client, "performers", performers),
+            "modifier": "INCLUDES_ALL",
+        }
+    if studio := data.get(ATTR_STUDIO):
+        scene_filter["studios"] = {
+            "value": await _async_ids(client, "studios", [studio]),
+            "modifier": "INCLUDES",
+            "depth": 0,
+        }
+    if (played := data.get(ATTR_PLAYED)) is not None:
+        scene_filter["play_count"] = {
+            "value": 0,
+            "modifier": "GREATER_THAN" if played else "EQUALS",
+        }
+    if (organized := data.get(ATTR_ORGANIZED)) is not None:
+        scene_filter["organized"] = organized
+    return find_filter, scene_filter
+
+
+def _scene_response(
+    hass: HomeAssistant, entry_id: str, scene: dict[str, Any]
+) -> dict[str, Any]:
+    """Flat, template-friendly view of one scene."""
+    files = scene.get("files") or []
+    paths = scene.get("paths") or {}
+    studio = scene.get("studio") or {}
+    return {
+        "id": scene["id"],
+        "title": scene.get("title"),
+        "date": scene.get("date"),
+        "rating100": scene.get("rating100"),
+        "organized": scene.get("organized"),
+        "play_count": scene.get("play_count"),
+        "duration": files[0].get("duration") if files else None,
+        "studio": studio.get("name"),
+        "tags": [tag["name"] for tag in scene.get("tags") or []],
+        "performers": [performer["name"] for performer in scene.get("performers") or []],
+        "image": image_url(
+            hass, entry_id, "scenes", str(scene["id"]), scene.get("updated_at")
+        ),
+        "stream": paths.get("stream"),
+    }
@@ -0,0 +1,138 @@
+"""GraphQL websocket subscriptions for push updates from Stash."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+import random
+from typing import Any
+
+import aiohttp
+import async_timeout
+
+from .api import StashError
+from .const import SUBSCRIPTION_BACKOFF_MAX, SUBSCRIPTION_BACKOFF_MIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# gqlgen (сервер Stash) понимает оба протокола
+GRAPHQL_TRANSPORT_WS = "graphql-transport-ws"
+GRAPHQL_WS = "graphql-ws"
+
+EVENT_JOB = "job"
+EVENT_SCAN_COMPLETE = "scan_complete"
+
+# subscription id -> (event kind, document)
+SUBSCRIPTIONS: dict[str, tuple[str, str]] = {
+    "jobs": (
+        EVENT_JOB,
+        "subscription { jobsSubscribe { type job { id status progress description } } }",
+    ),
+    "scan": (EVENT_SCAN_COMPLETE, "subscription { scanCompleteSubscribe }"),
+}
+
+
+def graphql_ws_url(graphql_url: str) -> str:
+    """Turn ``http(s)://host/graphql`` into ``ws(s)://host/graphql``."""
+    if graphql_url.startswith("https://"):
+        return "wss://" + graphql_url[len("https://") :]
+    if graphql_url.startswith("http://"):
+        return "ws://" + graphql_url[len("http://") :]
+    return graphql_url
+
+
+class StashSubscriptionClient:
+    """Keep a websocket subscription open and forward events.
+
+    Independent of Home Assistant: it only needs an aiohttp session, so it
+    can run against a local aiohttp websocket stand-in.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        graphql_url: str,
+        on_event: Callable[[str, dict[str, Any]], None],
+        on_connection_change: Callable[[bool], None] | None = None,
+    ) -> None:
+        self._session = session
+        self._ws_url = graphql_ws_url(graphql_url)
+        self._on_event = on_event
+        self._on_connection_change = on_connection_change
+        self.connected = False
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if self._on_connection_change is not None:
+            self._on_connection_change(connected)
+
+    async def run(self) -> None:
+        """Connect forever, reconnecting with jittered exponential backoff."""
+        delay = SUBSCRIPTION_BACKOFF_MIN
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                # Остановка (выгрузка записи): без колбэка — переходить к опросу
+                # уже некому
+                self.connected = False
+                raise
+            except Exception as err:  # noqa: BLE001
+                _LOGGER.debug("Stash subscription dropped: %s", err)
+
+            if self.connected:
+                # Соединение было рабочим — начинаем backoff заново
+                delay = SUBSCRIPTION_BACKOFF_MIN
+            self._set_connected(False)
+
+            await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, SUBSCRIPTION_BACKOFF_MAX)
+
+    async def _listen(self) -> None:
+        async with self._session.ws_connect(
+            self._ws_url,
+            protocols=(GRAPHQL_TRANSPORT_WS, GRAPHQL_WS),
+            heartbeat=30,
+        ) as ws:
+            legacy = ws.protocol != GRAPHQL_TRANSPORT_WS
+            await ws.send_json({"type": "connection_init", "payload": {}})
+            async with async_timeout.timeout(10):
+                ack = await ws.receive_json()
+            if ack.get("type") != "connection_ack":
+                raise StashError(f"Subscription handshake rejected: {ack}")
+
+            for sub_id, (_, query) in SUBSCRIPTIONS.items():
+                await ws.send_json(
+                    {
+                        "id": sub_id,
+                        "type": "start" if legacy else "subscribe",
+                        "payload": {"query": query},
+                    }
+                )
+            self._set_connected(True)
+
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                await self._handle_message(ws, msg.json())
+
+    async def _handle_message(
+        self, ws: aiohttp.ClientWebSocketResponse, message: dict[str, Any]
+    ) -> None:
+        msg_type = message.get("type")
+        if msg_type == "ping":
+            await ws.send_json({"type": "pong"})
+            return
+        if msg_type in ("error", "connection_error"):
+            raise StashError(f"Subscription error: {message.get('payload')}")
+        if msg_type not in ("data", "next"):
+            # ka / pong / complete — служебные сообщения
+            return
+
+        entry = SUBSCRIPTIONS.get(str(message.get("id")))
+        payload = (message.get("payload") or {}).get("data")
+        if entry is None or not payload:
+            return
+        self._on_event(entry[0], payload)
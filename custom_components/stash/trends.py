@@ -0,0 +1,148 @@
+"""Library growth rates from a small ring buffer of past counts."""
+from __future__ import annotations
+
+from collections import deque
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    CONF_LIBRARY_CAPACITY,
+    DOMAIN,
+    STATE_SAVE_DELAY,
+    STORAGE_VERSION,
+    TREND_BUFFER_SIZE,
+    TREND_SAMPLE_INTERVAL,
+)
+from .coordinator import StashDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Значения в точке буфера: [время, *TREND_KEYS]
+TREND_KEYS: tuple[str, ...] = ("scenes", "images", "size")
+
+TREND_WINDOWS: dict[str, int] = {
+    "per_hour": 3600,
+    "per_day": 86400,
+    "per_week": 7 * 86400,
+}
+
+
+def trends_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with the ring buffer of past counts."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.trends")
+
+
+def _values(data: dict[str, Any]) -> list[float | None]:
+    sizes = [data[key] for key in ("scenes_size", "images_size") if data.get(key) is not None]
+    return [data.get("scenes"), data.get("images"), sum(sizes) if sizes else None]
+
+
+class StashTrendTracker(DataUpdateCoordinator):
+    """Derive growth rates from the media tier, without recorder queries.
+
+    After every media refresh the counts are compared with the buffered
+    sample closest to one hour, day and week ago. A new sample is buffered
+    at most once per ``TREND_SAMPLE_INTERVAL``; the fixed-size buffer is
+    persisted, so rates survive restarts. With a library capacity set in
+    the options, the weekly size growth also gives a disk-full estimate.
+    Data is pushed; nothing is polled for it.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        media: StashDataUpdateCoordinator,
+    ) -> None:
+        super().__init__(hass, _LOGGER, config_entry=entry, name="Stash trends")
+        self._media = media
+        self._store = trends_store(hass, entry.entry_id)
+        # ГБ -> байты, как у Scenes Size
+        self._capacity = entry.options.get(CONF_LIBRARY_CAPACITY, 0) * 1_000_000_000
+        self._samples: deque[list[float | None]] = deque(maxlen=TREND_BUFFER_SIZE)
+        self.data = self._compute(None)
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        return self.data
+
+    async def async_restore(self) -> None:
+        """Load the buffer; rates are known right after a restart."""
+        stored = await self._store.async_load() or {}
+        self._samples.extend(stored.get("samples") or [])
+        if self._samples:
+            self.data = self._compute(self._samples[-1])
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow media refreshes; return the unsubscribe callback."""
+        return self._media.async_add_listener(self._async_media_updated)
+
+    @callback
+    def _async_media_updated(self) -> None:
+        if not self._media.last_update_success or not self._media.data:
+            return
+        values = _values(self._media.data)
+        if all(value is None for value in values):
+            return
+        current = [dt_util.utcnow().timestamp(), *values]
+        if not self._samples or current[0] - self._samples[-1][0] >= TREND_SAMPLE_INTERVAL:
+            self._samples.append(current)
+            self._store.async_delay_save(self._data_to_save, STATE_SAVE_DELAY)
+        self.async_set_updated_data(self._compute(current))
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"samples": list(self._samples)}
+
+    def _compute(self, current: list[float | None] | None) -> dict[str, Any]:
+        """Rates per window for each key, and the disk-full estimate."""
+        data: dict[str, Any] = {key: dict.fromkeys(TREND_WINDOWS) for key in TREND_KEYS}
+        data["disk_full"] = None
+        data["since"] = (
+            dt_util.utc_from_timestamp(self._samples[0][0]).isoformat()
+            if self._samples
+            else None
+        )
+        if current is None:
+            return data
+
+        now = current[0]
+        for window_name, window in TREND_WINDOWS.items():
+            # Самая свежая точка не моложе окна
+            base = next(
+                (sample for sample in reversed(self._samples) if now - sample[0] >= window),
+                None,
+            )
+            if base is None:
+                continue
+            for index, key in enumerate(TREND_KEYS, start=1):
+                if current[index] is None or base[index] is None:
+                    continue
+                data[key][window_name] = (current[index] - base[index]) / (
+                    now - base[0]
+                ) * window
+
+        data["disk_full"] = self._disk_full(current, data["size"])
+        return data
+
+    def _disk_full(
+        self, current: list[float | None], size_rates: dict[str, float | None]
+    ) -> datetime | None:
+        size = current[TREND_KEYS.index("size") + 1]
+        if not self._capacity or size is None:
+            return None
+        for window_name in ("per_week", "per_day"):
+            if (rate := size_rates[window_name]) is not None:
+                break
+        else:
+            return None
+        if rate <= 0:
+            return None
+        seconds = max(0.0, self._capacity - size) / rate * TREND_WINDOWS[window_name]
+        return dt_util.utc_from_timestamp(current[0]) + timedelta(seconds=seconds)
@@ -0,0 +1,187 @@
+"""Scan only changed folders, driven by ``folder_watcher`` events."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+import logging
+import posixpath
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .api import StashClient, StashError
+from .const import (
+    WATCH_DEBOUNCE,
+    WATCH_IGNORED_SUFFIXES,
+    WATCH_MAX_DELAY,
+    WATCH_MAX_PATHS,
+    WATCH_RETRY_MAX,
+    WATCH_SCAN_GENERATE,
+)
+from .jobs import StashJobCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_FOLDER_WATCHER = "folder_watcher"
+
+
+def parse_path_map(text: str) -> list[tuple[str, str]]:
+    """Parse ``/ha/path=/stash/path`` pairs (comma or newline separated)."""
+    pairs: list[tuple[str, str]] = []
+    for item in text.replace("\n", ",").split(","):
+        if "=" not in item:
+            continue
+        local, remote = (part.strip().rstrip("/") for part in item.split("=", 1))
+        if local and remote:
+            pairs.append((local, remote))
+    # Самый длинный префикс — первым
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+def _depth(path: str) -> int:
+    return path.rstrip("/").count("/")
+
+
+def _prune(paths: Iterable[str]) -> list[str]:
+    """Drop paths that lie inside another path of the set."""
+    kept: list[str] = []
+    for path in sorted(set(paths)):
+        if not any(
+            path == parent or path.startswith(parent.rstrip("/") + "/") for parent in kept
+        ):
+            kept.append(path)
+    return kept
+
+
+def collapse_paths(paths: Iterable[str], limit: int) -> list[str]:
+    """Reduce directories to at most ``limit`` common parents."""
+    collapsed = _prune(posixpath.normpath(path) for path in paths)
+    while len(collapsed) > limit:
+        deepest = max(_depth(path) for path in collapsed)
+        if deepest <= 1:
+            break
+        collapsed = _prune(
+            posixpath.dirname(path) if _depth(path) == deepest else path
+            for path in collapsed
+        )
+    return collapsed
+
+
+class StashFolderWatcher:
+    """Collect changed folders for a debounce window, then scan just them.
+
+    Uses the events of HA's ``folder_watcher`` integration. Directories
+    are mapped from HA paths to the paths Stash sees, merged into a few
+    common parents and sent as one scoped ``metadataScan`` (optionally
+    generating covers, previews, sprites and phashes for new files).
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: StashClient,
+        jobs: StashJobCoordinator,
+        path_map: list[tuple[str, str]],
+        generate: bool,
+    ) -> None:
+        self.hass = hass
+        self._client = client
+        self._jobs = jobs
+        self._path_map = path_map
+        self._generate = generate
+        self._pending: set[str] = set()
+        self._first_event: float | None = None
+        self._unsub_debounce: CALLBACK_TYPE | None = None
+        self._retry_delay = WATCH_DEBOUNCE
+        self._stopped = False
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Listen to folder_watcher; return the unsubscribe callback."""
+        unsub = self.hass.bus.async_listen(EVENT_FOLDER_WATCHER, self._async_on_event)
+
+        @callback
+        def _stop() -> None:
+            unsub()
+            self._stopped = True
+            self._async_cancel_debounce()
+
+        return _stop
+
+    def _to_stash(self, path: str) -> str | None:
+        if not self._path_map:
+            return path
+        for local, remote in self._path_map:
+            if path == local or path.startswith(local + "/"):
+                return remote + path[len(local) :]
+        # Папка вне библиотеки Stash
+        return None
+
+    @callback
+    def _async_on_event(self, event: Event) -> None:
+        data: dict[str, Any] = event.data
+        name = str(data.get("file") or "")
+        if name.startswith(".") or name.lower().endswith(WATCH_IGNORED_SUFFIXES):
+            return
+        folders = [data.get("folder")]
+        if data.get("dest_folder"):
+            folders.append(data["dest_folder"])
+        for folder in folders:
+            if folder and (path := self._to_stash(str(folder).rstrip("/"))):
+                self._pending.add(path)
+        if not self._pending:
+            return
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        elif now - self._first_event > WATCH_MAX_DELAY:
+            # События идут без перерыва — не откладываем скан бесконечно
+            return
+        # Окно сдвигается, пока события идут (загрузка ещё пишется)
+        self._async_schedule(WATCH_DEBOUNCE)
+
+    @callback
+    def _async_schedule(self, delay: float) -> None:
+        self._async_cancel_debounce()
+        if not self._stopped:
+            self._unsub_debounce = async_call_later(
+                self.hass, delay, self._async_debounced
+            )
+
+    @callback
+    def _async_cancel_debounce(self) -> None:
+        if self._unsub_debounce is not None:
+            self._unsub_debounce()
+            self._unsub_debounce = None
+
+    @callback
+    def _async_debounced(self, _now: Any) -> None:
+        self._unsub_debounce = None
+        self.hass.async_create_task(self.async_scan_pending())
+
+    async def async_scan_pending(self) -> None:
+        """Start one scoped scan for the folders collected so far."""
+        paths = collapse_paths(self._pending, WATCH_MAX_PATHS)
+        self._pending.clear()
+        self._first_event = None
+        if not paths:
+            return
+        options = dict.fromkeys(WATCH_SCAN_GENERATE, True) if self._generate else None
+        try:
+            job_id = await self._client.async_metadata_scan(paths, options)
+        except StashError as err:
+            _LOGGER.warning(
+                "Cannot start Stash scan of %s, retrying in %s s: %s",
+                paths,
+                self._retry_delay,
+                err,
+            )
+            # Повторяем сами, не дожидаясь новых событий в папках
+            self._pending.update(paths)
+            self._async_schedule(self._retry_delay)
+            self._retry_delay = min(self._retry_delay * 2, WATCH_RETRY_MAX)
+            return
+        self._retry_delay = WATCH_DEBOUNCE
+        _LOGGER.debug("Stash scan of %s started as job %s", paths, job_id)
+        await self._jobs.async_track(job_id)
@@ -0,0 +1,144 @@
+"""Coalescing write queue for bulk scene/image metadata updates."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import json
+import logging
+from typing import Any
+
+from .const import WRITE_BATCH_SIZE, WRITE_FLUSH_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+# Тип объекта -> (мутация, тип её input)
+BULK_MUTATIONS: dict[str, tuple[str, str]] = {
+    "scene": ("bulkSceneUpdate", "BulkSceneUpdateInput"),
+    "image": ("bulkImageUpdate", "BulkImageUpdateInput"),
+}
+
+
+@dataclass
+class _Batch:
+    """Edits with the same change, applied by one bulk mutation."""
+
+    kind: str
+    change: dict[str, Any]
+    key: str
+    items: dict[str, asyncio.Future[None]] = field(default_factory=dict)
+
+
+class StashWriteQueue:
+    """Collect edits for a short window, then send them as bulk updates.
+
+    Edits with an identical change (same rating, same tags to add...) are
+    merged into one ``bulkSceneUpdate``/``bulkImageUpdate`` call of at most
+    ``WRITE_BATCH_SIZE`` IDs. Batches go out in the order they were opened;
+    an edit never joins a batch older than a later edit of the same object,
+    so the last edit wins. Each edit gets a future that fails on its own if
+    its object was not updated.
+    """
+
+    def __init__(
+        self,
+        post: Callable[[str, dict[str, Any]], Awaitable[dict[str, Any]]],
+        on_flushed: Callable[[], None] | None = None,
+    ) -> None:
+        self._post = post
+        self._on_flushed = on_flushed
+        self._batches: list[_Batch] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+        self.requests = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(batch.items) for batch in self._batches)
+
+    def enqueue(
+        self, kind: str, ids: list[str], change: dict[str, Any]
+    ) -> list[asyncio.Future[None]]:
+        """Queue one change for several objects; return a future per object."""
+        if kind not in BULK_MUTATIONS:
+            raise ValueError(f"Unknown object type: {kind}")
+        key = f"{kind}\n{json.dumps(change, sort_keys=True)}"
+        loop = asyncio.get_running_loop()
+        futures: list[asyncio.Future[None]] = []
+        for object_id in ids:
+            batch = self._open_batch(kind, change, key, object_id)
+            future = batch.items.get(object_id)
+            if future is None:
+                future = batch.items[object_id] = loop.create_future()
+            futures.append(future)
+        if self._timer is None and self._batches:
+            self._timer = loop.call_later(WRITE_FLUSH_DELAY, self._schedule_flush)
+        return futures
+
+    def _open_batch(
+        self, kind: str, change: dict[str, Any], key: str, object_id: str
+    ) -> _Batch:
+        for index in range(len(self._batches) - 1, -1, -1):
+            batch = self._batches[index]
+            if batch.key == key:
+                return batch
+            if batch.kind == kind and object_id in batch.items:
+                # Более поздняя правка этого объекта — нужен новый пакет
+                break
+        batch = _Batch(kind, change, key)
+        self._batches.append(batch)
+        return batch
+
+    def _schedule_flush(self) -> None:
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self.async_flush())
+
+    async def async_flush(self) -> None:
+        """Send everything queued so far."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            batches, self._batches = self._batches, []
+            for batch in batches:
+                await self._async_send(batch)
+        if batches and self._on_flushed is not None:
+            self._on_flushed()
+
+    async def _async_send(self, batch: _Batch) -> None:
+        mutation, input_type = BULK_MUTATIONS[batch.kind]
+        document = (
+            f"mutation BulkUpdate($input: {input_type}!) "
+            f"{{ {mutation}(input: $input) {{ id }} }}"
+        )
+        ids = list(batch.items)
+        for start in range(0, len(ids), WRITE_BATCH_SIZE):
+            chunk = ids[start : start + WRITE_BATCH_SIZE]
+            self.requests += 1
+            try:
+                data = await self._post(
+                    document, {"input": {"ids": chunk, **batch.change}}
+                )
+            except Exception as err:  # noqa: BLE001 - ошибка относится к каждой правке
+                _LOGGER.warning(
+                    "Stash %s of %d objects failed: %s", mutation, len(chunk), err
+                )
+                for object_id in chunk:
+                    _resolve(batch.items[object_id], err)
+                continue
+            updated = {str(item["id"]) for item in (data["data"].get(mutation) or [])}
+            for object_id in chunk:
+                error = None
+                if object_id not in updated:
+                    error = LookupError(f"{batch.kind} {object_id} not found")
+                _resolve(batch.items[object_id], error)
+
+
+def _resolve(future: asyncio.Future[None], error: BaseException | None) -> None:
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
@@ -0,0 +1,61 @@
+"""Fixtures for the Stash integration tests."""
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator, Callable, Awaitable
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from custom_components.stash.api import StashClient
+
+from .fake_stash import FakeStashProfile, FakeStashServer
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Let Home Assistant load custom_components/stash."""
+    yield
+
+
+@pytest.fixture
+async def start_stash(socket_enabled) -> AsyncGenerator[
+    Callable[..., Awaitable[FakeStashServer]]
+]:
+    """Start fake Stash servers on free local ports; stop them afterwards.
+
+    The tests otherwise run with sockets disabled.
+    """
+    servers: list[FakeStashServer] = []
+
+    async def _start(**profile) -> FakeStashServer:
+        server = FakeStashServer(FakeStashProfile(**profile))
+        await server.start()
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        await server.stop()
+
+
+@pytest.fixture
+async def fake_stash(start_stash) -> FakeStashServer:
+    """One fake Stash server with the current schema and no latency."""
+    return await start_stash()
+
+
+@pytest.fixture
+def make_client(hass: HomeAssistant) -> Callable[..., Awaitable[StashClient]]:
+    """Client for a fake server, with capabilities probed as at setup."""
+
+    async def _make(server: FakeStashServer, probe: bool = True) -> StashClient:
+        client = StashClient(server.url, async_get_clientsession(hass))
+        if probe:
+            client.capabilities = await client.async_probe_capabilities()
+        return client
+
+    return _make
@@ -0,0 +1,386 @@
+"""Local stand-in for a Stash GraphQL server.
+
+Implements just enough of the Stash API for the integration: ``find*``
+counts, ``version``, ``stats``, ``jobQueue``/``findJob``, the task
+mutations, schema introspection and the ``jobsSubscribe`` /
+``scanCompleteSubscribe`` websocket subscriptions. Latency, error rate,
+outages and the schema generation are configurable per server.
+
+Run standalone::
+
+    python tests/fake_stash.py --port 9999 --schema legacy --latency 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import itertools
+import random
+import re
+from typing import Any
+
+from aiohttp import WSMsgType, web
+
+SCHEMA_MODERN = "modern"
+SCHEMA_LEGACY = "legacy"
+
+COUNTS: dict[str, int] = {
+    "findScenes": 104_512,
+    "findGroups": 812,
+    "findMovies": 812,
+    "findPerformers": 9_321,
+    "findStudios": 1_204,
+    "findTags": 3_377,
+    "findImages": 410_900,
+    "findGalleries": 6_012,
+    "findSceneMarkers": 22_450,
+}
+
+STATS: dict[str, float] = {
+    "scene_count": 104_512,
+    "scenes_size": 48.2e12,
+    "scenes_duration": 41_500_000.0,
+    "image_count": 410_900,
+    "images_size": 1.9e12,
+    "gallery_count": 6_012,
+    "performer_count": 9_321,
+    "studio_count": 1_204,
+    "group_count": 812,
+    "movie_count": 812,
+    "tag_count": 3_377,
+    "total_o_count": 5_230,
+    "total_play_duration": 2_100_000.0,
+    "total_play_count": 18_004,
+    "scenes_played": 7_450,
+}
+
+TASK_MUTATIONS: dict[str, str] = {
+    "metadataScan": "Scanning...",
+    "metadataGenerate": "Generating...",
+    "metadataAutoTag": "Auto-tagging...",
+    "metadataClean": "Cleaning...",
+    "metadataIdentify": "Identifying...",
+}
+
+_FIELD_RE = re.compile(r"\s*(?:(\w+)\s*:\s*)?(\w+)")
+
+
+@dataclass
+class FakeStashProfile:
+    """Behaviour of one fake server."""
+
+    schema: str = SCHEMA_MODERN
+    version: str = "v0.28.1"
+    # задержка ответа, секунды (к ней добавляется jitter)
+    latency: float = 0.0
+    jitter: float = 0.0
+    # доля запросов, на которые сервер отвечает HTTP 500
+    error_rate: float = 0.0
+    # сервер "выключен": все запросы получают 503
+    offline: bool = False
+    # сколько секунд выполняется каждая задача
+    job_duration: float = 2.0
+
+
+@dataclass
+class FakeStashState:
+    """Counters and jobs of a running fake server, for assertions."""
+
+    requests: int = 0
+    documents: list[str] = field(default_factory=list)
+    jobs: dict[str, dict[str, Any]] = field(default_factory=dict)
+    # открытые websocket -> {id подписки: "jobs" | "scan"}
+    sockets: dict[web.WebSocketResponse, dict[str, str]] = field(default_factory=dict)
+    ids: itertools.count = field(default_factory=lambda: itertools.count(1))
+
+
+def _public(job: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in job.items() if not key.startswith("_")}
+
+
+def split_fields(body: str) -> list[tuple[str, str, str, str]]:
+    """Split a selection set into ``(alias, name, args, selection)`` tuples."""
+    fields: list[tuple[str, str, str, str]] = []
+    pos = 0
+    while pos < len(body):
+        match = _FIELD_RE.match(body, pos)
+        if match is None or not match.group(2):
+            break
+        alias, name = match.group(1) or match.group(2), match.group(2)
+        pos = match.end()
+        args = selection = ""
+        for opener, closer in (("(", ")"), ("{", "}")):
+            while pos < len(body) and body[pos].isspace():
+                pos += 1
+            if pos < len(body) and body[pos] == opener:
+                depth, start = 0, pos
+                while pos < len(body):
+                    depth += body[pos] == opener
+                    depth -= body[pos] == closer
+                    pos += 1
+                    if depth == 0:
+                        break
+                if opener == "(":
+                    args = body[start + 1 : pos - 1]
+                else:
+                    selection = body[start + 1 : pos - 1]
+        fields.append((alias, name, args, selection))
+        while pos < len(body) and body[pos] in " \t\r\n,":
+            pos += 1
+    return fields
+
+
+def parse_document(document: str) -> tuple[str, list[tuple[str, str, str, str]]]:
+    """Return the operation type and its root fields."""
+    document = document.strip()
+    operation, _, rest = document.partition("{")
+    operation = operation.strip().split(" ")[0] or "query"
+    return operation, split_fields(rest.rsplit("}", 1)[0])
+
+
+class FakeStashServer:
+    """aiohttp application serving ``/graphql`` over HTTP and websocket."""
+
+    def __init__(self, profile: FakeStashProfile | None = None) -> None:
+        self.profile = profile or FakeStashProfile()
+        self.state = FakeStashState()
+        self.app = web.Application()
+        self.app.router.add_get("/graphql", self._handle_ws)
+        self.app.router.add_post("/graphql", self._handle_post)
+        self._runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/graphql"
+
+    async def start(self, port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+        self.port = self._runner.addresses[0][1]
+        return self.url
+
+    async def stop(self) -> None:
+        for ws in list(self.state.sockets):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # --- HTTP ------------------------------------------------------------
+
+    async def _handle_post(self, request: web.Request) -> web.Response:
+        profile = self.profile
+        self.state.requests += 1
+        if profile.latency or profile.jitter:
+            await asyncio.sleep(profile.latency + random.uniform(0, profile.jitter))
+        if profile.offline:
+            return web.Response(status=503, text="Service Unavailable")
+        if profile.error_rate and random.random() < profile.error_rate:
+            return web.Response(status=500, text="Internal Server Error")
+
+        document = (await request.json())["query"]
+        self.state.documents.append(document)
+        return web.json_response(self.execute(document))
+
+    def execute(self, document: str) -> dict[str, Any]:
+        operation, fields = parse_document(document)
+        unknown = [name for _, name, _, _ in fields if not self._has_field(name)]
+        if unknown:
+            # Как gqlgen: ошибка валидации, данных нет вообще
+            return {
+                "errors": [
+                    {"message": f'Cannot query field "{name}" on type "Query".'}
+                    for name in unknown
+                ],
+                "data": None,
+            }
+
+        data: dict[str, Any] = {}
+        errors: list[dict[str, Any]] = []
+        for alias, name, args, selection in fields:
+            try:
+                data[alias] = self._resolve(operation, name, args, selection)
+            except LookupError as err:
+                data[alias] = None
+                errors.append({"message": str(err), "path": [alias]})
+        result: dict[str, Any] = {"data": data}
+        if errors:
+            result["errors"] = errors
+        return result
+
+    def _has_field(self, name: str) -> bool:
+        legacy = self.profile.schema == SCHEMA_LEGACY
+        if name in ("findGroups", "findJob", "stats"):
+            return not legacy
+        if name == "findMovies":
+            return legacy
+        return True
+
+    def _resolve(self, operation: str, name: str, args: str, selection: str) -> Any:
+        if name in COUNTS:
+            return {"count": COUNTS[name]}
+        if name == "version":
+            return {"version": self.profile.version}
+        if name == "stats":
+            return {
+                field_name: STATS[field_name]
+                for _, field_name, _, _ in split_fields(selection)
+                if field_name in STATS
+            }
+        if name == "jobQueue":
+            self._advance_jobs()
+            return [
+                _public(job)
+                for job in self.state.jobs.values()
+                if job["status"] in ("READY", "RUNNING")
+            ]
+        if name == "findJob":
+            self._advance_jobs()
+            job_id = re.search(r'id:\s*"(\w+)"', args)
+            if job_id is None or job_id.group(1) not in self.state.jobs:
+                raise LookupError("job not found")
+            return _public(self.state.jobs[job_id.group(1)])
+        if name == "__schema":
+            return self._schema()
+        if name == "__type":
+            return {"fields": [{"name": key} for key in STATS], "inputFields": []}
+        if operation == "mutation" and name in TASK_MUTATIONS:
+            return self._start_job(TASK_MUTATIONS[name])
+        if operation == "mutation":
+            return True
+        raise LookupError(f"fake server does not implement {name}")
+
+    def _schema(self) -> dict[str, Any]:
+        names = [name for name in (*COUNTS, "findJob", "stats") if self._has_field(name)]
+        names += ["version", "jobQueue"]
+        modern = self.profile.schema == SCHEMA_MODERN
+        return {
+            "queryType": {"fields": [{"name": name} for name in names]},
+            "mutationType": {"fields": [{"name": name} for name in TASK_MUTATIONS]},
+            "subscriptionType": (
+                {
+                    "fields": [
+                        {"name": "jobsSubscribe"},
+                        {"name": "scanCompleteSubscribe"},
+                    ]
+                }
+                if modern
+                else None
+            ),
+        }
+
+    # --- Jobs ------------------------------------------------------------
+
+    def _start_job(self, description: str) -> str:
+        job_id = str(next(self.state.ids))
+        loop = asyncio.get_running_loop()
+        self.state.jobs[job_id] = {
+            "id": job_id,
+            "status": "READY",
+            "description": description,
+            "progress": 0.0,
+            "subTasks": [],
+            "addTime": None,
+            "startTime": None,
+            "endTime": None,
+            "error": None,
+            "_started": loop.time(),
+        }
+        self._broadcast_job("ADD", self.state.jobs[job_id])
+        self._advance_jobs()
+        return job_id
+
+    def _advance_jobs(self) -> None:
+        """Run jobs one at a time, like the Stash job manager."""
+        now = asyncio.get_running_loop().time()
+        busy_until = None
+        for job in self.state.jobs.values():
+            if job["status"] in ("FINISHED", "FAILED", "CANCELLED"):
+                continue
+            start = max(job["_started"], busy_until or job["_started"])
+            end = start + self.profile.job_duration
+            busy_until = end
+            if now >= end:
+                job["status"], job["progress"] = "FINISHED", 1.0
+                self._broadcast_job("REMOVE", job)
+                if job["description"].startswith("Scanning"):
+                    self._broadcast("scan", {"scanCompleteSubscribe": True})
+            elif now >= start:
+                job["status"] = "RUNNING"
+                job["progress"] = round((now - start) / self.profile.job_duration, 2)
+                self._broadcast_job("UPDATE", job)
+
+    # --- Websocket -------------------------------------------------------
+
+    def _broadcast_job(self, kind: str, job: dict[str, Any]) -> None:
+        self._broadcast("jobs", {"jobsSubscribe": {"type": kind, "job": _public(job)}})
+
+    def _broadcast(self, sub_kind: str, data: dict[str, Any]) -> None:
+        for ws, subscriptions in list(self.state.sockets.items()):
+            legacy = ws.ws_protocol != "graphql-transport-ws"
+            for sub_id, kind in subscriptions.items():
+                if kind != sub_kind:
+                    continue
+                message = {
+                    "id": sub_id,
+                    "type": "data" if legacy else "next",
+                    "payload": {"data": data},
+                }
+                asyncio.ensure_future(ws.send_json(message))
+
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        if self.profile.schema != SCHEMA_MODERN or self.profile.offline:
+            raise web.HTTPNotFound
+        ws = web.WebSocketResponse(protocols=("graphql-transport-ws", "graphql-ws"))
+        await ws.prepare(request)
+        subscriptions = self.state.sockets[ws] = {}
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    break
+                message = msg.json()
+                if message.get("type") == "connection_init":
+                    await ws.send_json({"type": "connection_ack"})
+                elif message.get("type") in ("subscribe", "start"):
+                    query = message["payload"]["query"]
+                    kind = "jobs" if "jobsSubscribe" in query else "scan"
+                    subscriptions[message["id"]] = kind
+                elif message.get("type") == "ping":
+                    await ws.send_json({"type": "pong"})
+        finally:
+            self.state.sockets.pop(ws, None)
+        return ws
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument(
+        "--schema", choices=(SCHEMA_MODERN, SCHEMA_LEGACY), default=SCHEMA_MODERN
+    )
+    parser.add_argument("--version", default=FakeStashProfile.version)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--job-duration", type=float, default=FakeStashProfile.job_duration
+    )
+    args = parser.parse_args()
+
+    server = FakeStashServer(
+        FakeStashProfile(
+            schema=args.schema,
+            version=args.version,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            job_duration=args.job_duration,
+        )
+    )
+    web.run_app(server.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Tests for the totals device over several Stash servers."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from freezegun.api import FrozenDateTimeFactory
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.stash.aggregate import StashAggregateHub
+from custom_components.stash.api import StashClient
+from custom_components.stash.const import (
+    CONF_AGGREGATE,
+    DOMAIN,
+    TIER_INTERVALS,
+    TIER_MEDIA,
+)
+from custom_components.stash.coordinator import StashDataUpdateCoordinator
+from custom_components.stash.sensor import StashAggregateAgeSensor
+
+
+async def test_instances_and_age(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_AGGREGATE: True})
+    entry.add_to_hass(hass)
+    hub = StashAggregateHub(hass, entry)
+    media = {}
+    for entry_id in ("e1", "e2"):
+        client = StashClient("http://stash.local/graphql", None)
+        media[entry_id] = StashDataUpdateCoordinator(
+            hass, client, TIER_MEDIA, TIER_INTERVALS[TIER_MEDIA][1]
+        )
+        # Два сервера с одинаковым названием
+        hub.async_add_member(entry_id, "Stash", {TIER_MEDIA: media[entry_id]})
+
+    media["e1"].async_set_updated_data({"scenes": 10})
+    freezer.tick(timedelta(seconds=30))
+    media["e2"].async_set_updated_data({"scenes": 5})
+
+    instances = hub.data["instances"]
+    assert set(instances) == {"e1", "e2"}
+    assert instances["e1"]["title"] == instances["e2"]["title"] == "Stash"
+    assert hub.data["totals"]["scenes"] == 15
+
+    sensor = StashAggregateAgeSensor(hub, entry)
+    assert sensor.native_value == 30
+    # Возраст растёт и без новых обновлений хаба
+    freezer.tick(timedelta(seconds=60))
+    assert sensor.native_value == 90
+    assert sensor.extra_state_attributes["e2"]["age"] == 60
@@ -0,0 +1,82 @@
+"""Tests for StashClient lookups that do not need a server."""
+from __future__ import annotations
+
+from typing import Any
+
+from custom_components.stash.api import StashClient
+
+
+def _client(responses: list[dict[str, Any] | None]) -> tuple[StashClient, list[dict]]:
+    client = StashClient("http://stash.local/graphql", None)
+    calls: list[dict[str, Any]] = []
+
+    async def _post(query: str, variables: dict[str, Any] | None = None):
+        calls.append(variables or {})
+        return responses.pop(0)
+
+    client._post = _post
+    return client, calls
+
+
+async def test_search_is_cached() -> None:
+    found = {"data": {"findScenes": {"count": 1, "scenes": [{"id": "1"}]}}}
+    client, calls = _client([found, found])
+    find_filter = {"per_page": 5, "sort": "date", "direction": "DESC"}
+
+    first = await client.async_search_scenes(find_filter, {"organized": True})
+    second = await client.async_search_scenes(dict(find_filter), {"organized": True})
+
+    assert first == second == (1, [{"id": "1"}])
+    assert len(calls) == 1
+
+
+async def test_random_search_is_not_cached() -> None:
+    found = {"data": {"findScenes": {"count": 1, "scenes": [{"id": "1"}]}}}
+    client, calls = _client([found, found])
+    find_filter = {"per_page": 5, "sort": "random", "direction": "DESC"}
+
+    await client.async_search_scenes(find_filter, {})
+    await client.async_search_scenes(find_filter, {})
+
+    assert len(calls) == 2
+    assert len(client.search_cache) == 0
+
+
+async def test_finished_task_jobs_are_forgotten() -> None:
+    client, _ = _client(
+        [
+            {"data": {"jobQueue": []}},
+            {"data": {"metadataScan": "1"}},
+            {"data": {"jobQueue": []}},
+            {"data": {"metadataScan": "2"}},
+        ]
+    )
+
+    assert await client.async_metadata_scan(["/a"]) == "1"
+    assert await client.async_metadata_scan(["/b"]) == "2"
+    # Задача 1 ушла из очереди — её запись удалена
+    assert list(client._task_jobs.values()) == ["2"]
+
+
+async def test_resolved_names_are_cached() -> None:
+    client, calls = _client(
+        [
+            {"data": {"n0": {"tags": [{"id": 3}]}, "n1": {"tags": []}}},
+            {"data": {"n0": {"tags": []}}},
+        ]
+    )
+
+    assert await client.async_resolve_names("tags", ["Outdoor", "Unknown"]) == {
+        "Outdoor": "3"
+    }
+    assert await client.async_resolve_names("tags", ["Outdoor", "Unknown"]) == {
+        "Outdoor": "3"
+    }
+    # Второй раз спрашиваем только то, что не нашлось
+    assert calls[1] == {"n0": "Unknown"}
+
+
+async def test_resolve_names_without_data() -> None:
+    client, _ = _client([None])
+
+    assert await client.async_resolve_names("studios", ["Studio"]) == {}
@@ -0,0 +1,65 @@
+"""Tests for the circuit breaker."""
+from __future__ import annotations
+
+import time
+
+from custom_components.stash.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+def test_opens_after_threshold() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, backoff_min=10, backoff_max=40)
+
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+
+    assert breaker.state == STATE_OPEN
+    assert 5 <= breaker.retry_in <= 10
+    assert not breaker.probe_due()
+
+
+def test_failed_probe_doubles_backoff() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, backoff_min=10, backoff_max=15)
+    breaker.record_failure()
+
+    for backoff in (15, 15):
+        breaker.retry_at = time.monotonic()
+        assert breaker.probe_due()
+        breaker.start_probe()
+        assert breaker.state == STATE_HALF_OPEN
+        breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+        assert backoff / 2 <= breaker.retry_in <= backoff
+
+
+def test_successful_probe_closes() -> None:
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure()
+    breaker.start_probe()
+
+    breaker.record_success(0.05)
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+    assert breaker.retry_in is None
+    assert breaker.last_probe_latency == 0.05
+
+
+def test_listeners_see_every_transition() -> None:
+    breaker = CircuitBreaker(failure_threshold=1)
+    states: list[str] = []
+    remove = breaker.add_listener(states.append)
+
+    breaker.record_failure()
+    breaker.start_probe()
+    breaker.record_success()
+    breaker.record_success()
+    remove()
+    breaker.record_failure()
+
+    assert states == [STATE_OPEN, STATE_HALF_OPEN, STATE_CLOSED]
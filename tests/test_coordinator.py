@@ -0,0 +1,198 @@
+"""Refresh cost and latency of StashDataUpdateCoordinator against fake Stash.
+
+These are the regression checks for the client's performance work: one
+HTTP request per tier refresh, coalesced concurrent refreshes, a breaker
+that keeps an offline server from costing time, and refresh latency
+budgets with several entries and slow servers.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.stash.breaker import STATE_CLOSED, STATE_OPEN
+from custom_components.stash.const import (
+    BREAKER_FAILURE_THRESHOLD,
+    TIER_INTERVALS,
+    TIER_KEYS,
+    TIER_MEDIA,
+    TIER_TAXONOMY,
+    TIER_VERSION,
+)
+from custom_components.stash.coordinator import StashDataUpdateCoordinator
+
+from .fake_stash import COUNTS, SCHEMA_LEGACY, STATS
+
+# Бюджеты времени с запасом для медленных CI-машин
+LOCAL_REFRESH_P95 = 0.25
+SLOW_LATENCY = 0.2
+
+
+def _coordinator(
+    hass: HomeAssistant, client, tier: str = TIER_MEDIA
+) -> StashDataUpdateCoordinator:
+    return StashDataUpdateCoordinator(hass, client, tier, TIER_INTERVALS[tier][1])
+
+
+async def _timed_refresh(coordinator: StashDataUpdateCoordinator) -> float:
+    start = time.perf_counter()
+    await coordinator.async_refresh()
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize("tier", list(TIER_KEYS))
+async def test_one_request_per_tier_refresh(
+    hass: HomeAssistant, fake_stash, make_client, tier: str
+) -> None:
+    """Every tier reads all its counters in a single aliased query."""
+    client = await make_client(fake_stash)
+    coordinator = _coordinator(hass, client, tier)
+
+    before = fake_stash.state.requests
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert fake_stash.state.requests - before == 1
+    assert set(coordinator.data) == set(TIER_KEYS[tier])
+    assert all(value is not None for value in coordinator.data.values())
+
+
+async def test_counters_come_from_stats(
+    hass: HomeAssistant, fake_stash, make_client
+) -> None:
+    """Counters, sizes and durations are read from the stats aggregate."""
+    client = await make_client(fake_stash)
+    coordinator = _coordinator(hass, client)
+
+    await coordinator.async_refresh()
+
+    assert coordinator.data["scenes"] == STATS["scene_count"]
+    assert coordinator.data["scenes_size"] == STATS["scenes_size"]
+    assert coordinator.data["markers"] == COUNTS["findSceneMarkers"]
+    assert "stats" in fake_stash.state.documents[-1]
+
+
+async def test_legacy_schema_refresh(
+    hass: HomeAssistant, start_stash, make_client
+) -> None:
+    """Without stats the counts use find* fields the server has, still in one query."""
+    server = await start_stash(schema=SCHEMA_LEGACY)
+    client = await make_client(server)
+    coordinator = _coordinator(hass, client, TIER_TAXONOMY)
+
+    before = server.state.requests
+    await coordinator.async_refresh()
+
+    assert coordinator.last_update_success
+    assert server.state.requests - before == 1
+    assert coordinator.data["studios"] == COUNTS["findStudios"]
+    assert "findGroups" not in server.state.documents[-1]
+
+
+async def test_concurrent_refreshes_share_one_request(
+    hass: HomeAssistant, start_stash, make_client
+) -> None:
+    """Ten refreshes of the same tier in flight cost one HTTP request."""
+    server = await start_stash(latency=0.05)
+    client = await make_client(server)
+    coordinators = [_coordinator(hass, client) for _ in range(10)]
+
+    before = server.state.requests
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+
+    assert server.state.requests - before == 1
+    assert all(coordinator.last_update_success for coordinator in coordinators)
+    assert len({id(coordinator.data) for coordinator in coordinators}) == 10
+
+
+async def test_refresh_latency(hass: HomeAssistant, fake_stash, make_client) -> None:
+    """A refresh against a local server stays within its latency budget."""
+    client = await make_client(fake_stash)
+    coordinator = _coordinator(hass, client)
+
+    timings = sorted([await _timed_refresh(coordinator) for _ in range(20)])
+
+    assert coordinator.last_update_success
+    assert timings[round(0.95 * (len(timings) - 1))] < LOCAL_REFRESH_P95
+    assert client.metrics.refresh_durations[TIER_MEDIA] < LOCAL_REFRESH_P95
+
+
+async def test_slow_server_latency(hass: HomeAssistant, start_stash, make_client) -> None:
+    """A slow server costs its own latency once per refresh, not once per counter."""
+    server = await start_stash(latency=SLOW_LATENCY)
+    client = await make_client(server)
+    coordinator = _coordinator(hass, client)
+
+    timings = [await _timed_refresh(coordinator) for _ in range(3)]
+
+    assert coordinator.last_update_success
+    assert statistics.median(timings) < SLOW_LATENCY + LOCAL_REFRESH_P95
+
+
+async def test_concurrent_entries(hass: HomeAssistant, start_stash, make_client) -> None:
+    """Entries for different servers refresh in parallel, not one after another."""
+    entries = 8
+    servers = [await start_stash(latency=0.1) for _ in range(entries)]
+    clients = [await make_client(server) for server in servers]
+    coordinators = [_coordinator(hass, client) for client in clients]
+
+    before = [server.state.requests for server in servers]
+    start = time.perf_counter()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    elapsed = time.perf_counter() - start
+
+    assert all(coordinator.last_update_success for coordinator in coordinators)
+    assert [server.state.requests for server in servers] == [
+        count + 1 for count in before
+    ]
+    assert elapsed < 0.1 * entries / 2
+
+
+async def test_breaker_fails_fast_when_open(
+    hass: HomeAssistant, start_stash, make_client
+) -> None:
+    """Once the circuit opens, refreshes fail without reaching the server."""
+    server = await start_stash(latency=0.1)
+    client = await make_client(server)
+    coordinator = _coordinator(hass, client)
+    server.profile.offline = True
+
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        await coordinator.async_refresh()
+    assert client.breaker.state == STATE_OPEN
+    assert not coordinator.last_update_success
+
+    before = server.state.requests
+    timings = [await _timed_refresh(coordinator) for _ in range(5)]
+
+    assert server.state.requests == before
+    assert max(timings) < server.profile.latency
+    assert not coordinator.last_update_success
+
+
+async def test_breaker_recovers_with_one_probe(
+    hass: HomeAssistant, start_stash, make_client
+) -> None:
+    """When the retry time comes, one cheap probe closes the circuit again."""
+    server = await start_stash()
+    client = await make_client(server)
+    coordinator = _coordinator(hass, client, TIER_VERSION)
+    server.profile.offline = True
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        await coordinator.async_refresh()
+    assert client.breaker.state == STATE_OPEN
+
+    server.profile.offline = False
+    client.breaker.retry_at = time.monotonic()
+    before = server.state.requests
+    await coordinator.async_refresh()
+
+    assert client.breaker.state == STATE_CLOSED
+    assert coordinator.last_update_success
+    # Проба version, затем сам запрос уровня
+    assert server.state.requests - before == 2
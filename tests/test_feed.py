@@ -0,0 +1,155 @@
+"""Tests for the feed of added and updated scenes and images."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from pytest_homeassistant_custom_component.common import async_capture_events
+
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+
+from custom_components.stash.feed import (
+    EVENT_ITEM_ADDED,
+    EVENT_ITEM_UPDATED,
+    StashFeedCoordinator,
+)
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _at(seconds: int) -> str:
+    return (T0 + timedelta(seconds=seconds)).isoformat()
+
+
+class _FeedClient:
+    """In-memory ``async_find_recent``, filtered and sorted like Stash."""
+
+    def __init__(self) -> None:
+        self.items: dict[str, dict[str, dict[str, Any]]] = {"scenes": {}, "images": {}}
+        self.queries = 0
+
+    def put(self, kind: str, object_id: int, created: int, updated: int) -> None:
+        self.items[kind][str(object_id)] = {
+            "id": str(object_id),
+            "title": f"{kind} {object_id}",
+            "created_at": _at(created),
+            "updated_at": _at(updated),
+        }
+
+    async def async_find_recent(
+        self,
+        kind: str,
+        sort: str,
+        direction: str,
+        page: int,
+        per_page: int,
+        since: str | None = None,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        self.queries += 1
+        items = sorted(
+            self.items[kind].values(),
+            key=lambda item: (item[sort], item["id"]),
+            reverse=direction == "DESC",
+        )
+        if since:
+            items = [
+                item
+                for item in items
+                if dt_util.parse_datetime(item[sort]) > dt_util.parse_datetime(since)
+            ]
+        return len(items), items[(page - 1) * per_page : page * per_page]
+
+
+async def _feed(hass: HomeAssistant, client: _FeedClient) -> StashFeedCoordinator:
+    feed = StashFeedCoordinator(hass, client, "entry", 300)
+    await feed.async_restore()
+    await feed.async_refresh()
+    return feed
+
+
+def _ids(events) -> list[tuple[str, str]]:
+    return [(event.data["type"], event.data["id"]) for event in events]
+
+
+async def test_first_refresh_only_seeds(hass: HomeAssistant) -> None:
+    client = _FeedClient()
+    for object_id in range(5):
+        client.put("scenes", object_id, object_id, object_id)
+    added = async_capture_events(hass, EVENT_ITEM_ADDED)
+
+    feed = await _feed(hass, client)
+    await hass.async_block_till_done()
+
+    assert added == []
+    assert [item["id"] for item in feed.data["scenes"]] == ["4", "3", "2", "1", "0"]
+
+
+async def test_added_and_updated(hass: HomeAssistant) -> None:
+    client = _FeedClient()
+    client.put("scenes", 1, 1, 1)
+    feed = await _feed(hass, client)
+    added = async_capture_events(hass, EVENT_ITEM_ADDED)
+    updated = async_capture_events(hass, EVENT_ITEM_UPDATED)
+
+    client.put("scenes", 1, 1, 50)
+    client.put("scenes", 2, 40, 40)
+    client.put("images", 7, 45, 45)
+    await feed.async_refresh()
+    await hass.async_block_till_done()
+
+    assert _ids(added) == [("scene", "2"), ("image", "7")]
+    assert _ids(updated) == [("scene", "1")]
+    assert feed.data["scenes"][0]["id"] == "2"
+
+
+async def test_added_is_judged_by_the_cursor_before_the_poll(
+    hass: HomeAssistant,
+) -> None:
+    """An object created earlier but updated later than another new one is added."""
+    client = _FeedClient()
+    client.put("scenes", 1, 1, 1)
+    feed = await _feed(hass, client)
+    added = async_capture_events(hass, EVENT_ITEM_ADDED)
+    updated = async_capture_events(hass, EVENT_ITEM_UPDATED)
+
+    client.put("scenes", 10, 600, 1200)
+    client.put("scenes", 11, 900, 960)
+    await feed.async_refresh()
+    await hass.async_block_till_done()
+
+    assert _ids(added) == [("scene", "11"), ("scene", "10")]
+    assert updated == []
+    assert {item["id"] for item in feed.data["scenes"][:2]} == {"10", "11"}
+
+
+async def test_same_second_objects_fire_once(hass: HomeAssistant) -> None:
+    client = _FeedClient()
+    client.put("scenes", 1, 1, 1)
+    feed = await _feed(hass, client)
+    added = async_capture_events(hass, EVENT_ITEM_ADDED)
+
+    for object_id in range(10, 15):
+        client.put("scenes", object_id, 20, 20)
+    await feed.async_refresh()
+    client.put("scenes", 15, 20, 20)
+    await feed.async_refresh()
+    await feed.async_refresh()
+    await hass.async_block_till_done()
+
+    assert [event.data["id"] for event in added] == [
+        "10", "11", "12", "13", "14", "15"
+    ]
+
+
+async def test_idle_refresh_is_cheap(hass: HomeAssistant) -> None:
+    client = _FeedClient()
+    for object_id in range(100):
+        client.put("scenes", object_id, object_id, object_id)
+    feed = await _feed(hass, client)
+
+    client.queries = 0
+    await feed.async_refresh()
+
+    # Один запрос на вид, независимо от размера библиотеки
+    assert client.queries == 2
@@ -0,0 +1,24 @@
+"""Tests for the image proxy URLs."""
+from __future__ import annotations
+
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+
+from custom_components.stash.image_proxy import StashImageView, image_url
+
+
+async def test_signed_url_passes_auth(hass: HomeAssistant, hass_client_no_auth) -> None:
+    """An ``<img>`` tag sends no Authorization header; the signature is enough."""
+    assert await async_setup_component(hass, "http", {})
+    hass.http.register_view(StashImageView(hass))
+    client = await hass_client_no_auth()
+
+    url = image_url(hass, "unknown", "scenes", "1", "2026-01-01T00:00:00Z")
+    assert "authSig=" in url
+    assert "v=2026-01-01T00:00:00Z" in url
+    # Подпись переиспользуется, чтобы URL не менялся при каждом обновлении
+    assert image_url(hass, "unknown", "scenes", "1", "2026-01-01T00:00:00Z") == url
+
+    # Авторизация пройдена, сервера с таким entry_id нет
+    assert (await client.get(url)).status == 404
+    assert (await client.get(url.split("?")[0])).status == 401
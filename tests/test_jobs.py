@@ -0,0 +1,48 @@
+"""Tests for the job queue coordinator."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.stash.jobs import StashJobCoordinator
+
+
+class _JobClient:
+    """Job queue that is always empty."""
+
+    async def async_get_job_queue(self) -> list[dict[str, Any]]:
+        return []
+
+    async def async_find_job(self, job_id: str) -> dict[str, Any] | None:
+        return None
+
+
+def _event(job_id: str, status: str) -> dict[str, Any]:
+    return {
+        "jobsSubscribe": {
+            "type": "UPDATE",
+            "job": {"id": job_id, "status": status, "progress": None},
+        }
+    }
+
+
+async def test_push_reports_only_tracked_jobs(hass: HomeAssistant) -> None:
+    finished: list[dict[str, Any]] = []
+    jobs = StashJobCoordinator(hass, _JobClient(), finished.append)
+    jobs._tracked.add("2")
+
+    # Задачу 1 запустили не из HA
+    jobs.async_handle_job_event(_event("1", "FINISHED"))
+    assert jobs.data["last_result"] is None
+    assert finished == []
+
+    jobs.async_handle_job_event(_event("2", "RUNNING"))
+    assert [job["id"] for job in jobs.data["queue"]] == ["2"]
+    waiter = jobs.async_wait("2")
+    jobs.async_handle_job_event(_event("2", "FAILED"))
+
+    assert jobs.data["queue"] == []
+    assert jobs.data["last_result"]["status"] == "FAILED"
+    assert [job["id"] for job in finished] == ["2"]
+    assert (await waiter)["status"] == "FAILED"
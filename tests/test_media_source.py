@@ -0,0 +1,22 @@
+"""Tests for the Stash media source."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.stash.media_source import _mime_type
+
+
+@pytest.mark.parametrize(
+    ("files", "mime"),
+    [
+        ([{"format": "mp4", "video_codec": "h264"}], "video/mp4"),
+        ([{"format": "webm", "video_codec": "vp9"}], "video/webm"),
+        ([{"format": "mkv", "video_codec": "hevc"}], "video/x-matroska"),
+        ([{"format": "mkv", "video_codec": "vp9"}], "video/webm"),
+        ([{"format": "mov", "video_codec": "h264"}], "video/quicktime"),
+        ([{"format": "unknown"}], "video/mp4"),
+        ([], "video/mp4"),
+    ],
+)
+def test_mime_type_from_file(files, mime) -> None:
+    assert _mime_type({"id": "1", "files": files}) == mime
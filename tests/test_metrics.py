@@ -0,0 +1,43 @@
+"""Tests for request metrics."""
+from __future__ import annotations
+
+from custom_components.stash.const import METRICS_WINDOW
+from custom_components.stash.metrics import StashMetrics, operation_name
+
+
+def test_operation_name() -> None:
+    assert operation_name("query { findScenes { count } }") == "findScenes"
+    assert operation_name("query { a: findTags { count } }") == "batch"
+    assert operation_name("mutation { metadataScan(input: {}) }") == "metadataScan"
+    assert operation_name("query Batch { a: findTags { count } }") == "batch"
+    assert operation_name("mutation M($x: ID!) { metadataScan(input: $x) }") == "metadataScan"
+
+
+
+def test_stats_per_operation() -> None:
+    metrics = StashMetrics()
+    for latency in (0.01, 0.02, 0.03):
+        metrics.record_success("findScenes", latency, 100, False)
+    metrics.record_error("findTags")
+    metrics.record_rejected("findTags")
+
+    operations = metrics.as_dict()["operations"]
+    assert operations["findScenes"]["requests"] == 3
+    assert operations["findScenes"]["p50_ms"] == 20.0
+    assert operations["findScenes"]["avg_bytes"] == 100
+    assert operations["findTags"]["errors"] == 1
+    assert operations["findTags"]["rejected"] == 1
+    assert metrics.failures == 1
+
+
+def test_average_size_beyond_window() -> None:
+    metrics = StashMetrics()
+    for _ in range(2 * METRICS_WINDOW):
+        metrics.record_success("findScenes", 0.01, 45, False)
+    metrics.record_timeout("findScenes")
+
+    stats = metrics.as_dict()["operations"]["findScenes"]
+    assert stats["requests"] == 2 * METRICS_WINDOW + 1
+    assert stats["avg_bytes"] == 45
+    assert stats["timeouts"] == 1
+    assert metrics.failures == 1
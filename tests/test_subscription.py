@@ -0,0 +1,123 @@
+"""Tests for the websocket subscription against the fake Stash server."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from custom_components.stash import _async_create_subscription, subscription
+from custom_components.stash.jobs import StashJobCoordinator
+from custom_components.stash.subscription import (
+    EVENT_JOB,
+    StashSubscriptionClient,
+)
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Reconnect within the test instead of after seconds."""
+    monkeypatch.setattr(subscription, "SUBSCRIPTION_BACKOFF_MIN", 0.05)
+
+
+async def _until(predicate: Callable[[], bool]) -> None:
+    async with asyncio.timeout(5):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+def _subscribed(server) -> bool:
+    return [sorted(subs.values()) for subs in server.state.sockets.values()] == [
+        ["jobs", "scan"]
+    ]
+
+
+async def _stop(task: asyncio.Task) -> None:
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+async def test_connects_and_subscribes(hass: HomeAssistant, fake_stash) -> None:
+    changes: list[bool] = []
+    client = StashSubscriptionClient(
+        async_get_clientsession(hass), fake_stash.url, lambda *_: None, changes.append
+    )
+    task = asyncio.create_task(client.run())
+
+    await _until(lambda: _subscribed(fake_stash))
+    assert client.connected
+    assert changes == [True]
+    await _stop(task)
+
+
+async def test_job_events_reach_the_coordinator(
+    hass: HomeAssistant, start_stash, make_client
+) -> None:
+    server = await start_stash(job_duration=0.2)
+    client = await make_client(server)
+    jobs = StashJobCoordinator(hass, client)
+    refreshes: list[None] = []
+    sub = _async_create_subscription(
+        async_get_clientsession(hass), server.url, [], jobs, lambda: refreshes.append(None)
+    )
+    task = asyncio.create_task(sub.run())
+    await _until(lambda: _subscribed(server))
+
+    job_id = await client.async_metadata_scan()
+    await jobs.async_track(job_id)
+    await asyncio.sleep(0.25)
+    # Очередь читает не координатор: итог задачи приходит только по подписке
+    assert await client.async_get_job_queue() == []
+    await _until(lambda: jobs.data["last_result"] is not None)
+
+    assert jobs.data["last_result"]["id"] == job_id
+    assert jobs.data["last_result"]["status"] == "FINISHED"
+    # scanCompleteSubscribe обновляет счётчики
+    await _until(lambda: refreshes == [None])
+    await _stop(task)
+
+
+async def test_reconnects_after_server_drop(hass: HomeAssistant, fake_stash) -> None:
+    changes: list[bool] = []
+    events: list[tuple[str, dict[str, Any]]] = []
+    client = StashSubscriptionClient(
+        async_get_clientsession(hass),
+        fake_stash.url,
+        lambda kind, payload: events.append((kind, payload)),
+        changes.append,
+    )
+    task = asyncio.create_task(client.run())
+    await _until(lambda: _subscribed(fake_stash))
+    first = next(iter(fake_stash.state.sockets))
+
+    await first.close()
+    await _until(lambda: changes == [True, False, True])
+    await _until(lambda: _subscribed(fake_stash))
+    assert first not in fake_stash.state.sockets
+
+    # Подписки восстановлены на новом соединении
+    fake_stash._broadcast_job("ADD", {"id": "9", "status": "READY"})
+    await _until(lambda: len(events) == 1)
+    assert events[0][0] == EVENT_JOB
+    await _stop(task)
+
+
+async def test_cancel_does_not_report_disconnect(
+    hass: HomeAssistant, fake_stash
+) -> None:
+    changes: list[bool] = []
+    client = StashSubscriptionClient(
+        async_get_clientsession(hass), fake_stash.url, lambda *_: None, changes.append
+    )
+    task = asyncio.create_task(client.run())
+    await _until(lambda: _subscribed(fake_stash))
+
+    await _stop(task)
+
+    assert not client.connected
+    assert changes == [True]
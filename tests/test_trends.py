@@ -0,0 +1,88 @@
+"""Tests for growth rates and the disk-full estimate."""
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+
+from freezegun.api import FrozenDateTimeFactory
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+import homeassistant.util.dt as dt_util
+
+from custom_components.stash.const import CONF_LIBRARY_CAPACITY, DOMAIN
+from custom_components.stash.trends import StashTrendTracker
+
+GB = 1_000_000_000
+
+
+async def _tracker(
+    hass: HomeAssistant, capacity: int = 0
+) -> tuple[StashTrendTracker, DataUpdateCoordinator]:
+    entry = MockConfigEntry(domain=DOMAIN, options={CONF_LIBRARY_CAPACITY: capacity})
+    entry.add_to_hass(hass)
+    media = DataUpdateCoordinator(
+        hass, logging.getLogger(__name__), config_entry=entry, name="media"
+    )
+    tracker = StashTrendTracker(hass, entry, media)
+    await tracker.async_restore()
+    tracker.async_start()
+    return tracker, media
+
+
+def _push(media: DataUpdateCoordinator, scenes: int, size_gb: float) -> None:
+    media.async_set_updated_data(
+        {"scenes": scenes, "images": 0, "scenes_size": size_gb * GB, "images_size": 0}
+    )
+
+
+async def test_rates_per_window(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    tracker, media = await _tracker(hass)
+    for day in range(8):
+        _push(media, 1000 + 10 * day, 100 + day)
+        freezer.tick(timedelta(days=1))
+    freezer.tick(-timedelta(days=1))
+
+    scenes = tracker.data["scenes"]
+    assert scenes["per_day"] == pytest.approx(10)
+    assert scenes["per_week"] == pytest.approx(70)
+    assert tracker.data["size"]["per_day"] == pytest.approx(GB)
+
+
+async def test_one_sample_per_interval(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    tracker, media = await _tracker(hass)
+    _push(media, 100, 1)
+    freezer.tick(timedelta(minutes=10))
+    _push(media, 101, 1)
+    freezer.tick(timedelta(minutes=60))
+    _push(media, 102, 1)
+
+    assert len(tracker._samples) == 2
+    assert tracker.data["since"] is not None
+
+
+async def test_disk_full(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    tracker, media = await _tracker(hass, capacity=110)
+    _push(media, 0, 100)
+    freezer.tick(timedelta(days=1))
+    _push(media, 0, 101)
+
+    # 9 ГБ свободно при 1 ГБ в день
+    assert tracker.data["disk_full"] == dt_util.utcnow() + timedelta(days=9)
+
+
+async def test_no_capacity_no_estimate(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    tracker, media = await _tracker(hass)
+    _push(media, 0, 100)
+    freezer.tick(timedelta(days=1))
+    _push(media, 0, 101)
+
+    assert tracker.data["disk_full"] is None
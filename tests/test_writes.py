@@ -0,0 +1,76 @@
+"""Tests for the coalescing write queue."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from custom_components.stash.writes import StashWriteQueue
+
+
+class _Recorder:
+    """Stand-in for ``StashClient._post`` that updates every ID but ``missing``."""
+
+    def __init__(self, missing: set[str] | None = None) -> None:
+        self.calls: list[dict[str, Any]] = []
+        self._missing = missing or set()
+
+    async def __call__(self, document: str, variables: dict[str, Any]) -> dict[str, Any]:
+        self.calls.append(variables["input"])
+        mutation = "bulkImageUpdate" if "bulkImageUpdate" in document else "bulkSceneUpdate"
+        ids = [object_id for object_id in variables["input"]["ids"] if object_id not in self._missing]
+        return {"data": {mutation: [{"id": object_id} for object_id in ids]}}
+
+
+async def test_same_change_is_one_request() -> None:
+    post = _Recorder()
+    flushed: list[bool] = []
+    queue = StashWriteQueue(post, lambda: flushed.append(True))
+
+    futures = queue.enqueue("scene", ["1", "2"], {"rating100": 80})
+    futures += queue.enqueue("scene", ["3"], {"rating100": 80})
+    await queue.async_flush()
+    await asyncio.gather(*futures)
+
+    assert post.calls == [{"ids": ["1", "2", "3"], "rating100": 80}]
+    assert flushed == [True]
+
+
+async def test_last_edit_wins() -> None:
+    post = _Recorder()
+    queue = StashWriteQueue(post)
+
+    queue.enqueue("scene", ["1"], {"rating100": 20})
+    queue.enqueue("scene", ["1"], {"rating100": 100})
+    queue.enqueue("scene", ["2"], {"rating100": 20})
+    await queue.async_flush()
+
+    # Поздняя правка объекта 1 идёт отдельным пакетом после ранней
+    assert post.calls == [
+        {"ids": ["1", "2"], "rating100": 20},
+        {"ids": ["1"], "rating100": 100},
+    ]
+
+
+async def test_missing_objects_fail_alone() -> None:
+    post = _Recorder(missing={"2"})
+    queue = StashWriteQueue(post)
+
+    first, second = queue.enqueue("image", ["1", "2"], {"organized": True})
+    await queue.async_flush()
+
+    await first
+    with pytest.raises(LookupError):
+        await second
+
+
+async def test_flushes_after_delay() -> None:
+    post = _Recorder()
+    queue = StashWriteQueue(post)
+
+    (future,) = queue.enqueue("scene", ["1"], {"organized": True})
+    await asyncio.wait_for(future, 5)
+
+    assert len(post.calls) == 1
+    assert queue.pending == 0